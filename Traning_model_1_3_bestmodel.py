@@ -1,8 +1,12 @@
 import os
-import shutil
-import random
+from datetime import datetime
 from ultralytics import YOLO
+import ingest_journal
+import replay_finetune
 import report_utils 
+import profiling_utils
+import bf16_utils
+import argparse
 import sys
 
 sys.stdout.reconfigure(encoding='utf-8')
@@ -10,63 +14,57 @@ sys.stdout.reconfigure(encoding='utf-8')
 dataset_root = r'D:\model_cuu\dataset'  
 additional_datasets = [r'D:\model_cuu\dataset_method_1'] 
 epochs = 100
+base_weights = r'D:\model_cuu\runs\train\my_lettuce_model_1_34\weights\best.pt'
+train_args = dict(
+    epochs=epochs,
+    batch=16,
+    imgsz=640,
+    device='0',
+    patience=50,
+    save=True,
+    project='runs/train',
+    name='my_lettuce_model_1_3',
+    verbose=True,
+    plots=True,
+    optimizer='AdamW',
+    lr0=0.001,
+    lrf=0.01,
+    cos_lr=True,
+    warmup_epochs=3.0,
+)
+
+# Incremental mode: เทรนเฉพาะรูปที่ ingest เข้ามาใหม่ + replay sample ของรูปเก่า (สมดุลคลาส)
+# val ยังใช้ val split เต็มเพื่อจับ regression
+incremental = False
+incremental_batches = None   # None = ทุก batch ใน split_journal.tsv ที่ยังไม่เคย fine-tune, ตัวเลข = เฉพาะ n ชุดล่าสุด
+replay_size = 500         # จำนวนรูปเก่าที่สุ่มมาเทรนร่วม
+incremental_epochs = 30
 
 
 def auto_split_data(base_path, extra_paths=[]):
-
-    def distribute(files, src_img, src_lbl, dst_base, move_files=False):
-        if not files: return
-        total = len(files)
-        end_train = int(total * 0.70)
-        end_val = end_train + int(total * 0.15)
-        splits = {'train': files[:end_train], 'val': files[end_train:end_val], 'test': files[end_val:]}
-        
-        for mode, f_list in splits.items():
-            d_img = os.path.join(dst_base, 'images', mode)
-            d_lbl = os.path.join(dst_base, 'labels', mode)
-            os.makedirs(d_img, exist_ok=True)
-            os.makedirs(d_lbl, exist_ok=True)
-            for f in f_list:
-                s_i = os.path.join(src_img, f)
-                d_i = os.path.join(d_img, f)
-                if os.path.exists(d_i): continue
-                if move_files: shutil.move(s_i, d_i)
-                else: shutil.copy2(s_i, d_i)
-                
-                txt = os.path.splitext(f)[0] + '.txt'
-                s_t = os.path.join(src_lbl, txt)
-                d_t = os.path.join(d_lbl, txt)
-                if os.path.exists(s_t) and not os.path.exists(d_t):
-                    if move_files: shutil.move(s_t, d_t)
-                    else: shutil.copy2(s_t, d_t)
-
+    # ไฟล์ที่แบ่งไปแล้วถูกบันทึกใน split_journal.tsv จึงประมวลผลเฉพาะรูปใหม่
+    batch_id = datetime.now().strftime('%Y%m%d_%H%M%S')
     for p in extra_paths:
         if not os.path.exists(p): continue
         print(f" Processing extra dataset: {p}")
-        i_dir = os.path.join(p, 'images')
-        l_dir = os.path.join(p, 'labels')
-        if os.path.exists(i_dir):
-            imgs = [f for f in os.listdir(i_dir) if f.lower().endswith(('.jpg', '.png', '.jpeg'))]
-            random.shuffle(imgs)
-            distribute(imgs, i_dir, l_dir, base_path, move_files=False)
+        counts = ingest_journal.ingest_new_images(base_path, os.path.join(p, 'images'), os.path.join(p, 'labels'), move_files=False, batch_id=batch_id)
+        print(f"   + Train={counts['train']}, Val={counts['val']}, Test={counts['test']}")
 
     img_dir = os.path.join(base_path, 'images')
     lbl_dir = os.path.join(base_path, 'labels')
 
-    if os.path.exists(img_dir):
-        images = [f for f in os.listdir(img_dir) if os.path.isfile(os.path.join(img_dir, f)) and f.lower().endswith(('.jpg', '.png', '.jpeg'))]
-        if images:
-            print(f" Found {len(images)} unsorted images in {base_path}. Splitting...")
-            random.shuffle(images)
-            distribute(images, img_dir, lbl_dir, base_path, move_files=True)
-        else:
-            print(" No unsorted images found in base dataset root.")
+    counts = ingest_journal.ingest_new_images(base_path, img_dir, lbl_dir, move_files=True, batch_id=batch_id)
+    if sum(counts.values()):
+        print(f" Split new images in {base_path}: Train={counts['train']}, Val={counts['val']}, Test={counts['test']}")
+    else:
+        print(" No unsorted images found in base dataset root.")
     
     print(f" Dataset preparation complete.")
 
 
 if __name__ == '__main__':
-    print(f"--- GPU Check: device='0' (NVIDIA) ---")
+    args = bf16_utils.add_bf16_args(profiling_utils.add_profile_args(argparse.ArgumentParser())).parse_args()
+    print(f"--- Device Check: device='{args.device or train_args['device']}' ---")
     if os.path.exists(dataset_root):
         auto_split_data(dataset_root, additional_datasets)
     else:
@@ -81,31 +79,31 @@ if __name__ == '__main__':
         exit()
     print(f"Using Data Config: {yaml_path}")
 
+    run_args = dict(train_args)
+    start_weights = base_weights
+    if incremental:
+        yaml_path, inc = replay_finetune.build_incremental_dataset(dataset_root, yaml_path, incremental_batches, replay_size)
+        if inc['new'] == 0:
+            print(" ไม่พบรูปใหม่ที่ยังไม่เคย fine-tune ใน journal ไม่ต้อง fine-tune")
+            exit()
+        run_args.update(epochs=incremental_epochs, name=train_args['name'] + '_inc')
+        # fine-tune ต่อจาก best.pt ของรอบ incremental ก่อนหน้า ; รอบแรกเริ่มจาก base_weights
+        start_weights = replay_finetune.last_weights(dataset_root) or base_weights
+        print(f"Incremental Data Config: {yaml_path}")
+        print(f"Starting weights: {start_weights}")
+
     # เทรนโมเดล
-    model = YOLO(r'D:\model_cuu\runs\train\my_lettuce_model_1_34\weights\best.pt')  
+    model = YOLO(start_weights)  
+    profiling_utils.attach_from_args(model, args)
+    run_args['device'] = bf16_utils.attach_from_args(model, args, run_args['device'])
     try:
-        results = model.train(
-            data=yaml_path,
-            epochs=epochs,
-            batch=16,
-            imgsz=640,
-            device='0',      
-            patience=50,    
-            save=True,
-            project='runs/train',
-            name='my_lettuce_model_1_3',
-            verbose=True,
-            plots=True,  
-            optimizer='AdamW',  
-            lr0=0.001,          
-            lrf=0.01,           
-            cos_lr=True,        
-            warmup_epochs=3.0,
-        )
+        results = model.train(data=yaml_path, **run_args)
 
     
         save_dir_str = str(results.save_dir)
         best_pt_path = os.path.join(save_dir_str, 'weights', 'best.pt')
+        if incremental:
+            replay_finetune.mark_trained(dataset_root, inc['batches'], best_pt_path)
 
         # 4. สร้าง Report
         try:
@@ -113,7 +111,7 @@ if __name__ == '__main__':
             log_dir = report_utils.create_log_directory()
 
             summary = report_utils.save_results(save_dir_str, log_dir, best_pt_path)
-            report_utils.generate_text_report(log_dir, {'Epochs': epochs, 'Device': 'GPU'}, summary)
+            report_utils.generate_text_report(log_dir, {'Epochs': run_args['epochs'], 'Device': run_args['device'], 'bf16': args.bf16, 'Incremental': incremental}, summary)
             print(f"Report generated at: {{log_dir}}")
         except Exception as e:
             print(f" Report generation failed (ข้ามได้): {{e}}")
@@ -136,7 +134,7 @@ if __name__ == '__main__':
             print("--- Generating Report ---")
             log_dir = report_utils.create_log_directory()
             summary = report_utils.save_results(save_dir_str, log_dir, best_pt_path)
-            report_utils.generate_text_report(log_dir, {'Epochs': epochs, 'Device': 'GPU'}, summary)
+            report_utils.generate_text_report(log_dir, {'Epochs': run_args['epochs'], 'Device': run_args['device'], 'bf16': args.bf16, 'Incremental': incremental}, summary)
             print(f"Report generated at: {log_dir}")
         except Exception as e:
             print(f" Report generation failed (ข้ามได้): {e}")
@@ -0,0 +1,253 @@
+import os
+import sys
+import json
+import time
+import argparse
+from datetime import datetime
+
+import numpy as np
+import torch
+from torch.utils.data import DataLoader
+from ultralytics import YOLO
+from ultralytics.cfg import get_cfg
+from ultralytics.data import build_yolo_dataset
+from ultralytics.data.utils import check_det_dataset
+from ultralytics.utils import DEFAULT_CFG
+
+import inference_utils
+
+
+def cpu_bf16_supported():
+    # CPU ที่มี AVX512-BF16 / AMX รัน bf16 ได้เร็ว เครื่องอื่น torch ใช้วิธี emulate ซึ่งช้ากว่า fp32
+    try:
+        return bool(torch.ops.mkldnn._is_mkldnn_bf16_supported())
+    except (AttributeError, RuntimeError):
+        return False
+
+
+def autocast(enabled=True):
+    # op ที่ไม่อยู่ในรายการ bf16 ของ torch (เช่น softmax, loss) จะถูกรันเป็น fp32 ให้อัตโนมัติ
+    return torch.autocast('cpu', dtype=torch.bfloat16, enabled=enabled)
+
+
+def _to_float(x):
+    if isinstance(x, torch.Tensor):
+        return x.float() if x.dtype == torch.bfloat16 else x
+    if isinstance(x, (list, tuple)):
+        return type(x)(_to_float(v) for v in x)
+    if isinstance(x, dict):
+        return {k: _to_float(v) for k, v in x.items()}
+    return x
+
+
+def smoke_test(module, imgsz=64):
+    # ลองรัน forward ภายใต้ autocast ครั้งหนึ่ง ถ้า op ใดไม่รองรับ bf16 บนเครื่องนี้จะได้ fallback เป็น fp32
+    was_training = module.training
+    try:
+        module.eval()
+        with torch.inference_mode(), autocast():
+            module(torch.zeros(1, 3, imgsz, imgsz))
+        return True
+    except RuntimeError as e:
+        print(f" bf16 autocast ใช้ไม่ได้กับโมเดลนี้ ({e}) ใช้ fp32 แทน")
+        return False
+    finally:
+        module.train(was_training)
+
+
+def enable(model):
+    """
+    inference / validation: ครอบ forward ของ nn model ใน YOLO object ด้วย bf16 autocast
+    output ถูกแปลงกลับเป็น fp32 ก่อนถึง NMS / numpy ใช้ได้ทั้ง model.val, model.predict และ inference_server
+    (ห้ามใช้กับ model ที่จะถูก save หรือ export; เรียก disable ก่อน)
+    """
+    module = model.model
+    if getattr(module, '_bf16_forward', None) is not None:
+        return True
+    if not smoke_test(module):
+        return False
+    forward = module.forward
+
+    def bf16_forward(*args, **kwargs):
+        with autocast():
+            out = forward(*args, **kwargs)
+        return _to_float(out)
+
+    module._bf16_forward = forward
+    module.forward = bf16_forward
+    return True
+
+
+def disable(model):
+    module = model.model
+    forward = getattr(module, '_bf16_forward', None)
+    if forward is not None:
+        del module.forward
+        module._bf16_forward = None
+
+
+def attach_train(model):
+    """
+    training: เปิด autocast ตั้งแต่ on_train_batch_start ถึง on_train_batch_end (forward + loss + backward)
+    เหมือน AMP ของ ultralytics บน GPU ไม่แตะตัว model จึง save checkpoint ได้ตามปกติ
+    validation ระหว่างเทรนยังเป็น fp32 (ใช้ bench ด้านล่างเทียบ mAP แบบ bf16)
+    """
+    state = {'ctx': None}
+
+    def start(trainer):
+        state['ctx'] = autocast()
+        state['ctx'].__enter__()
+
+    def end(trainer):
+        if state['ctx'] is not None:
+            state['ctx'].__exit__(None, None, None)
+            state['ctx'] = None
+
+    model.add_callback('on_train_batch_start', start)
+    model.add_callback('on_train_batch_end', end)
+    model.add_callback('on_train_end', end)
+    return state
+
+
+def add_bf16_args(parser):
+    parser.add_argument("--device", default=None, help="override device ของสคริปต์ เช่น cpu หรือ 0")
+    parser.add_argument("--bf16", action='store_true', help="bf16 autocast (เฉพาะ --device cpu)")
+    return parser
+
+
+def setup(model, device, phase='predict'):
+    """
+    เปิด bf16 ให้ YOLO model ถ้า device เป็น CPU และโมเดลเป็น PyTorch (.pt) คืนค่า True ถ้าเปิดได้
+    phase='train' ใช้ callback (attach_train), phase อื่นครอบ forward (enable)
+    """
+    if str(device).lower() != 'cpu':
+        print(f" --bf16 รองรับเฉพาะ CPU (device={device}) ข้าม bf16")
+        return False
+    if not isinstance(model.model, torch.nn.Module):
+        print(" --bf16 ใช้ได้เฉพาะ weights .pt ข้าม bf16")
+        return False
+    if not cpu_bf16_supported():
+        print(" ⚠️  CPU นี้ไม่มีคำสั่ง bf16 (AVX512-BF16/AMX) autocast จะทำงานได้แต่อาจช้ากว่า fp32")
+    if phase == 'train':
+        if not smoke_test(model.model):
+            return False
+        attach_train(model)
+    elif not enable(model):
+        return False
+    print(f" bf16 autocast: on ({phase})")
+    return True
+
+
+def attach_from_args(model, args, device, phase='train'):
+    # คืนค่า device ที่ใช้จริง (--device ถ้าระบุ) และเปิด bf16 ตาม --bf16
+    device = args.device or device
+    if args.bf16:
+        setup(model, device, phase)
+    return device
+
+
+def bench_train_step(weights, data_yaml, batch=8, steps=10, warmup=2, imgsz=640):
+    """
+    วัดเวลา 1 training step (forward + loss + backward + SGD step) บน batch จริงจาก train split
+    คืนค่า {'fp32': {...}, 'bf16': {...}}
+    """
+    args = get_cfg(DEFAULT_CFG, {'imgsz': imgsz, 'batch': batch})
+    data = check_det_dataset(data_yaml)
+    dataset = build_yolo_dataset(args, data['train'], batch, data, mode='train', rect=False, stride=32)
+    loader = DataLoader(dataset, batch_size=batch, shuffle=False, num_workers=0, collate_fn=dataset.collate_fn)
+    batches = []
+    for b in loader:
+        b['img'] = b['img'].float() / 255
+        batches.append(b)
+        if len(batches) == warmup + steps:
+            break
+
+    out = {}
+    for mode in ('fp32', 'bf16'):
+        model = YOLO(weights).model.float().train()
+        model.args = args
+        for p in model.parameters():
+            p.requires_grad_(True)
+        opt = torch.optim.SGD(model.parameters(), lr=1e-4, momentum=0.9)
+        times = []
+        for i, b in enumerate(batches):
+            t0 = time.perf_counter()
+            with autocast(mode == 'bf16'):
+                loss, _ = model(b)
+                loss = loss.sum()
+            opt.zero_grad(set_to_none=True)
+            loss.backward()
+            opt.step()
+            if i >= warmup:
+                times.append(time.perf_counter() - t0)
+        step = float(np.mean(times)) if times else float('nan')
+        out[mode] = {'step_ms': step * 1000, 'images_per_sec': batch / step, 'loss': float(loss)}
+    return out
+
+
+def bench_inference(weights, data_yaml, imgsz=640, batch=8, runs=5):
+    """
+    images/sec ของ model.predict และ mAP บน test split แบบ fp32 เทียบ bf16 (checkpoint เดียวกัน)
+    """
+    data = check_det_dataset(data_yaml)
+    test_dir = data.get('test') or data['val']
+    paths = inference_utils.list_images(test_dir)[:batch * runs]
+    out = {}
+    for mode in ('fp32', 'bf16'):
+        model = YOLO(weights)
+        if mode == 'bf16' and not enable(model):
+            out[mode] = {'error': 'fallback to fp32'}
+            continue
+        model.predict(paths[:batch], imgsz=imgsz, device='cpu', verbose=False)  # warm-up
+        t0 = time.perf_counter()
+        for i in range(0, len(paths), batch):
+            model.predict(paths[i:i + batch], imgsz=imgsz, device='cpu', verbose=False)
+        sec = time.perf_counter() - t0
+        metrics = model.val(data=data_yaml, split='test' if data.get('test') else 'val', imgsz=imgsz,
+                            batch=batch, device='cpu', plots=False, verbose=False)
+        out[mode] = {'images_per_sec': len(paths) / sec, 'mAP50': float(metrics.box.map50),
+                     'mAP50-95': float(metrics.box.map)}
+    return out
+
+
+def main():
+    sys.stdout.reconfigure(encoding='utf-8')
+    parser = argparse.ArgumentParser(description="fp32 vs bf16 (CPU autocast) benchmark on one checkpoint")
+    parser.add_argument("--weights", required=True)
+    parser.add_argument("--data", default=r'D:\model_cuu\dataset\data.yaml')
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--batch", type=int, default=8)
+    parser.add_argument("--steps", type=int, default=10, help="จำนวน training step ที่วัด")
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--out", default=None, help="บันทึกผลเป็น JSON")
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    print(f" CPU bf16 (AVX512-BF16/AMX): {'yes' if cpu_bf16_supported() else 'no (emulated)'}, threads={torch.get_num_threads()}")
+    train = bench_train_step(args.weights, args.data, args.batch, args.steps, imgsz=args.imgsz)
+    infer = bench_inference(args.weights, args.data, args.imgsz, args.batch)
+
+    print(f"\n{'':<6} {'Step ms':>9} {'Train img/s':>12} {'Infer img/s':>12} {'mAP50':>7} {'mAP50-95':>9}")
+    for mode in ('fp32', 'bf16'):
+        t, i = train[mode], infer[mode]
+        if 'error' in i:
+            print(f"{mode:<6} {t['step_ms']:>9.1f} {t['images_per_sec']:>12.1f}  inference: {i['error']}")
+            continue
+        print(f"{mode:<6} {t['step_ms']:>9.1f} {t['images_per_sec']:>12.1f} {i['images_per_sec']:>12.1f} "
+              f"{i['mAP50']:>7.4f} {i['mAP50-95']:>9.4f}")
+    if 'mAP50-95' in infer['bf16']:
+        print(f" Δ mAP50-95 (bf16 - fp32): {infer['bf16']['mAP50-95'] - infer['fp32']['mAP50-95']:+.4f}, "
+              f"train speedup {train['fp32']['step_ms'] / train['bf16']['step_ms']:.2f}x, "
+              f"inference speedup {infer['bf16']['images_per_sec'] / infer['fp32']['images_per_sec']:.2f}x")
+
+    out = args.out or os.path.join('runs', 'bf16', f"bench_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, 'w', encoding='utf-8') as f:
+        json.dump({'weights': args.weights, 'bf16_native': cpu_bf16_supported(), 'threads': torch.get_num_threads(),
+                   'train': train, 'inference': infer}, f, indent=2)
+    print(f" ผลลัพธ์: {out}")
+
+
+if __name__ == '__main__':
+    main()
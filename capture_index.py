@@ -0,0 +1,175 @@
+import os
+import sys
+import time
+import sqlite3
+import argparse
+
+import capture_utils
+import dataset_rules
+import ingest_journal
+import manifest_utils
+
+INDEX_NAME = 'capture_index.db'
+
+
+class CaptureIndex:
+    """
+    ดัชนี metadata ของรูป (tower, วันที่, เวลา) ที่อ่านจากชื่อไฟล์ครั้งเดียว เก็บใน SQLite ที่ <dataset>/capture_index.db
+    ใช้เลือก subset (เฉพาะรูปรายชั่วโมง / ช่วงวันที่ / บาง tower) เป็นไฟล์รายชื่อรูปแทนการลบไฟล์ทิ้ง
+    update() scandir เฉพาะโฟลเดอร์ที่ mtime เปลี่ยน จึงรันซ้ำได้เร็ว
+    """
+
+    def __init__(self, dataset_root, db_path=None):
+        self.root = dataset_root
+        self.db = sqlite3.connect(db_path or os.path.join(dataset_root, INDEX_NAME))
+        self.db.execute('CREATE TABLE IF NOT EXISTS captures (path TEXT PRIMARY KEY, folder TEXT, split TEXT, '
+                        'tower INTEGER, date TEXT, time TEXT, hour INTEGER, minute INTEGER)')
+        self.db.execute('CREATE TABLE IF NOT EXISTS folders (folder TEXT PRIMARY KEY, mtime REAL)')
+        self.db.execute('CREATE INDEX IF NOT EXISTS captures_folder ON captures (folder)')
+        self.db.execute('CREATE INDEX IF NOT EXISTS captures_date ON captures (date, tower)')
+        self.db.commit()
+
+    def _image_folders(self):
+        # images/{train,val,test} ถ้ามี ไม่เช่นนั้นใช้ images/ ตรงๆ
+        img_root = os.path.join(self.root, 'images')
+        folders = [(os.path.join('images', s), s) for s in ingest_journal.SPLITS
+                   if os.path.isdir(os.path.join(img_root, s))]
+        return folders or [('images', None)]
+
+    def update(self):
+        """
+        เพิ่ม/ลบแถวให้ตรงกับไฟล์ในโฟลเดอร์ คืนค่า (จำนวนที่เพิ่ม, จำนวนที่ลบ, จำนวนโฟลเดอร์ที่ scan)
+        """
+        added = removed = scanned = 0
+        known_mtimes = dict(self.db.execute('SELECT folder, mtime FROM folders'))
+        for folder, split in self._image_folders():
+            path = os.path.join(self.root, folder)
+            if not os.path.isdir(path):
+                continue
+            mtime = os.stat(path).st_mtime
+            if known_mtimes.get(folder) == mtime:
+                continue
+            scanned += 1
+            on_disk = {e.name for e in os.scandir(path)
+                       if e.is_file() and e.name.lower().endswith(ingest_journal.IMG_EXTS)}
+            indexed = {os.path.basename(p) for (p,) in
+                       self.db.execute('SELECT path FROM captures WHERE folder = ?', (folder,))}
+            rows = []
+            for name in on_disk - indexed:
+                # parser เดียวกับ detection_timeseries / change_gate (ชื่อที่ยังไม่ clean ถูก normalize ก่อน)
+                meta = capture_utils.parse_capture_name(dataset_rules.normalize_stem(name))
+                if meta:
+                    ts = meta['timestamp']
+                    rows.append((os.path.join(folder, name), folder, split, meta['tower'], ts.strftime('%Y-%m-%d'),
+                                 ts.strftime('%H:%M:%S'), ts.hour, ts.minute))
+                else:
+                    rows.append((os.path.join(folder, name), folder, split, None, None, None, None, None))
+            gone = [(os.path.join(folder, name),) for name in indexed - on_disk]
+            self.db.executemany('INSERT OR REPLACE INTO captures VALUES (?, ?, ?, ?, ?, ?, ?, ?)', rows)
+            self.db.executemany('DELETE FROM captures WHERE path = ?', gone)
+            self.db.execute('INSERT OR REPLACE INTO folders VALUES (?, ?)', (folder, mtime))
+            self.db.commit()
+            added += len(rows)
+            removed += len(gone)
+        return added, removed, scanned
+
+    def query(self, hourly_only=False, date_from=None, date_to=None, towers=None, hours=None, split=None):
+        """
+        คืนค่า path ของรูป (relative กับ dataset root) ที่ตรงเงื่อนไข เรียงตามชื่อ
+        date_from / date_to = 'YYYY-MM-DD' (รวมวันปลาย), towers / hours = list ของเลข
+        รูปที่อ่าน metadata จากชื่อไม่ได้จะถูกตัดออกเมื่อมีเงื่อนไขของ field นั้น
+        """
+        where, params = [], []
+        if hourly_only:
+            where.append('minute NOT IN (20, 40)')
+        if date_from:
+            where.append('date >= ?')
+            params.append(date_from)
+        if date_to:
+            where.append('date <= ?')
+            params.append(date_to)
+        if towers:
+            where.append(f"tower IN ({','.join('?' * len(towers))})")
+            params += list(towers)
+        if hours:
+            where.append(f"hour IN ({','.join('?' * len(hours))})")
+            params += list(hours)
+        if split:
+            where.append('split = ?')
+            params.append(split)
+        sql = 'SELECT path FROM captures' + (' WHERE ' + ' AND '.join(where) if where else '') + ' ORDER BY path'
+        return [p for (p,) in self.db.execute(sql, params)]
+
+    def write_subset(self, out_dir, base_yaml=None, **filters):
+        """
+        เขียนผลของ query เป็น <out_dir>/{train,val,test}.txt (+ data.yaml ถ้ามี base_yaml) ไม่แตะไฟล์รูป
+        (รูปใน images/ ที่ยังไม่ถูกแบ่ง split จะไม่อยู่ใน manifest)
+        คืนค่า {split: จำนวนรูป}
+        """
+        counts, lists = {}, {}
+        for split in ingest_journal.SPLITS:
+            paths = self.query(split=split, **filters)
+            counts[split] = len(paths)
+            lists[split] = manifest_utils.write_image_list([os.path.join(self.root, p) for p in paths],
+                                                           os.path.join(out_dir, f'{split}.txt'))
+        if base_yaml and os.path.exists(base_yaml):
+            manifest_utils.write_data_yaml(base_yaml, os.path.join(out_dir, 'data.yaml'),
+                                           **lists)
+        return counts
+
+    def stats(self):
+        total, unparsed, non_hourly = self.db.execute(
+            'SELECT COUNT(*), SUM(tower IS NULL), SUM(minute IN (20, 40)) FROM captures').fetchone()
+        first, last = self.db.execute('SELECT MIN(date), MAX(date) FROM captures').fetchone()
+        towers = self.db.execute('SELECT tower, COUNT(*) FROM captures WHERE tower IS NOT NULL '
+                                 'GROUP BY tower ORDER BY tower').fetchall()
+        return {'images': total, 'unparsed': unparsed or 0, 'non_hourly': non_hourly or 0,
+                'first_date': first, 'last_date': last, 'towers': dict(towers)}
+
+
+def _int_list(value):
+    return [int(v) for v in value.split(',')] if value else None
+
+
+def main():
+    sys.stdout.reconfigure(encoding='utf-8')
+    parser = argparse.ArgumentParser(description="Filename-metadata index for subset selection")
+    parser.add_argument("--dataset", default=r'D:\model_cuu\dataset', help="โฟลเดอร์ที่มี images/")
+    sub = parser.add_subparsers(dest='cmd', required=True)
+    sub.add_parser('update', help='อัปเดต index (เฉพาะโฟลเดอร์ที่เปลี่ยน)')
+    p = sub.add_parser('subset', help='เขียนรายชื่อรูปของ subset เป็น split manifest')
+    p.add_argument("--name", required=True, help="ชื่อ subset (เขียนที่ <dataset>/subsets/<name>/)")
+    p.add_argument("--hourly", action='store_true', help="ตัดรูปที่ถ่ายนาทีที่ 20 / 40")
+    p.add_argument("--from", dest='date_from', default=None, help="วันที่เริ่ม YYYY-MM-DD")
+    p.add_argument("--to", dest='date_to', default=None, help="วันที่สิ้นสุด YYYY-MM-DD (รวมวันนั้น)")
+    p.add_argument("--towers", default=None, help="เช่น 1,5,7")
+    p.add_argument("--hours", default=None, help="ชั่วโมงที่ต้องการ เช่น 8,12,16")
+    sub.add_parser('stats')
+    args = parser.parse_args()
+
+    index = CaptureIndex(args.dataset)
+    t0 = time.perf_counter()
+    added, removed, scanned = index.update()
+    if scanned or args.cmd == 'update':
+        print(f" index: +{added} / -{removed} รูป (scan {scanned} โฟลเดอร์, {time.perf_counter() - t0:.2f}s)")
+
+    if args.cmd == 'subset':
+        out_dir = os.path.join(args.dataset, 'subsets', args.name)
+        t0 = time.perf_counter()
+        counts = index.write_subset(out_dir, os.path.join(args.dataset, 'data.yaml'), hourly_only=args.hourly,
+                                    date_from=args.date_from, date_to=args.date_to,
+                                    towers=_int_list(args.towers), hours=_int_list(args.hours))
+        print(f" subset '{args.name}': train={counts['train']} val={counts['val']} test={counts['test']} "
+              f"({(time.perf_counter() - t0) * 1000:.0f} ms) -> {out_dir}")
+        if os.path.exists(os.path.join(out_dir, 'data.yaml')):
+            print(f" ใช้เทรนด้วย data={os.path.join(out_dir, 'data.yaml')}")
+    elif args.cmd == 'stats':
+        s = index.stats()
+        print(f" images={s['images']} (อ่านชื่อไม่ได้ {s['unparsed']}, 20/40 นาที {s['non_hourly']}) "
+              f"ช่วงวันที่ {s['first_date']} - {s['last_date']}")
+        for tower, n in s['towers'].items():
+            print(f"   tower {tower:<3} {n}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,31 @@
+import os
+import re
+from datetime import datetime, timezone
+
+# ชื่อไฟล์มาตรฐานหลังทำความสะอาด: <tower>_<YYYYMMDD>_<HHMMSS>_panorama.jpg
+# ตัวอย่าง: 5_20250517_000334_panorama.jpg
+CAPTURE_PATTERN = re.compile(r'^(\d+)_(\d{8})_(\d{6})_panorama')
+
+
+def parse_capture_name(name):
+    """
+    แยก tower ID / วันที่ / เวลา จากชื่อไฟล์ panorama
+    คืนค่า None ถ้าชื่อไม่ตรงรูปแบบ
+    """
+    m = CAPTURE_PATTERN.match(os.path.basename(name))
+    if not m:
+        return None
+    try:
+        ts = datetime.strptime(m.group(2) + m.group(3), '%Y%m%d%H%M%S')
+    except ValueError:
+        return None
+    return {'tower': int(m.group(1)), 'date': m.group(2), 'time': m.group(3), 'timestamp': ts}
+
+
+def hour_index(ts):
+    # จำนวนชั่วโมงนับจาก 1970-01-01 (ใช้เวลาตามกล้อง ไม่แปลง timezone)
+    return int(ts.replace(tzinfo=timezone.utc).timestamp() // 3600)
+
+
+def ts_key(ts):
+    return int(ts.strftime('%Y%m%d%H%M%S'))
@@ -0,0 +1,212 @@
+import os
+import sys
+import json
+import time
+import argparse
+from datetime import datetime
+import numpy as np
+import cv2
+from ultralytics import YOLO
+
+import capture_utils
+import inference_utils
+import inference_cache
+import tiled_inference
+
+SIGNATURE_SIZE = (96, 24)  # (w, h) ของ panorama หลังย่อ
+
+
+def compute_signature(path, size=SIGNATURE_SIZE):
+    # decode แบบย่อ 1/8 + grayscale ตั้งแต่ตอนอ่านไฟล์ จึงถูกกว่าการอ่านภาพเต็มมาก
+    img = cv2.imread(path, cv2.IMREAD_REDUCED_GRAYSCALE_8)
+    if img is None:
+        return None
+    return cv2.resize(img, size, interpolation=cv2.INTER_AREA).astype(np.float32)
+
+
+def _capture_time(name):
+    info = capture_utils.parse_capture_name(name)
+    return info['timestamp'] if info else datetime.min
+
+
+def signature_diff(a, b):
+    return float(np.abs(a - b).mean() / 255.0)
+
+
+class ChangeGate:
+    """
+    เก็บ signature + detections ล่าสุดที่รันจริงของแต่ละ tower
+    รูปใหม่ที่ต่างจากรูปอ้างอิงน้อยกว่า threshold จะใช้ detections เดิมแทนการรันโมเดล
+    """
+
+    def __init__(self, threshold=0.02, max_skip=12, state_path=None):
+        self.threshold = threshold
+        self.max_skip = max_skip
+        self.state_path = state_path
+        self.refs = {}
+        self.stats = {'images': 0, 'run': 0, 'skipped': 0, 'gate_sec': 0.0, 'detector_sec': 0.0}
+        if state_path and os.path.exists(state_path):
+            self._load()
+
+    def _load(self):
+        with open(self.state_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        for tower, ref in data.items():
+            self.refs[tower] = {
+                'name': ref['name'],
+                'signature': np.array(ref['signature'], np.float32).reshape(SIGNATURE_SIZE[::-1]),
+                'det': inference_utils.detections_from_json(ref['det']),
+                'skips': ref['skips'],
+            }
+
+    def save(self):
+        if not self.state_path:
+            return
+        data = {tower: {'name': ref['name'], 'signature': ref['signature'].astype(np.uint8).ravel().tolist(),
+                        'det': inference_utils.detections_to_json(ref['det']), 'skips': ref['skips']}
+                for tower, ref in self.refs.items()}
+        tmp = self.state_path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(tmp, self.state_path)
+
+    def plan(self, paths):
+        """
+        ตัดสินใจจาก signature อย่างเดียว (ยังไม่รันโมเดล และไม่แก้ state: skips นับแยกไว้ในรอบนี้
+        แล้วค่อยบันทึกใน run() หลัง detect สำเร็จ)
+        คืนค่า (to_run, reuse, new_refs) โดย reuse = {path: path รูปอ้างอิงในรอบนี้ หรือ None ถ้าอ้างอิงจาก state เดิม}
+        และ new_refs = รูปอ้างอิงใหม่ของแต่ละ tower ที่จะถูกรันในรอบนี้
+        """
+        t0 = time.perf_counter()
+
+        def sort_key(p):
+            info = capture_utils.parse_capture_name(p)
+            return (0, info['tower'], info['timestamp']) if info else (1, 0, os.path.basename(p))
+
+        to_run, reuse = [], {}
+        pending_sig = {}
+        used = {}  # tower -> จำนวนรูปที่ข้ามโดยอ้างอิงรูปอ้างอิงปัจจุบันของ tower นั้นในรอบนี้
+        for path in sorted(paths, key=sort_key):
+            info = capture_utils.parse_capture_name(path)
+            sig = compute_signature(path) if info else None
+            if sig is None:
+                to_run.append(path)
+                continue
+            tower = str(info['tower'])
+            ref = pending_sig.get(tower) or self.refs.get(tower)
+            if (ref is not None and ref['skips'] + used.get(tower, 0) < self.max_skip
+                    and signature_diff(sig, ref['signature']) < self.threshold):
+                used[tower] = used.get(tower, 0) + 1
+                reuse[path] = ref.get('path')
+            else:
+                to_run.append(path)
+                pending_sig[tower] = {'path': path, 'signature': sig, 'skips': 0}
+                used[tower] = 0
+        self.stats['gate_sec'] += time.perf_counter() - t0
+        return to_run, reuse, pending_sig
+
+    def run(self, paths, detect_fn):
+        """
+        detect_fn(list ของ path) -> {path: detections}
+        คืนค่า {path: detections} (รูปที่ถูกข้ามจะได้ detections ของรูปอ้างอิง)
+        รูปที่ detect ไม่สำเร็จจะไม่มีใน dict ผลลัพธ์ ผู้เรียกต้องนับเป็น failed
+        """
+        to_run, reuse, new_refs = self.plan(paths)
+        t0 = time.perf_counter()
+        dets = detect_fn(to_run) if to_run else {}
+        # รูปอ้างอิงในรอบนี้ที่ไม่มีผล (อ่านไม่ได้ / ไฟล์เสีย) ใช้แทนไม่ได้ ต้องรันโมเดลกับรูปที่ข้ามไปเอง
+        # (ถ้าใช้ detections ว่างจะกลายเป็นรายงานว่าไม่มีต้นเลย)
+        orphans = [path for path, ref_path in reuse.items() if ref_path is not None and ref_path not in dets]
+        if orphans:
+            dets.update(detect_fn(orphans))
+        self.stats['detector_sec'] += time.perf_counter() - t0
+        orphan_set = set(orphans)
+
+        # resolve รูปที่ถูกข้ามให้ครบก่อน แล้วจึงแทนรูปอ้างอิงใน state ด้วยรูปใหม่ของรอบนี้
+        # (ไม่อย่างนั้นรูปที่อ้างอิง state เดิมจะได้ detections ของรูปอ้างอิงใหม่ที่ถ่ายทีหลัง)
+        # นับ skips ตรงนี้ (หลัง detect สำเร็จ) ถ้า detect_fn error ไป state จะไม่ถูกแก้
+        new_skips = {}
+        for path, ref_path in reuse.items():
+            if path in orphan_set:
+                continue
+            if ref_path is not None:
+                dets[path] = dets[ref_path]
+                new_skips[ref_path] = new_skips.get(ref_path, 0) + 1
+            else:
+                ref = self.refs[str(capture_utils.parse_capture_name(path)['tower'])]
+                dets[path] = ref['det']
+                ref['skips'] += 1
+        for tower, ref in new_refs.items():
+            # batch ที่มาช้ากว่ารูปอ้างอิงเดิม (retry / backlog) ต้องไม่แทนรูปอ้างอิงที่ถ่ายทีหลัง
+            cur = self.refs.get(tower)
+            if cur is not None and _capture_time(cur['name']) > _capture_time(ref['path']):
+                continue
+            if ref['path'] in dets:
+                self.refs[tower] = {'name': os.path.basename(ref['path']), 'signature': ref['signature'],
+                                    'det': dets[ref['path']], 'skips': new_skips.get(ref['path'], 0)}
+
+        self.stats['images'] += len(paths)
+        self.stats['run'] += len(to_run) + len(orphans)
+        self.stats['skipped'] += len(reuse) - len(orphans)
+        return dets
+
+    def report(self):
+        s = self.stats
+        per_image = s['detector_sec'] / s['run'] if s['run'] else 0.0
+        saved = s['skipped'] * per_image
+        return {
+            **s,
+            'skip_rate': s['skipped'] / s['images'] if s['images'] else 0.0,
+            'detector_sec_per_image': per_image,
+            'est_saved_sec': saved,
+            'net_saved_sec': saved - s['gate_sec'],
+        }
+
+
+def print_report(rep):
+    print(f" Images        : {rep['images']}")
+    print(f" Detector runs : {rep['run']}")
+    print(f" Skipped       : {rep['skipped']} ({rep['skip_rate'] * 100:.1f}%)")
+    print(f" Gate overhead : {rep['gate_sec']:.2f} s")
+    print(f" Compute saved : ~{rep['est_saved_sec']:.2f} s (net {rep['net_saved_sec']:.2f} s)")
+
+
+def main():
+    sys.stdout.reconfigure(encoding='utf-8')
+    parser = argparse.ArgumentParser(description="Skip inference on panoramas that did not change since the last capture")
+    parser.add_argument("--weights", required=True)
+    parser.add_argument("--source", required=True, help="โฟลเดอร์รูป")
+    parser.add_argument("--out", default='detections_gated.json')
+    parser.add_argument("--state", default='gate_state.json', help="ไฟล์เก็บรูปอ้างอิงล่าสุดของแต่ละ tower")
+    parser.add_argument("--threshold", type=float, default=0.02, help="ค่าความต่างเฉลี่ย (0-1) ที่ถือว่าไม่เปลี่ยน")
+    parser.add_argument("--max-skip", type=int, default=12, help="บังคับรันโมเดลใหม่หลังข้ามติดกันกี่รูป")
+    parser.add_argument("--tiled", action='store_true', help="ใช้ tiled inference")
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--batch", type=int, default=16)
+    parser.add_argument("--device", default=None)
+    parser.add_argument("--cache", default=None, help="โฟลเดอร์ inference cache (ไม่ใส่ = ไม่ใช้ cache)")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.source):
+        print(f"Error: ไม่พบโฟลเดอร์ {args.source}")
+        return
+
+    model = YOLO(args.weights)
+    cache = inference_cache.InferenceCache(args.cache) if args.cache else None
+    if args.tiled:
+        detect_fn = lambda ps: tiled_inference.predict_tiled(model, ps, imgsz=args.imgsz, batch=args.batch,
+                                                             device=args.device, cache=cache)[0]
+    else:
+        detect_fn = lambda ps: inference_utils.predict_images(model, ps, imgsz=args.imgsz, batch=args.batch,
+                                                              device=args.device, cache=cache)
+
+    gate = ChangeGate(args.threshold, args.max_skip, args.state)
+    dets = gate.run(inference_utils.list_images(args.source), detect_fn)
+    gate.save()
+    inference_utils.save_detections(dets, args.out)
+    print_report(gate.report())
+    print(f" Detections saved to: {args.out}")
+
+
+if __name__ == '__main__':
+    main()
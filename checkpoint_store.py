@@ -0,0 +1,216 @@
+import os
+import sys
+import json
+import stat
+import time
+import shutil
+import sqlite3
+import argparse
+
+import hash_utils
+
+WEIGHT_EXTS = ('.pt', '.onnx')
+
+
+class CheckpointStore:
+    """
+    ที่เก็บ weights แบบ content-addressed: blobs/<sha[:2]>/<sha><ext>
+    blob เป็นสำเนาของตัวเอง (copy ตอน add) และถูกตั้งเป็น read-only จึงไม่กระทบไฟล์ต้นทางใน runs/
+    ยกเว้น add(link=True) (ใช้ตอนทำ report หลังเทรนจบ) ที่ hardlink ไฟล์ต้นทางเป็น blob เลยและไม่ chmod
+    ไฟล์ใน training_logs/ เป็น hardlink ไปยัง blob เดียวกัน จึงไม่เสียพื้นที่ซ้ำ
+    (ถ้า hardlink ไม่ได้ เช่นคนละไดรฟ์ จะเขียนไฟล์ <ชื่อ>.ref ที่ชี้ไปยัง blob แทน)
+    weights ใน runs/ จะถูกแทนด้วย hardlink (read-only) เฉพาะเมื่อสั่ง dedupe(link=True) กับ run ที่จบแล้ว
+    """
+
+    def __init__(self, root='checkpoint_store'):
+        self.root = root
+        os.makedirs(os.path.join(root, 'blobs'), exist_ok=True)
+        self.db = sqlite3.connect(os.path.join(root, 'index.db'))
+        self.db.execute('CREATE TABLE IF NOT EXISTS blobs (sha TEXT PRIMARY KEY, ext TEXT, size INTEGER, added REAL)')
+        self.db.execute('CREATE TABLE IF NOT EXISTS refs (path TEXT PRIMARY KEY, sha TEXT, run TEXT, kind TEXT, added REAL)')
+        self.db.execute('CREATE INDEX IF NOT EXISTS refs_sha ON refs (sha)')
+        self.db.commit()
+
+    def blob_path(self, sha, ext):
+        return os.path.join(self.root, 'blobs', sha[:2], sha + ext)
+
+    def add(self, path, link=False):
+        # นำไฟล์เข้า store คืนค่า sha256
+        # ปกติ copy แล้ว chmod read-only (chmod กับ inode ที่แชร์กับ path จะทำให้ไฟล์ต้นทางเขียน/ลบไม่ได้ไปด้วย)
+        # link=True: hardlink path เป็น blob (ไม่เสียพื้นที่เพิ่ม ไม่ chmod) ใช้กับไฟล์ที่จะไม่ถูกเขียนทับอีก
+        # ถ้า hardlink ไม่ได้ (คนละไดรฟ์) จะ copy แทน
+        sha = hash_utils.cached_file_sha256(path)
+        ext = os.path.splitext(path)[1]
+        blob = self.blob_path(sha, ext)
+        if not os.path.exists(blob):
+            os.makedirs(os.path.dirname(blob), exist_ok=True)
+            tmp = blob + '.tmp'
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            linked = False
+            if link:
+                try:
+                    os.link(path, tmp)
+                    linked = True
+                except OSError:
+                    pass
+            if not linked:
+                shutil.copy2(path, tmp)
+                os.chmod(tmp, stat.S_IREAD | stat.S_IRGRP | stat.S_IROTH)
+            os.replace(tmp, blob)
+            self.db.execute('INSERT OR REPLACE INTO blobs VALUES (?, ?, ?, ?)',
+                            (sha, ext, os.path.getsize(blob), time.time()))
+            self.db.commit()
+        return sha
+
+    def _blob_for(self, sha):
+        row = self.db.execute('SELECT ext FROM blobs WHERE sha = ?', (sha,)).fetchone()
+        if row is None:
+            raise KeyError(f'ไม่พบ blob {sha}')
+        return self.blob_path(sha, row[0])
+
+    def _register(self, path, sha, run, kind):
+        self.db.execute('INSERT OR REPLACE INTO refs VALUES (?, ?, ?, ?, ?)',
+                        (os.path.abspath(path), sha, run, kind, time.time()))
+        self.db.commit()
+
+    def link(self, sha, dest, run=None, kind='log'):
+        """
+        สร้าง dest เป็น hardlink ไปยัง blob คืนค่า path ที่สร้างจริง (dest หรือ dest + '.ref')
+        """
+        blob = self._blob_for(sha)
+        os.makedirs(os.path.dirname(os.path.abspath(dest)), exist_ok=True)
+        if os.path.exists(dest):
+            if os.path.samefile(dest, blob):
+                self._register(dest, sha, run, kind)
+                return dest
+            os.remove(dest)
+        try:
+            os.link(blob, dest)
+        except OSError:
+            dest = dest + '.ref'
+            with open(dest, 'w', encoding='utf-8') as f:
+                json.dump({'sha256': sha, 'blob': os.path.abspath(blob)}, f, indent=2)
+        self._register(dest, sha, run, kind)
+        return dest
+
+    def dedupe(self, path, run=None, kind='run', link=False):
+        """
+        นำไฟล์เข้า store และบันทึก ref ; link=True แทนที่ไฟล์เดิมด้วย hardlink ไปยัง blob (เหลือบนดิสก์ชุดเดียว)
+        ไฟล์ที่ถูก link จะกลายเป็น read-only ใช้กับ run ที่เทรนจบแล้วเท่านั้น (resume / เขียน last.pt ทับจะไม่ได้)
+        """
+        sha = self.add(path)
+        blob = self._blob_for(sha)
+        if link and not os.path.samefile(path, blob):
+            tmp = path + '.tmp_link'
+            try:
+                os.link(blob, tmp)
+                os.replace(tmp, path)
+            except OSError:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+        self._register(path, sha, run, kind)
+        return sha
+
+    def scan_runs(self, runs_dir='runs', link=False):
+        # index weights ทั้งหมดใน runs/<task>/<name>/weights/ (best.pt, last.pt, best.onnx) ; link=True ดู dedupe
+        count = 0
+        for dirpath, _, files in os.walk(runs_dir):
+            if os.path.basename(dirpath) != 'weights':
+                continue
+            run = os.path.dirname(dirpath)
+            for name in files:
+                if name.endswith(WEIGHT_EXTS):
+                    self.dedupe(os.path.join(dirpath, name), run=run, link=link)
+                    count += 1
+        return count
+
+    def lookup(self, sha_prefix):
+        # hash (หรือ prefix) -> run และไฟล์ทั้งหมดที่อ้างถึง blob นั้น
+        return self.db.execute('SELECT sha, path, run, kind, added FROM refs WHERE sha LIKE ? ORDER BY added',
+                               (sha_prefix + '%',)).fetchall()
+
+    def gc(self, dry_run=True):
+        """
+        ลบ ref ที่ไฟล์ถูกลบไปแล้ว และลบ blob ที่ไม่มี ref เหลืออยู่
+        คืนค่า (จำนวน ref ที่หาย, จำนวน blob ที่ลบ, ไบต์ที่คืนได้)
+        """
+        refs = self.db.execute('SELECT path, sha FROM refs').fetchall()
+        stale = [p for p, _ in refs if not os.path.exists(p)]
+        live = {sha for p, sha in refs if os.path.exists(p)}
+        if not dry_run:
+            self.db.executemany('DELETE FROM refs WHERE path = ?', [(p,) for p in stale])
+        freed, removed = 0, 0
+        for sha, ext, size in self.db.execute('SELECT sha, ext, size FROM blobs').fetchall():
+            if sha in live:
+                continue
+            blob = self.blob_path(sha, ext)
+            removed += 1
+            # พื้นที่จะคืนจริงเมื่อไม่มี hardlink อื่นเหลือ (st_nlink == 1)
+            if os.path.exists(blob) and os.stat(blob).st_nlink == 1:
+                freed += size
+            if not dry_run:
+                if os.path.exists(blob):
+                    os.chmod(blob, stat.S_IWRITE | stat.S_IREAD)
+                    os.remove(blob)
+                self.db.execute('DELETE FROM blobs WHERE sha = ?', (sha,))
+        if not dry_run:
+            self.db.commit()
+        return len(stale), removed, freed
+
+    def stats(self):
+        n_blobs, size = self.db.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM blobs').fetchone()
+        n_refs = self.db.execute('SELECT COUNT(*) FROM refs').fetchone()[0]
+        return {'blobs': n_blobs, 'refs': n_refs, 'bytes': size,
+                # ขนาดที่จะใช้ถ้าทุก ref เป็นไฟล์ copy แยก
+                'logical_bytes': self.db.execute('SELECT COALESCE(SUM(b.size), 0) FROM refs r JOIN blobs b ON r.sha = b.sha').fetchone()[0]}
+
+
+def link_checkpoint(model_path, dest, run=None, root='checkpoint_store'):
+    """
+    ใช้แทน shutil.copy2(best.pt, log_dir/models/best.pt): log ทุกชุดที่มี weights เดียวกันใช้ blob เดียว
+    เรียกหลังเทรนจบ: best.pt ใน runs/ ถูก hardlink เป็น blob (ถ้ายังไม่มี) จึงไม่มีการ copy weights เลย
+    """
+    store = CheckpointStore(root)
+    sha = store.add(model_path, link=True)
+    store._register(model_path, sha, run, 'run')
+    return store.link(sha, dest, run=run, kind='log')
+
+
+def main():
+    sys.stdout.reconfigure(encoding='utf-8')
+    parser = argparse.ArgumentParser(description="Content-addressed checkpoint store")
+    parser.add_argument("--root", default='checkpoint_store')
+    sub = parser.add_subparsers(dest='cmd', required=True)
+    p = sub.add_parser('scan', help='index weights ใน runs/')
+    p.add_argument("--runs", default='runs')
+    p.add_argument("--link", action='store_true', help="แทน weights ใน runs/ ด้วย hardlink read-only (เฉพาะ run ที่จบแล้ว)")
+    p = sub.add_parser('lookup', help='หา run ที่สร้าง hash นี้')
+    p.add_argument("sha")
+    p = sub.add_parser('gc', help='ลบ blob ที่ไม่มีใครอ้างถึง')
+    p.add_argument("--yes", action='store_true', help="ยืนยันลบจริง (ถ้าไม่ใส่จะเป็นแค่ Preview)")
+    sub.add_parser('stats')
+    args = parser.parse_args()
+
+    store = CheckpointStore(args.root)
+    if args.cmd == 'scan':
+        print(f" {'Deduplicated' if args.link else 'Indexed'} {store.scan_runs(args.runs, args.link)} weight files")
+        args.cmd = 'stats'
+    if args.cmd == 'lookup':
+        rows = store.lookup(args.sha)
+        if not rows:
+            print(f" ไม่พบ hash {args.sha}")
+        for sha, path, run, kind, added in rows:
+            print(f" {sha[:12]}  [{kind}] run={run}  {path}  ({time.strftime('%Y-%m-%d %H:%M', time.localtime(added))})")
+    elif args.cmd == 'gc':
+        stale, removed, freed = store.gc(dry_run=not args.yes)
+        prefix = '' if args.yes else '[Dry-Run] '
+        print(f" {prefix}stale refs={stale}, blobs removed={removed}, freed={freed / 1024 ** 2:.1f} MB")
+    elif args.cmd == 'stats':
+        s = store.stats()
+        print(f" blobs={s['blobs']} refs={s['refs']} size={s['bytes'] / 1024 ** 2:.1f} MB "
+              f"(without dedup: {s['logical_bytes'] / 1024 ** 2:.1f} MB)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+import os
+import re
+
+# ตารางมาตรฐาน (Master Index) ที่ dataset ปลายทางใช้
+CLASS_NAMES = {
+    0: "Italian",
+    1: "Deer Tongue",
+    2: "Green Lollo Rossa",
+    3: "Red Coral",
+    4: "Caramel Romaine",
+    5: "Empty",
+}
+
+# mapping ต่อแหล่งข้อมูล: Old_ID (ของแหล่งนั้น) -> New_ID (ตามตารางมาตรฐาน)
+# ID ที่ไม่อยู่ใน mapping จะคงเดิม (เหมือน changeclass.remap_yolo_labels)
+SOURCE_MAPPINGS = {
+    'data1': {
+        0: 0,  # Italian -> Italian
+        1: 3,  # Red Coral -> Red Coral (Index 3)
+        2: 4,  # Caramel Romaine -> Caramel Romaine (Index 4)
+        3: 5,  # No sponge -> Empty (Index 5)
+    },
+}
+
+IMG_EXTS = ('.jpg', '.jpeg', '.png')
+# label ที่ถูกบันทึกเป็น .jpg ในโฟลเดอร์ labels ก็นับเป็น label (delete_image.convert_jpg_labels_to_txt)
+LABEL_EXTS = ('.txt',) + IMG_EXTS
+
+# pattern เดียวกับสคริปต์ delete_*.py ใน pre-process
+HASH_PREFIX = re.compile(r'^[a-f0-9]+-(\d+_.+)$', re.IGNORECASE)   # 62fb71e-5_2025... -> 5_2025...
+LONG_NAME = re.compile(r'^(\d+)_.+?_(\d{8}_\d{6}_panorama.*)$')     # 5_05-17_5_2025... -> 5_2025...
+NON_HOURLY = re.compile(r'_\d{8}_\d{2}(20|40)\d{2}_')               # ถ่ายนาทีที่ 20 / 40
+EXT_SUFFIXES = ('_jpg', '_jpeg', '_png', '.jpg', '.jpeg', '.png')   # ..._panorama_jpg.rf.xxx / _jpg.txt
+
+
+def normalize_stem(name):
+    """
+    แปลงชื่อไฟล์ (รูปหรือ label) เป็นชื่อมาตรฐานไม่รวมนามสกุล เช่น 5_20250517_000034_panorama
+    รวมกฎของ delete_name / delete_imagejpg / delete_imagetxt ไว้ในฟังก์ชันเดียว (ไม่แตะไฟล์)
+    """
+    stem = name.split('.rf.')[0] if '.rf.' in name else os.path.splitext(name)[0]
+    for suf in EXT_SUFFIXES:
+        if stem.lower().endswith(suf):
+            stem = stem[:-len(suf)]
+            break
+    m = HASH_PREFIX.match(stem)
+    if m:
+        stem = m.group(1)
+    m = LONG_NAME.match(stem)
+    if m:
+        stem = f"{m.group(1)}_{m.group(2)}"
+    return stem
+
+
+def is_non_hourly(stem):
+    return NON_HOURLY.search(stem + '_') is not None
+
+
+def remap_label_text(text, mapping=None, tol=1e-3):
+    """
+    remap class ID และตรวจ label ในหน่วยความจำ
+    คืนค่า (ข้อความใหม่, จำนวนบรรทัดที่เปลี่ยน class, รายการปัญหา)
+    ถ้ารายการปัญหาไม่ว่าง แปลว่า label นี้ไม่ควรถูก ingest
+    """
+    mapping = mapping or {}
+    out, problems = [], []
+    changed = 0
+    for i, line in enumerate(text.splitlines(), 1):
+        parts = line.split()
+        if not parts:
+            continue
+        if len(parts) != 5:
+            problems.append(f"line {i}: ต้องมี 5 ค่า (พบ {len(parts)})")
+            continue
+        try:
+            old_id = int(parts[0])
+            x, y, w, h = (float(v) for v in parts[1:])
+        except ValueError:
+            problems.append(f"line {i}: อ่านค่าไม่ได้ '{line.strip()}'")
+            continue
+        new_id = mapping.get(old_id, old_id)
+        if new_id not in CLASS_NAMES:
+            problems.append(f"line {i}: class ID {new_id} ไม่อยู่ในตารางมาตรฐาน")
+            continue
+        if not (-tol <= x <= 1 + tol and -tol <= y <= 1 + tol and 0 < w <= 1 + tol and 0 < h <= 1 + tol):
+            problems.append(f"line {i}: พิกัดเกินขอบเขต [0, 1]")
+            continue
+        if new_id != old_id:
+            parts[0] = str(new_id)
+            changed += 1
+        out.append(" ".join(parts))
+    return "\n".join(out) + ("\n" if out else ""), changed, problems
@@ -0,0 +1,362 @@
+"""
+เทรนแบบ data-parallel บน CPU (torch.distributed + gloo) ด้วย recipe เดียวกับ train_main_method_3
+ultralytics รองรับ DDP เฉพาะ CUDA จึงเขียน loop เองตามขั้นตอนของ trainer: เลือก optimizer (auto), สะสม gradient
+ตาม nbs + scale weight decay, warmup lr/momentum, EMA, close_mosaic, validate ทุก epoch บน rank 0 แล้วเก็บ best.pt
+และ early stopping ตาม patience ; --max-steps = โหมดวัด throughput (ไม่ validate / ไม่บันทึก weights)
+"""
+import os
+import sys
+import json
+import math
+import time
+import argparse
+import subprocess
+from copy import deepcopy
+from datetime import datetime, timedelta
+
+import numpy as np
+import torch
+import torch.distributed as dist
+import torch.multiprocessing as mp
+from torch import nn
+from torch.nn.parallel import DistributedDataParallel as DDP
+from torch.utils.data import DataLoader
+from torch.utils.data.distributed import DistributedSampler
+from ultralytics import YOLO
+from ultralytics.cfg import get_cfg
+from ultralytics.data import build_yolo_dataset
+from ultralytics.data.utils import check_det_dataset
+from ultralytics.utils import DEFAULT_CFG
+from ultralytics.utils.torch_utils import ModelEMA, torch_distributed_zero_first
+
+import train_main_method_3 as recipe
+
+dataset_root = recipe.dataset_root
+base_weights = recipe.base_weights
+# ใช้ค่าเดียวกับ recipe แต่เทรนบน CPU (ultralytics รองรับ DDP เฉพาะ CUDA จึงเขียน loop เอง)
+train_args = dict(recipe.train_args, device='cpu', project='runs/ddp_cpu', name='my_lettuce_model_ddp_cpu')
+ddp_args = dict(
+    nproc_per_node=4,
+    nnodes=1,
+    node_rank=0,
+    master_addr='127.0.0.1',
+    master_port=29500,
+    workers=2,           # dataloader workers ต่อ process
+    threads=None,        # torch threads ต่อ process (None = จำนวน core / nproc_per_node)
+    timeout_min=120,     # rank อื่นรอ rank 0 validate ได้นานสุดกี่นาที (ค่าเริ่มต้นของ gloo คือ 30)
+)
+
+
+def _lr_lambda(epochs, lrf, cos_lr=False):
+    # เหมือน ultralytics: cosine (one_cycle) เมื่อ cos_lr=True ไม่อย่างนั้น linear decay
+    if cos_lr:
+        return lambda e: max((1 - math.cos(e * math.pi / epochs)) / 2, 0) * (lrf - 1) + 1
+    return lambda e: max(1 - e / epochs, 0) * (1.0 - lrf) + lrf
+
+
+def build_optimizer(model, name, lr0, momentum, weight_decay, nc, iterations, args):
+    """
+    เลือก optimizer แบบเดียวกับ BaseTrainer.build_optimizer ของ ultralytics
+    'auto' = AdamW + lr ที่คำนวณจากจำนวน class ถ้าจำนวน iteration <= 10000 ไม่อย่างนั้น SGD lr 0.01
+    param group: 0 = bias (ไม่ decay), 1 = weight ของ conv/linear (decay), 2 = weight ของ BN (ไม่ decay)
+    """
+    if name == 'auto':
+        lr_fit = round(0.002 * 5 / (4 + nc), 6)
+        name, lr0, momentum = ('SGD', 0.01, 0.9) if iterations > 10000 else ('AdamW', lr_fit, 0.9)
+        args.warmup_bias_lr = 0.0  # Adam ไม่ควรเริ่ม bias lr สูง
+    bn = tuple(v for k, v in nn.__dict__.items() if 'Norm' in k)
+    g = [[], [], []]
+    for module_name, module in model.named_modules():
+        for param_name, param in module.named_parameters(recurse=False):
+            if 'bias' in param_name:
+                g[0].append(param)
+            elif isinstance(module, bn):
+                g[2].append(param)
+            else:
+                g[1].append(param)
+    if name in ('Adam', 'Adamax', 'AdamW', 'NAdam', 'RAdam'):
+        optimizer = getattr(torch.optim, name)(g[0], lr=lr0, betas=(momentum, 0.999), weight_decay=0.0)
+    elif name.lower() == 'rmsprop':
+        optimizer = torch.optim.RMSprop(g[0], lr=lr0, momentum=momentum)
+    elif name == 'SGD':
+        optimizer = torch.optim.SGD(g[0], lr=lr0, momentum=momentum, nesterov=True)
+    else:
+        raise NotImplementedError(f"ไม่รองรับ optimizer '{name}'")
+    optimizer.add_param_group({'params': g[1], 'weight_decay': weight_decay})
+    optimizer.add_param_group({'params': g[2], 'weight_decay': 0.0})
+    return optimizer, name
+
+
+def _worker(local_rank, cfg):
+    rank = cfg['node_rank'] * cfg['nproc_per_node'] + local_rank
+    world = cfg['nnodes'] * cfg['nproc_per_node']
+    torch.set_num_threads(cfg['threads'] or max(1, (os.cpu_count() or 1) // cfg['nproc_per_node']))
+    dist.init_process_group('gloo', init_method=f"tcp://{cfg['master_addr']}:{cfg['master_port']}",
+                            rank=rank, world_size=world, timeout=timedelta(minutes=cfg['timeout_min']))
+    try:
+        result = _train(rank, local_rank, world, cfg)
+        if rank == 0 and cfg.get('result_path'):
+            with open(cfg['result_path'], 'w', encoding='utf-8') as f:
+                json.dump(result, f, indent=2)
+    finally:
+        dist.destroy_process_group()
+
+
+def _loader(dataset, sampler, batch, workers):
+    return DataLoader(dataset, batch_size=batch, sampler=sampler, num_workers=workers,
+                      collate_fn=dataset.collate_fn, drop_last=True, persistent_workers=workers > 0)
+
+
+def _save_checkpoint(path, epoch, ema, best_fitness, args):
+    # รูปแบบเดียวกับ checkpoint ของ ultralytics (YOLO(path) โหลด 'ema') ไม่เก็บ optimizer จึง resume ไม่ได้
+    torch.save({'epoch': epoch, 'best_fitness': best_fitness, 'model': None, 'ema': deepcopy(ema.ema).half(),
+                'updates': ema.updates, 'optimizer': None, 'train_args': vars(args),
+                'date': datetime.now().isoformat()}, path)
+
+
+def _validate(weights, data, args):
+    metrics = YOLO(weights).val(data=data, split='val', imgsz=args.imgsz, batch=args.batch, device='cpu',
+                                plots=False, verbose=False)
+    return float(metrics.fitness), {'mAP50': float(metrics.box.map50), 'mAP50-95': float(metrics.box.map)}
+
+
+def _train(rank, local_rank, world, cfg):
+    args = get_cfg(DEFAULT_CFG, cfg['train_args'])
+    data = check_det_dataset(cfg['data'])
+    batch = cfg['batch_per_proc'] or max(1, args.batch // world)
+    total_batch = batch * world
+
+    model = YOLO(cfg['weights']).model.float().train()
+    if model.nc != data['nc']:
+        raise ValueError(f"จำนวน class ของ weights ({model.nc}) ไม่ตรงกับ data.yaml ({data['nc']})")
+    model.args = args
+    model.names = data['names']
+    # เหมือน trainer ของ ultralytics: .dfl ถูก freeze เสมอ (ไม่อย่างนั้น DDP เจอ parameter ที่ไม่ได้ gradient)
+    for name, p in model.named_parameters():
+        p.requires_grad_('.dfl' not in name)
+    ddp_model = DDP(model, find_unused_parameters=True)
+
+    gs = max(int(model.stride.max()), 32)
+    # local rank 0 ของแต่ละเครื่องสร้าง label cache ก่อน process อื่นบนเครื่องเดียวกันค่อยอ่าน
+    # (dataset อยู่บนดิสก์ของแต่ละเครื่อง ถ้าใช้ global rank เครื่องอื่นจะไม่มีใครสร้าง cache ก่อน)
+    with torch_distributed_zero_first(local_rank):
+        dataset = build_yolo_dataset(args, data['train'], batch, data, mode='train', rect=False, stride=gs)
+    sampler = DistributedSampler(dataset, num_replicas=world, rank=rank, shuffle=True, seed=args.seed)
+    loader = _loader(dataset, sampler, batch, cfg['workers'])
+
+    # สะสม gradient ให้ครบ nbs ภาพต่อ optimizer step และ scale weight decay ตาม (batch รวมทุก process)
+    nb = len(loader)
+    accumulate = max(round(args.nbs / total_batch), 1)
+    weight_decay = args.weight_decay * total_batch * accumulate / args.nbs
+    iterations = math.ceil(len(dataset) / max(total_batch, args.nbs)) * args.epochs
+    optimizer, opt_name = build_optimizer(model, args.optimizer, args.lr0, args.momentum, weight_decay,
+                                          data['nc'], iterations, args)
+    lf = _lr_lambda(args.epochs, args.lrf, args.cos_lr)
+    scheduler = torch.optim.lr_scheduler.LambdaLR(optimizer, lf)
+    nw = round(args.warmup_epochs * nb) if args.warmup_epochs > 0 else 0
+    ema = ModelEMA(model) if rank == 0 else None
+
+    max_steps = cfg.get('max_steps')
+    timing_warmup = cfg.get('timing_warmup', 3)
+    save_dir = os.path.join(args.project, args.name)
+    last_pt = os.path.join(save_dir, 'weights', 'last.pt')
+    best_pt = os.path.join(save_dir, 'weights', 'best.pt')
+    if rank == 0 and not max_steps:
+        os.makedirs(os.path.dirname(last_pt), exist_ok=True)
+    best_fitness, best_epoch, history = None, 0, []
+
+    step, timed_images, timed_sec = 0, 0, 0.0
+    losses = []
+    if rank == 0:
+        print(f" world={world} (nodes={cfg['nnodes']} x {cfg['nproc_per_node']}), batch/proc={batch}, "
+              f"threads/proc={torch.get_num_threads()}, {nb} steps/epoch, optimizer={opt_name}, "
+              f"accumulate={accumulate}, warmup={nw} steps")
+    last_opt_step = -1
+    optimizer.zero_grad(set_to_none=True)
+    for epoch in range(args.epochs):
+        if args.close_mosaic and epoch == args.epochs - args.close_mosaic:
+            # ปิด mosaic ช่วง epoch ท้าย ต้องสร้าง loader ใหม่ให้ worker ได้ transforms ชุดใหม่
+            dataset.close_mosaic(hyp=deepcopy(args))
+            loader = _loader(dataset, sampler, batch, cfg['workers'])
+        sampler.set_epoch(epoch)
+        t_step = time.perf_counter()
+        for i, batch_data in enumerate(loader):
+            ni = i + nb * epoch
+            if ni < nw:
+                # warmup: bias lr ลดจาก warmup_bias_lr, lr อื่นเพิ่มจาก 0 ไปยัง lr ของ scheduler
+                xi = [0, nw]
+                accumulate = max(1, int(np.interp(ni, xi, [1, args.nbs / total_batch]).round()))
+                for j, x in enumerate(optimizer.param_groups):
+                    x['lr'] = float(np.interp(ni, xi, [args.warmup_bias_lr if j == 0 else 0.0,
+                                                       x['initial_lr'] * lf(epoch)]))
+                    if 'momentum' in x:
+                        x['momentum'] = float(np.interp(ni, xi, [args.warmup_momentum, args.momentum]))
+            batch_data['img'] = batch_data['img'].float() / 255
+            loss, loss_items = ddp_model(batch_data)
+            # ultralytics คูณ loss ด้วย world size เพื่อชดเชยการเฉลี่ย gradient ของ DDP
+            loss = loss.sum() * world
+            loss.backward()
+            if ni - last_opt_step >= accumulate:
+                torch.nn.utils.clip_grad_norm_(model.parameters(), max_norm=10.0)
+                optimizer.step()
+                optimizer.zero_grad(set_to_none=True)
+                if ema:
+                    ema.update(model)
+                last_opt_step = ni
+            step += 1
+            now = time.perf_counter()
+            if step > timing_warmup:
+                timed_images += batch_data['img'].shape[0]
+                timed_sec += now - t_step
+            t_step = now
+            # ultralytics รุ่นใหม่คืน loss_items เป็น dict {ชื่อ: tensor} รุ่นเก่าเป็น tensor
+            items = loss_items.values() if isinstance(loss_items, dict) else loss_items
+            losses.append([float(x) for x in items])
+            if rank == 0 and step % 20 == 0:
+                print(f"  epoch {epoch + 1}/{args.epochs} step {step}: loss={[round(x, 3) for x in losses[-1]]}")
+            if max_steps and step >= max_steps:
+                break
+        scheduler.step()
+        if max_steps:
+            if step >= max_steps:
+                break
+            continue
+
+        # rank 0 บันทึก last.pt (EMA) แล้ว validate ; rank อื่นรอที่ broadcast ด้านล่าง
+        stop = torch.zeros(1, dtype=torch.int32)
+        if rank == 0:
+            ema.update_attr(model, include=['yaml', 'nc', 'args', 'names', 'stride', 'class_weights'])
+            _save_checkpoint(last_pt, epoch, ema, best_fitness, args)
+            fitness, metrics = _validate(last_pt, cfg['data'], args)
+            history.append({'epoch': epoch + 1, 'fitness': fitness, **metrics})
+            if best_fitness is None or fitness >= best_fitness:
+                best_fitness, best_epoch = fitness, epoch
+                _save_checkpoint(best_pt, epoch, ema, best_fitness, args)
+            print(f"  epoch {epoch + 1}/{args.epochs}: mAP50={metrics['mAP50']:.4f} "
+                  f"mAP50-95={metrics['mAP50-95']:.4f} (best epoch {best_epoch + 1})")
+            if args.patience and epoch - best_epoch >= args.patience:
+                print(f"  early stopping: ไม่ดีขึ้น {args.patience} epoch")
+                stop[0] = 1
+        dist.broadcast(stop, src=0)
+        if stop.item():
+            break
+
+    # รวม throughput ของทุก process: ภาพทั้งหมด / เวลาของ process ที่ช้าที่สุด
+    stats = torch.tensor([timed_images, timed_sec], dtype=torch.float64)
+    total = stats.clone()
+    dist.all_reduce(total, op=dist.ReduceOp.SUM)
+    slowest = stats[1:].clone()
+    dist.all_reduce(slowest, op=dist.ReduceOp.MAX)
+    result = {'world_size': world, 'batch_per_proc': batch, 'steps': step,
+              'threads_per_proc': torch.get_num_threads(), 'images': int(total[0]),
+              'sec': float(slowest[0]), 'images_per_sec': float(total[0] / slowest[0]) if slowest[0] > 0 else None,
+              'last_loss': losses[-1] if losses else None}
+
+    if rank == 0 and not max_steps:
+        result.update(weights=best_pt, last=last_pt, best_epoch=best_epoch + 1, best_fitness=best_fitness,
+                      history=history)
+    dist.barrier()
+    return result
+
+
+def launch(weights, data, train_kw=None, batch_per_proc=None, max_steps=None, result_path=None, **kw):
+    """
+    spawn nproc_per_node process บนเครื่องนี้ (node_rank ของเครื่องนี้ใน nnodes เครื่อง)
+    ทุกเครื่องต้องรันคำสั่งเดียวกันโดยเปลี่ยนเฉพาะ node_rank และชี้ master_addr ไปที่เครื่อง rank 0
+    """
+    cfg = dict(ddp_args, **kw)
+    cfg.update(weights=weights, data=data, train_args=dict(train_args, **(train_kw or {})),
+               batch_per_proc=batch_per_proc, max_steps=max_steps, result_path=result_path)
+    mp.spawn(_worker, args=(cfg,), nprocs=cfg['nproc_per_node'], join=True)
+
+
+def scaling_benchmark(weights, data, procs, steps=30, batch_per_proc=8, port=29600):
+    """
+    วัด throughput (images/s) ที่จำนวน process ต่างๆ บนเครื่องเดียว (batch ต่อ process คงที่)
+    efficiency = throughput(n) / (n * throughput(1)) แต่ละจำนวน process รันเป็น subprocess แยก
+    """
+    rows = []
+    for i, n in enumerate(procs):
+        out = os.path.join('runs', 'ddp_cpu', f'_bench_{n}.json')
+        os.makedirs(os.path.dirname(out), exist_ok=True)
+        cmd = [sys.executable, os.path.abspath(__file__), '--weights', weights, '--data', data,
+               '--nproc-per-node', str(n), '--max-steps', str(steps), '--batch-per-proc', str(batch_per_proc),
+               '--master-port', str(port + i), '--result', out]
+        print(f"--- {n} process ---")
+        proc = subprocess.run(cmd)
+        if proc.returncode != 0 or not os.path.exists(out):
+            rows.append({'world_size': n, 'error': proc.returncode})
+            continue
+        with open(out, 'r', encoding='utf-8') as f:
+            rows.append(json.load(f))
+        os.remove(out)
+    ok = sorted((r for r in rows if r.get('images_per_sec')), key=lambda r: r['world_size'])
+    for r in ok:
+        # เทียบกับจำนวน process น้อยที่สุดที่รันสำเร็จ (ปกติคือ 1)
+        base = ok[0]
+        r['speedup'] = r['images_per_sec'] / base['images_per_sec']
+        r['efficiency'] = r['speedup'] * base['world_size'] / r['world_size']
+    return rows
+
+
+def scaling_lines(rows):
+    lines = [f"{'Procs':>5} {'Threads/p':>9} {'Img/s':>8} {'Speedup':>8} {'Eff.':>6}"]
+    for r in rows:
+        if 'error' in r:
+            lines.append(f"{r['world_size']:>5}  failed (exit {r['error']})")
+        else:
+            lines.append(f"{r['world_size']:>5} {r['threads_per_proc']:>9} {r['images_per_sec']:>8.1f} "
+                         f"{r['speedup']:>7.2f}x {r['efficiency']:>6.0%}")
+    return lines
+
+
+if __name__ == '__main__':
+    sys.stdout.reconfigure(encoding='utf-8')
+    parser = argparse.ArgumentParser(description="CPU data-parallel training (torch.distributed, gloo)")
+    parser.add_argument("--weights", default=base_weights)
+    parser.add_argument("--data", default=os.path.join(dataset_root, 'data.yaml'))
+    parser.add_argument("--nproc-per-node", type=int, default=ddp_args['nproc_per_node'])
+    parser.add_argument("--nnodes", type=int, default=ddp_args['nnodes'], help="จำนวนเครื่องทั้งหมด")
+    parser.add_argument("--node-rank", type=int, default=ddp_args['node_rank'], help="ลำดับของเครื่องนี้ (0 = master)")
+    parser.add_argument("--master-addr", default=ddp_args['master_addr'], help="IP ของเครื่อง node-rank 0")
+    parser.add_argument("--master-port", type=int, default=ddp_args['master_port'])
+    parser.add_argument("--threads", type=int, default=None, help="torch threads ต่อ process")
+    parser.add_argument("--workers", type=int, default=ddp_args['workers'], help="dataloader workers ต่อ process")
+    parser.add_argument("--epochs", type=int, default=train_args['epochs'])
+    parser.add_argument("--batch-per-proc", type=int, default=None,
+                        help="batch ต่อ process (ค่าเริ่มต้น = batch ของ recipe / จำนวน process ทั้งหมด)")
+    parser.add_argument("--max-steps", type=int, default=None, help="หยุดหลัง N step (ใช้วัดความเร็ว ไม่บันทึก weights)")
+    parser.add_argument("--result", default=None, help="บันทึกผลของ rank 0 เป็น JSON")
+    parser.add_argument("--scaling", default=None, help="วัด scaling efficiency เช่น 1,2,4,8 (เครื่องเดียว)")
+    parser.add_argument("--val", action='store_true', help="validate best.pt อีกครั้งบน CPU หลังเทรน (แสดงผลเต็ม)")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.data):
+        print(f"Error: ไม่พบไฟล์ data.yaml ที่ {args.data}")
+        exit()
+
+    if args.scaling:
+        procs = [int(n) for n in args.scaling.split(',')]
+        rows = scaling_benchmark(args.weights, args.data, procs, steps=args.max_steps or 30,
+                                 batch_per_proc=args.batch_per_proc or 8, port=args.master_port)
+        print("\n".join(scaling_lines(rows)))
+        out = args.result or os.path.join('runs', 'ddp_cpu', f"scaling_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+        with open(out, 'w', encoding='utf-8') as f:
+            json.dump({'cpu_count': os.cpu_count(), 'results': rows}, f, indent=2)
+        print(f" ผลลัพธ์: {out}")
+        exit()
+
+    result_path = args.result or os.path.join('runs', 'ddp_cpu', '_last_run.json')
+    os.makedirs(os.path.dirname(os.path.abspath(result_path)), exist_ok=True)
+    launch(args.weights, args.data, train_kw={'epochs': args.epochs}, batch_per_proc=args.batch_per_proc,
+           max_steps=args.max_steps, result_path=result_path, nproc_per_node=args.nproc_per_node,
+           nnodes=args.nnodes, node_rank=args.node_rank, master_addr=args.master_addr,
+           master_port=args.master_port, threads=args.threads, workers=args.workers)
+
+    if args.node_rank == 0 and os.path.exists(result_path):
+        with open(result_path, 'r', encoding='utf-8') as f:
+            result = json.load(f)
+        print(f" throughput: {result['images_per_sec']:.1f} images/s ({result['world_size']} process)")
+        if args.val and result.get('weights'):
+            metrics = YOLO(result['weights']).val(data=args.data, split='val', device='cpu', plots=False)
+            print(f" mAP50={metrics.box.map50:.4f} mAP50-95={metrics.box.map:.4f}")
@@ -0,0 +1,278 @@
+import os
+import sys
+import json
+import argparse
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+import capture_utils
+import inference_utils
+
+# ตาราง columnar แบบ append-only: หนึ่งไฟล์ binary ต่อหนึ่งคอลัมน์
+DET_COLUMNS = {
+    'tower': np.uint16,
+    'hour': np.int32,
+    'cls': np.uint8,
+    'count': np.uint32,
+    'area_sum': np.float64,
+    'area_sq': np.float64,
+    'area_min': np.float32,
+    'area_max': np.float32,
+}
+IMG_COLUMNS = {
+    'tower': np.uint16,
+    'hour': np.int32,
+    'images': np.uint32,
+}
+# capture ที่รวมแล้ว (tower, ts_key) ใช้กันรวมรูปซ้ำ รูปที่มาช้ากว่ารูปใหม่กว่าจึงยังรวมได้
+CAP_COLUMNS = {
+    'tower': np.uint16,
+    'key': np.int64,
+}
+TABLES = {'det': DET_COLUMNS, 'img': IMG_COLUMNS, 'cap': CAP_COLUMNS}
+
+
+def _meta_path(store_dir):
+    return os.path.join(store_dir, 'meta.json')
+
+
+def _col_path(store_dir, table, col):
+    return os.path.join(store_dir, f'{table}_{col}.bin')
+
+
+def load_meta(store_dir):
+    path = _meta_path(store_dir)
+    if not os.path.exists(path):
+        return {'rows': {'det': 0, 'img': 0, 'cap': 0}, 'watermark': {}}
+    with open(path, 'r') as f:
+        meta = json.load(f)
+    if 'cap' not in meta['rows']:
+        # store เก่าที่ยังไม่มีตาราง cap: capture ก่อน watermark เดิมตรวจซ้ำไม่ได้ จึงยังข้ามตาม watermark นั้น
+        meta['rows']['cap'] = 0
+        meta['legacy_watermark'] = dict(meta['watermark'])
+    return meta
+
+
+def _save_meta(store_dir, meta):
+    tmp = _meta_path(store_dir) + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp, _meta_path(store_dir))
+
+
+def _append_table(store_dir, table, rows_before, data):
+    for col, dtype in TABLES[table].items():
+        path = _col_path(store_dir, table, col)
+        # ตัดข้อมูลที่เขียนค้างจากรอบที่ crash ก่อนอัปเดต meta.json ทิ้ง
+        if os.path.exists(path) and os.path.getsize(path) != rows_before * np.dtype(dtype).itemsize:
+            with open(path, 'r+b') as f:
+                f.truncate(rows_before * np.dtype(dtype).itemsize)
+        with open(path, 'ab') as f:
+            np.asarray(data[col], dtype=dtype).tofile(f)
+
+
+def _group(keys):
+    uniq, inv = np.unique(keys, axis=0, return_inverse=True)
+    return uniq, inv.reshape(-1)
+
+
+def append_detections(store_dir, dets_by_name):
+    """
+    รวมผล detection รอบใหม่เข้ากับ store แบบ incremental
+    ข้ามเฉพาะ capture (tower + timestamp) ที่เคยรวมแล้ว ('duplicates') รูปย้อนหลังที่มาช้ายังถูกรวมตามปกติ
+    'late' = รูปที่เก่ากว่า watermark ของ store รุ่นก่อนมีตาราง cap ซึ่งตรวจซ้ำไม่ได้จึงไม่ถูกรวม
+    """
+    os.makedirs(store_dir, exist_ok=True)
+    meta = load_meta(store_dir)
+    watermark = meta['watermark']
+    legacy = meta.get('legacy_watermark', {})
+    cap = _load_table(store_dir, 'cap', meta['rows']['cap'])
+    seen = set(zip(cap['tower'].tolist(), cap['key'].tolist()))
+
+    b_tower, b_hour, b_cls, b_area = [], [], [], []
+    i_tower, i_hour = [], []
+    c_tower, c_key = [], []
+    new_marks = {}
+    skipped, duplicates = 0, 0
+    late_names = []
+    for name, det in dets_by_name.items():
+        info = capture_utils.parse_capture_name(name)
+        if info is None:
+            skipped += 1
+            continue
+        key = capture_utils.ts_key(info['timestamp'])
+        tower = str(info['tower'])
+        if (info['tower'], key) in seen:
+            duplicates += 1
+            continue
+        if key <= legacy.get(tower, 0):
+            late_names.append(name)
+            continue
+        seen.add((info['tower'], key))
+        c_tower.append(info['tower'])
+        c_key.append(key)
+        new_marks[tower] = max(new_marks.get(tower, 0), key)
+
+        hour = capture_utils.hour_index(info['timestamp'])
+        i_tower.append(info['tower'])
+        i_hour.append(hour)
+        n = len(det['classes'])
+        if n == 0:
+            continue
+        boxes = det['boxes']
+        area = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1]) / float(det['width'] * det['height'])
+        b_tower.append(np.full(n, info['tower']))
+        b_hour.append(np.full(n, hour))
+        b_cls.append(det['classes'])
+        b_area.append(area)
+
+    if not i_tower:
+        return {'images': 0, 'skipped': skipped, 'duplicates': duplicates, 'late': len(late_names),
+                'late_names': late_names, 'rows': 0}
+
+    img_keys, img_inv = _group(np.stack([i_tower, i_hour], axis=1))
+    img_data = {'tower': img_keys[:, 0], 'hour': img_keys[:, 1],
+                'images': np.bincount(img_inv, minlength=len(img_keys))}
+
+    if b_tower:
+        tower_a, hour_a = np.concatenate(b_tower), np.concatenate(b_hour)
+        cls_a, area_a = np.concatenate(b_cls), np.concatenate(b_area).astype(np.float64)
+        keys, inv = _group(np.stack([tower_a, hour_a, cls_a], axis=1))
+        n = len(keys)
+        a_min = np.full(n, np.inf)
+        a_max = np.full(n, -np.inf)
+        np.minimum.at(a_min, inv, area_a)
+        np.maximum.at(a_max, inv, area_a)
+        det_data = {
+            'tower': keys[:, 0], 'hour': keys[:, 1], 'cls': keys[:, 2],
+            'count': np.bincount(inv, minlength=n),
+            'area_sum': np.bincount(inv, weights=area_a, minlength=n),
+            'area_sq': np.bincount(inv, weights=area_a ** 2, minlength=n),
+            'area_min': a_min, 'area_max': a_max,
+        }
+    else:
+        det_data = {col: np.zeros(0) for col in DET_COLUMNS}
+
+    _append_table(store_dir, 'det', meta['rows']['det'], det_data)
+    _append_table(store_dir, 'img', meta['rows']['img'], img_data)
+    _append_table(store_dir, 'cap', meta['rows']['cap'], {'tower': c_tower, 'key': c_key})
+    meta['rows']['det'] += len(det_data['tower'])
+    meta['rows']['img'] += len(img_data['tower'])
+    meta['rows']['cap'] += len(c_tower)
+    for tower, key in new_marks.items():
+        watermark[tower] = max(watermark.get(tower, 0), key)
+    _save_meta(store_dir, meta)
+    return {'images': len(i_tower), 'skipped': skipped, 'duplicates': duplicates, 'late': len(late_names),
+            'late_names': late_names, 'rows': len(det_data['tower'])}
+
+
+def _load_table(store_dir, table, rows):
+    return {col: np.fromfile(_col_path(store_dir, table, col), dtype=dtype, count=rows)
+            if rows else np.zeros(0, dtype)
+            for col, dtype in TABLES[table].items()}
+
+
+def _hour_of(value):
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = datetime.strptime(value, '%Y-%m-%d')
+    return capture_utils.hour_index(value)
+
+
+def query(store_dir, towers=None, classes=None, start=None, end=None, freq='hour'):
+    """
+    ดึงสถิติรายชั่วโมง/รายวันของแต่ละ tower + class ในช่วงเวลาที่กำหนด (end ไม่รวม)
+    คืนค่า DataFrame: tower, time, cls, count, images, count_per_image, area_mean, area_std, area_min, area_max
+    """
+    meta = load_meta(store_dir)
+    det = _load_table(store_dir, 'det', meta['rows']['det'])
+    img = _load_table(store_dir, 'img', meta['rows']['img'])
+    h0, h1 = _hour_of(start), _hour_of(end)
+    bucket = 24 if freq == 'day' else 1
+
+    def mask_of(t):
+        m = np.ones(len(t['tower']), dtype=bool)
+        if towers:
+            m &= np.isin(t['tower'], towers)
+        if h0 is not None:
+            m &= t['hour'] >= h0
+        if h1 is not None:
+            m &= t['hour'] < h1
+        return m
+
+    dm = mask_of(det)
+    if classes:
+        dm &= np.isin(det['cls'], classes)
+    im = mask_of(img)
+
+    d_tower, d_bucket, d_cls = det['tower'][dm], det['hour'][dm] // bucket, det['cls'][dm]
+    if len(d_tower) == 0:
+        return pd.DataFrame(columns=['tower', 'time', 'cls', 'count', 'images', 'count_per_image',
+                                     'area_mean', 'area_std', 'area_min', 'area_max'])
+    keys, inv = _group(np.stack([d_tower, d_bucket, d_cls], axis=1).astype(np.int64))
+    n = len(keys)
+    count = np.bincount(inv, weights=det['count'][dm], minlength=n)
+    a_sum = np.bincount(inv, weights=det['area_sum'][dm], minlength=n)
+    a_sq = np.bincount(inv, weights=det['area_sq'][dm], minlength=n)
+    a_min = np.full(n, np.inf)
+    a_max = np.full(n, -np.inf)
+    np.minimum.at(a_min, inv, det['area_min'][dm])
+    np.maximum.at(a_max, inv, det['area_max'][dm])
+
+    # จำนวนรูปต่อ (tower, ช่วงเวลา) ใช้หาค่าเฉลี่ยจำนวนต้นต่อรูป
+    i_keys, i_inv = _group(np.stack([img['tower'][im], img['hour'][im] // bucket], axis=1).astype(np.int64))
+    i_count = np.bincount(i_inv, weights=img['images'][im], minlength=len(i_keys))
+    pos = np.searchsorted(i_keys[:, 0] * (1 << 32) + i_keys[:, 1], keys[:, 0] * (1 << 32) + keys[:, 1])
+    images = i_count[np.clip(pos, 0, len(i_count) - 1)] if len(i_count) else np.zeros(n)
+
+    mean = a_sum / count
+    std = np.sqrt(np.clip(a_sq / count - mean ** 2, 0, None))
+    times = (keys[:, 1] * bucket).astype('datetime64[h]')
+    return pd.DataFrame({
+        'tower': keys[:, 0], 'time': times, 'cls': keys[:, 2],
+        'count': count.astype(np.int64), 'images': images.astype(np.int64),
+        'count_per_image': count / np.maximum(images, 1),
+        'area_mean': mean, 'area_std': std, 'area_min': a_min, 'area_max': a_max,
+    })
+
+
+def main():
+    sys.stdout.reconfigure(encoding='utf-8')
+    parser = argparse.ArgumentParser(description="Per-tower / per-hour / per-class detection time series")
+    sub = parser.add_subparsers(dest='cmd', required=True)
+
+    p_add = sub.add_parser('append', help="รวมไฟล์ detections (.json) เข้ากับ store")
+    p_add.add_argument("detections", nargs='+')
+    p_add.add_argument("--store", default='timeseries_store')
+
+    p_q = sub.add_parser('query', help="ดึงสถิติตามช่วงเวลา")
+    p_q.add_argument("--store", default='timeseries_store')
+    p_q.add_argument("--tower", type=int, nargs='*')
+    p_q.add_argument("--cls", type=int, nargs='*')
+    p_q.add_argument("--start", help="YYYY-MM-DD")
+    p_q.add_argument("--end", help="YYYY-MM-DD (ไม่รวมวันนี้)")
+    p_q.add_argument("--freq", choices=['hour', 'day'], default='hour')
+    p_q.add_argument("--csv", help="บันทึกผลเป็น CSV")
+    args = parser.parse_args()
+
+    if args.cmd == 'append':
+        for path in args.detections:
+            stats = append_detections(args.store, inference_utils.load_detections(path))
+            print(f" {path}: +{stats['images']} images, +{stats['rows']} rows, "
+                  f"duplicates {stats['duplicates']}, skipped {stats['skipped']}")
+            if stats['late']:
+                print(f" ⚠️ {stats['late']} รูปเก่ากว่า watermark ของ store รุ่นเก่า ตรวจซ้ำไม่ได้จึงไม่ถูกรวม "
+                      f"(เช่น {', '.join(sorted(stats['late_names'])[:3])}) ถ้าเป็นข้อมูลย้อนหลังให้สร้าง store ใหม่")
+    else:
+        df = query(args.store, args.tower, args.cls, args.start, args.end, args.freq)
+        if args.csv:
+            df.to_csv(args.csv, index=False)
+            print(f" Saved {len(df)} rows to {args.csv}")
+        else:
+            print(df.to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,259 @@
+import os
+import sys
+import json
+import hashlib
+import argparse
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+from ultralytics import YOLO
+from ultralytics.data import build_yolo_dataset
+from ultralytics.models.yolo.detect import DetectionTrainer
+from ultralytics.utils.loss import v8DetectionLoss
+from ultralytics.utils.torch_utils import de_parallel
+
+import hash_utils
+import latency_utils
+import report_utils
+import Traning_model_1_3_bestmodel as recipe
+
+dataset_root = recipe.dataset_root
+additional_datasets = recipe.additional_datasets
+teacher_weights = recipe.base_weights          # yolov8s ที่ fine-tune แล้ว
+student_weights = 'yolov8n.pt'
+train_args = dict(recipe.train_args, name='my_lettuce_model_1_3_distill')
+
+# น้ำหนักของ loss (logit = class logits ของ head, feature = P5 ที่เข้า Detect)
+kd_args = dict(
+    alpha_logit=1.0,
+    alpha_feat=0.5,
+    temperature=2.0,
+    cache_root='distill_cache',
+)
+
+
+def _p5_channels(model):
+    # Detect.cv2[i][0] คือ conv แรกของ branch box ของแต่ละ level -> in_channels = channel ของ P3/P4/P5
+    return de_parallel(model).model[-1].cv2[-1][0].conv.in_channels
+
+
+class TeacherCache:
+    """
+    cache ผลของ teacher ลงดิสก์ (ต่อรูป): class logits (nc, anchors) และ P5 feature เป็น fp16
+    epoch แรกรัน teacher แล้วบันทึก epoch ถัดไปอ่านจากดิสก์อย่างเดียว
+    (ต้องปิด augmentation เพื่อให้ input ของรูปเดิมเหมือนกันทุก epoch)
+    """
+
+    def __init__(self, teacher_path, imgsz, root='distill_cache'):
+        self.teacher_path = teacher_path
+        tag = hash_utils.cached_file_sha256(teacher_path)[:12]
+        self.dir = os.path.join(root, f'{tag}_{imgsz}')
+        os.makedirs(self.dir, exist_ok=True)
+        self.model = None
+        self.nc = None
+        self.teacher_runs = 0
+        self.cache_hits = 0
+
+    def _path(self, im_file):
+        # รวม mtime ไว้ใน key: รูปที่ถูกแก้ไขจะได้ผลของ teacher ใหม่
+        key = f'{os.path.abspath(im_file)}:{os.path.getmtime(im_file)}'
+        return os.path.join(self.dir, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.pt')
+
+    def _load_teacher(self, device):
+        model = YOLO(self.teacher_path).model.float().eval().to(device)
+        for p in model.parameters():
+            p.requires_grad_(False)
+        self.nc = model.nc
+        feats = {}
+        model.model[-1].register_forward_pre_hook(lambda m, inp: feats.__setitem__('p5', inp[0][-1]))
+        self.model, self._feats = model, feats
+
+    @torch.no_grad()
+    def _run_teacher(self, imgs):
+        _, raw = self.model(imgs)
+        b = imgs.shape[0]
+        no = raw[0].shape[1]
+        logits = torch.cat([xi.view(b, no, -1) for xi in raw], 2)[:, -self.nc:]
+        return logits, self._feats['p5']
+
+    def get(self, im_files, imgs):
+        paths = [self._path(f) for f in im_files]
+        if all(os.path.exists(p) for p in paths):
+            items = [torch.load(p, map_location=imgs.device) for p in paths]
+            self.cache_hits += len(paths)
+            return (torch.stack([it['logits'] for it in items]).float(),
+                    torch.stack([it['p5'] for it in items]).float())
+        if self.model is None:
+            self._load_teacher(imgs.device)
+        logits, p5 = self._run_teacher(imgs.float())
+        for i, p in enumerate(paths):
+            torch.save({'logits': logits[i].half().cpu(), 'p5': p5[i].half().cpu()}, p + '.tmp')
+            os.replace(p + '.tmp', p)
+        self.teacher_runs += len(paths)
+        return logits.float(), p5.float()
+
+
+class DistillLoss:
+    """
+    detection loss ปกติ + KD:
+    - logit: BCE ระหว่าง sigmoid(student/T) กับ sigmoid(teacher/T) ต่อ anchor ต่อคลาส
+    - feature: MSE ของ P5 (normalize แล้ว) หลังผ่าน 1x1 adapter ให้ channel เท่า teacher
+    """
+
+    def __init__(self, model, cache, adapter, alpha_logit=1.0, alpha_feat=0.5, temperature=2.0):
+        self.base = v8DetectionLoss(model)
+        self.cache = cache
+        self.adapter = adapter
+        self.alpha_logit, self.alpha_feat, self.T = alpha_logit, alpha_feat, temperature
+        self.nc = self.base.nc
+        self._feats = {}
+        de_parallel(model).model[-1].register_forward_pre_hook(lambda m, inp: self._feats.__setitem__('p5', inp[0][-1]))
+        self.kd_sum = {'logit': 0.0, 'feat': 0.0, 'n': 0}
+
+    def __call__(self, preds, batch):
+        loss, loss_items = self.base(preds, batch)
+        feats = preds[1] if isinstance(preds, tuple) else preds
+        b = feats[0].shape[0]
+        no = feats[0].shape[1]
+        s_logits = torch.cat([xi.view(b, no, -1) for xi in feats], 2)[:, -self.nc:].float()
+
+        t_logits, t_p5 = self.cache.get(batch['im_file'], batch['img'])
+        T = self.T
+        kd_logit = F.binary_cross_entropy_with_logits(s_logits / T, torch.sigmoid(t_logits / T)) * T * T
+
+        s_p5 = self.adapter(self._feats['p5'].float())
+        kd_feat = F.mse_loss(F.layer_norm(s_p5, s_p5.shape[1:]), F.layer_norm(t_p5, t_p5.shape[1:]))
+
+        self.kd_sum['logit'] += kd_logit.item()
+        self.kd_sum['feat'] += kd_feat.item()
+        self.kd_sum['n'] += 1
+        # loss ของ ultralytics คูณ batch size ไว้แล้ว จึงคูณ KD ด้วยเพื่อให้สเกลเดียวกัน
+        kd = (self.alpha_logit * kd_logit + self.alpha_feat * kd_feat) * b
+        return loss.sum() + kd, loss_items
+
+
+def make_distill_trainer(teacher_path, alpha_logit=1.0, alpha_feat=0.5, temperature=2.0, cache_root='distill_cache'):
+    """
+    สร้าง DetectionTrainer สำหรับ model.train(trainer=...) (ultralytics ไม่รับ argument ที่ไม่รู้จัก
+    จึงส่งค่าของ KD เข้า class ผ่าน closure)
+    """
+
+    class DistillTrainer(DetectionTrainer):
+
+        def build_dataset(self, img_path, mode='train', batch=None):
+            # ปิด augmentation ทั้งหมดตอนเทรน (รวม mosaic) เพื่อให้ใช้ cache ของ teacher ได้
+            gs = max(int(de_parallel(self.model).stride.max() if self.model else 0), 32)
+            if mode == 'train':
+                return build_yolo_dataset(self.args, img_path, batch, self.data, mode='val', rect=False, stride=gs)
+            return build_yolo_dataset(self.args, img_path, batch, self.data, mode=mode, rect=True, stride=gs)
+
+        def _setup_train(self, world_size):
+            teacher = YOLO(teacher_path).model
+            if teacher.nc != self.data['nc']:
+                raise ValueError(f"teacher มี {teacher.nc} คลาส แต่ dataset มี {self.data['nc']} คลาส")
+            self.teacher_cache = TeacherCache(teacher_path, self.args.imgsz, cache_root)
+            self.kd_adapter = nn.Conv2d(_p5_channels(self.model), _p5_channels(teacher), 1, bias=False)
+            del teacher
+            super()._setup_train(world_size)
+            model = de_parallel(self.model)
+            model.criterion = DistillLoss(model, self.teacher_cache, self.kd_adapter,
+                                          alpha_logit, alpha_feat, temperature)
+            self.add_callback('on_train_epoch_end', _log_kd)
+
+        def build_optimizer(self, model, *args, **kwargs):
+            optimizer = super().build_optimizer(model, *args, **kwargs)
+            self.kd_adapter.to(self.device)
+            optimizer.add_param_group({'params': list(self.kd_adapter.parameters()), 'weight_decay': 0.0})
+            return optimizer
+
+    return DistillTrainer
+
+
+def _log_kd(trainer):
+    crit = de_parallel(trainer.model).criterion
+    n = max(crit.kd_sum['n'], 1)
+    cache = crit.cache
+    print(f" KD epoch {trainer.epoch + 1}: logit={crit.kd_sum['logit'] / n:.4f} feat={crit.kd_sum['feat'] / n:.4f} "
+          f"(teacher runs={cache.teacher_runs}, cache hits={cache.cache_hits})")
+    crit.kd_sum = {'logit': 0.0, 'feat': 0.0, 'n': 0}
+
+
+def evaluate(weights, yaml_path, split='test', imgsz=640, device=None, latency_runs=30):
+    metrics = YOLO(weights).val(data=yaml_path, split=split, imgsz=imgsz, device=device, plots=False, verbose=False)
+    lat = latency_utils.cpu_latency_ms(weights, imgsz=imgsz, runs=latency_runs)
+    return {
+        'weights': weights,
+        'mAP50': float(metrics.box.map50),
+        'mAP50-95': float(metrics.box.map),
+        'params': latency_utils.count_params(weights),
+        'cpu_latency_ms': lat['mean_ms'],
+        'cpu_latency_p95_ms': lat['p95_ms'],
+        'latency_backend': lat['backend'],
+    }
+
+
+def comparison_lines(rows):
+    lines = [f"{'Model':<10} {'mAP50':>7} {'mAP50-95':>9} {'Params(M)':>10} {'CPU ms':>8} {'p95 ms':>8}"]
+    for name, r in rows.items():
+        lines.append(f"{name:<10} {r['mAP50']:>7.4f} {r['mAP50-95']:>9.4f} {r['params'] / 1e6:>10.2f} "
+                     f"{r['cpu_latency_ms']:>8.1f} {r['cpu_latency_p95_ms']:>8.1f}")
+    t, s = rows['teacher'], rows['student']
+    lines.append(f"Speed-up: {t['cpu_latency_ms'] / max(s['cpu_latency_ms'], 1e-9):.2f}x, "
+                 f"mAP50-95 retained: {100 * s['mAP50-95'] / max(t['mAP50-95'], 1e-9):.1f}% "
+                 f"(latency backend: {s['latency_backend']})")
+    return lines
+
+
+if __name__ == '__main__':
+    sys.stdout.reconfigure(encoding='utf-8')
+    parser = argparse.ArgumentParser(description="Knowledge distillation: teacher best.pt -> smaller student")
+    parser.add_argument("--teacher", default=teacher_weights)
+    parser.add_argument("--student", default=student_weights)
+    parser.add_argument("--epochs", type=int, default=train_args['epochs'])
+    parser.add_argument("--device", default=train_args['device'])
+    parser.add_argument("--split", default='test', help="split ที่ใช้เทียบ teacher/student")
+    args = parser.parse_args()
+
+    if os.path.exists(dataset_root):
+        recipe.auto_split_data(dataset_root, additional_datasets)
+    else:
+        print(f"Error: ไม่พบโฟลเดอร์ {dataset_root}")
+        exit()
+    yaml_path = os.path.join(dataset_root, 'data.yaml')
+    if not os.path.exists(yaml_path):
+        print(f"Error: ไม่พบไฟล์ data.yaml ที่ {yaml_path}")
+        exit()
+
+    run_args = dict(train_args, epochs=args.epochs, device=args.device)
+    print(f"--- Distillation: teacher={args.teacher} -> student={args.student} ---")
+    model = YOLO(args.student)
+    trainer_cls = make_distill_trainer(args.teacher, **kd_args)
+    results = model.train(data=yaml_path, trainer=trainer_cls, **run_args)
+
+    save_dir_str = str(results.save_dir)
+    best_pt_path = os.path.join(save_dir_str, 'weights', 'best.pt')
+
+    print("--- Teacher vs Student ---")
+    rows = {
+        'teacher': evaluate(args.teacher, yaml_path, args.split, run_args['imgsz'], args.device),
+        'student': evaluate(best_pt_path, yaml_path, args.split, run_args['imgsz'], args.device),
+    }
+    lines = comparison_lines(rows)
+    for line in lines:
+        print(line)
+
+    try:
+        log_dir = report_utils.create_log_directory()
+        summary = report_utils.save_results(save_dir_str, log_dir, best_pt_path)
+        with open(os.path.join(log_dir, 'metrics', 'distill_comparison.json'), 'w') as f:
+            json.dump(rows, f, indent=4)
+        config = {'Epochs': run_args['epochs'], 'Device': args.device, 'Teacher': args.teacher,
+                  'Student': args.student, **{k: v for k, v in kd_args.items() if k != 'cache_root'}}
+        report_utils.generate_text_report(log_dir, config, summary,
+                                          extra_sections={'Teacher vs student (CPU latency)': lines})
+        print(f"Report generated at: {log_dir}")
+    except Exception as e:
+        print(f" Report generation failed (ข้ามได้): {e}")
+
+    YOLO(best_pt_path).export(format='onnx')
+    print(" เสร็จสมบูรณ์ เช็คผลลัพธ์ได้ที่โฟลเดอร์ runs/train")
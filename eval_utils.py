@@ -0,0 +1,103 @@
+import os
+import numpy as np
+
+IOU_THRESHOLDS = np.linspace(0.5, 0.95, 10)
+
+
+def load_yolo_labels(label_path, width, height):
+    # อ่าน label YOLO (class cx cy w h แบบ normalized) แล้วแปลงเป็น xyxy หน่วย pixel
+    if not os.path.exists(label_path):
+        return np.zeros((0, 4), np.float32), np.zeros(0, np.int64)
+    with open(label_path, 'r') as f:
+        rows = [line.split() for line in f if line.strip()]
+    rows = [r[:5] for r in rows if len(r) >= 5]
+    if not rows:
+        return np.zeros((0, 4), np.float32), np.zeros(0, np.int64)
+    arr = np.array(rows, dtype=np.float32)
+    cx, cy = arr[:, 1] * width, arr[:, 2] * height
+    w, h = arr[:, 3] * width, arr[:, 4] * height
+    boxes = np.stack([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], axis=1)
+    return boxes, arr[:, 0].astype(np.int64)
+
+
+def box_iou(a, b):
+    if len(a) == 0 or len(b) == 0:
+        return np.zeros((len(a), len(b)), np.float32)
+    lt = np.maximum(a[:, None, :2], b[None, :, :2])
+    rb = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = np.clip(rb - lt, 0, None).prod(axis=2)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-9)
+
+
+def match_predictions(pred_cls, true_cls, iou, thresholds=IOU_THRESHOLDS):
+    # จับคู่ prediction กับ label แบบเดียวกับ validator ของ Ultralytics
+    correct = np.zeros((len(pred_cls), len(thresholds)), dtype=bool)
+    iou = iou * (true_cls[:, None] == pred_cls[None, :])
+    for i, t in enumerate(thresholds):
+        matches = np.argwhere(iou >= t)
+        if len(matches):
+            if len(matches) > 1:
+                matches = matches[iou[matches[:, 0], matches[:, 1]].argsort()[::-1]]
+                matches = matches[np.unique(matches[:, 1], return_index=True)[1]]
+                matches = matches[np.unique(matches[:, 0], return_index=True)[1]]
+            correct[matches[:, 1], i] = True
+    return correct
+
+
+def compute_ap(recall, precision):
+    mrec = np.concatenate(([0.0], recall, [1.0]))
+    mpre = np.concatenate(([1.0], precision, [0.0]))
+    mpre = np.flip(np.maximum.accumulate(np.flip(mpre)))
+    x = np.linspace(0, 1, 101)
+    y = np.interp(x, mrec, mpre)
+    return float(((y[1:] + y[:-1]) / 2 * np.diff(x)).sum())
+
+
+def ap_per_class(tp, conf, pred_cls, target_cls):
+    order = np.argsort(-conf)
+    tp, conf, pred_cls = tp[order], conf[order], pred_cls[order]
+    classes = np.unique(target_cls)
+    ap = np.zeros((len(classes), tp.shape[1]))
+    for ci, c in enumerate(classes):
+        i = pred_cls == c
+        n_l = (target_cls == c).sum()
+        if i.sum() == 0 or n_l == 0:
+            continue
+        tpc = tp[i].cumsum(0)
+        fpc = (1 - tp[i]).cumsum(0)
+        recall = tpc / (n_l + 1e-16)
+        precision = tpc / (tpc + fpc)
+        for j in range(tp.shape[1]):
+            ap[ci, j] = compute_ap(recall[:, j], precision[:, j])
+    return ap, classes
+
+
+def evaluate_detections(dets_by_path, label_path_fn):
+    """
+    คำนวณ mAP50 / mAP50-95 จากผล detection (dict ของ inference_utils) เทียบกับ label YOLO
+    label_path_fn: ฟังก์ชันแปลง path รูป -> path label
+    """
+    stats_tp, stats_conf, stats_pred, stats_target = [], [], [], []
+    for path, det in dets_by_path.items():
+        gt_boxes, gt_cls = load_yolo_labels(label_path_fn(path), det['width'], det['height'])
+        stats_target.append(gt_cls)
+        if len(det['scores']) == 0:
+            continue
+        iou = box_iou(gt_boxes, det['boxes'])
+        stats_tp.append(match_predictions(det['classes'], gt_cls, iou))
+        stats_conf.append(det['scores'])
+        stats_pred.append(det['classes'])
+
+    target_cls = np.concatenate(stats_target) if stats_target else np.zeros(0, np.int64)
+    if not stats_tp or len(target_cls) == 0:
+        return {'mAP50': 0.0, 'mAP50-95': 0.0, 'per_class': {}}
+
+    ap, classes = ap_per_class(np.concatenate(stats_tp), np.concatenate(stats_conf),
+                               np.concatenate(stats_pred), target_cls)
+    return {
+        'mAP50': float(ap[:, 0].mean()),
+        'mAP50-95': float(ap.mean()),
+        'per_class': {int(c): {'AP50': float(ap[i, 0]), 'AP50-95': float(ap[i].mean())} for i, c in enumerate(classes)},
+    }
@@ -0,0 +1,151 @@
+import os
+import sys
+import json
+import time
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+ACTIONS = ('copy', 'move', 'rename', 'touch')
+# error ที่ไม่ควร retry (ไฟล์ไม่มีอยู่จริง / ปลายทางชนกัน)
+_PERMANENT_ERRORS = (FileNotFoundError, FileExistsError, IsADirectoryError, NotADirectoryError)
+
+
+def _run_one(action, src, dst, retries, backoff):
+    """
+    ทำ 1 operation คืนค่า (status, bytes) โดย status = 'done' | 'skipped'
+    ถ้าปลายทางมีอยู่แล้วจะข้าม (ทำให้รันซ้ำหลังถูก interrupt ได้อย่างปลอดภัย)
+    """
+    if os.path.exists(dst):
+        return 'skipped', 0
+    for attempt in range(retries + 1):
+        try:
+            if action == 'touch':
+                open(dst, 'a').close()
+                return 'done', 0
+            size = os.path.getsize(src)
+            if action == 'copy':
+                shutil.copy2(src, dst)
+            elif action == 'move':
+                shutil.move(src, dst)
+            else:
+                os.replace(src, dst)
+            return 'done', size
+        except _PERMANENT_ERRORS:
+            raise
+        except OSError:
+            # share บน network ชอบ timeout / ไฟล์ถูก lock ชั่วคราว -> รอแล้วลองใหม่
+            if attempt == retries:
+                raise
+            time.sleep(backoff * (2 ** attempt))
+
+
+def _load_pending(log_path):
+    # op log: บรรทัดแรกๆ เป็นแผน {"op": [action, src, dst]} ตามด้วย {"done": index} เมื่อแต่ละงานเสร็จ
+    if not log_path or not os.path.exists(log_path):
+        return []
+    plan, done = [], set()
+    with open(log_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                continue  # บรรทัดสุดท้ายอาจเขียนไม่ครบตอนถูก interrupt
+            if 'op' in rec:
+                plan.append(tuple(rec['op']))
+            elif 'done' in rec:
+                done.add(rec['done'])
+    return [op for i, op in enumerate(plan) if i not in done]
+
+
+def _print_progress(n, total, nbytes, start, end='\r'):
+    dt = max(time.time() - start, 1e-9)
+    print(f"  {n}/{total} files | {n / dt:.1f} files/s | {nbytes / dt / 1024 ** 2:.2f} MB/s", end=end, flush=True)
+
+
+def run_ops(ops, workers=8, retries=3, backoff=0.5, log_path=None, progress=True, on_done=None):
+    """
+    รัน file operations (action, src, dst) บน thread pool
+    - สร้างโฟลเดอร์ปลายทางทุกอันครั้งเดียวก่อนเริ่ม
+    - retry error ชั่วคราว (network share) แบบ exponential backoff
+    - ถ้าระบุ log_path: งานที่ค้างจากรอบก่อน (ถูก interrupt / fail) จะถูกรันต่อก่อน และลบ log เมื่อสำเร็จทั้งหมด
+    - on_done(op): เรียกในเธรดหลักหลังแต่ละงานสำเร็จ (รวมงานที่ข้ามเพราะปลายทางมีอยู่แล้ว) ก่อนบันทึกว่าเสร็จใน log
+      ถ้า on_done error งานนั้นนับเป็น failed และจะถูกทำซ้ำในรอบถัดไป
+    คืนค่า dict สถิติ (done, skipped, failed, bytes, sec, files_per_sec, mb_per_sec, errors)
+    """
+    ops = [tuple(op) for op in ops]
+    for action, _, _ in ops:
+        if action not in ACTIONS:
+            raise ValueError(f"ไม่รู้จัก action: {action}")
+    pending = _load_pending(log_path)
+    if pending:
+        print(f" ▶ พบงานค้างจาก op log {len(pending)} รายการ ทำต่อจากเดิม")
+        seen = set(pending)
+        ops = pending + [op for op in ops if op not in seen]
+
+    stats = {'done': 0, 'skipped': 0, 'failed': 0, 'bytes': 0, 'errors': []}
+    if not ops:
+        stats.update(sec=0.0, files_per_sec=0.0, mb_per_sec=0.0)
+        return stats
+
+    for d in {os.path.dirname(dst) for _, _, dst in ops}:
+        if d:
+            os.makedirs(d, exist_ok=True)
+
+    log = None
+    if log_path:
+        os.makedirs(os.path.dirname(os.path.abspath(log_path)), exist_ok=True)
+        with open(log_path + '.tmp', 'w', encoding='utf-8') as f:
+            for op in ops:
+                f.write(json.dumps({'op': list(op)}, ensure_ascii=False) + '\n')
+        os.replace(log_path + '.tmp', log_path)
+        log = open(log_path, 'a', encoding='utf-8')
+    lock = threading.Lock()
+
+    start = time.time()
+    last_print = 0.0
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(_run_one, *op, retries, backoff): i for i, op in enumerate(ops)}
+            for n, fut in enumerate(as_completed(futures), 1):
+                i = futures[fut]
+                try:
+                    status, nbytes = fut.result()
+                    if on_done:
+                        on_done(ops[i])
+                    stats[status] += 1
+                    stats['bytes'] += nbytes
+                    if log:
+                        with lock:
+                            log.write(json.dumps({'done': i}) + '\n')
+                            log.flush()
+                except Exception as e:
+                    stats['failed'] += 1
+                    stats['errors'].append((ops[i], str(e)))
+                if progress and time.time() - last_print > 0.5:
+                    last_print = time.time()
+                    _print_progress(n, len(ops), stats['bytes'], start)
+    finally:
+        if log:
+            log.close()
+
+    sec = time.time() - start
+    if progress:
+        _print_progress(len(ops), len(ops), stats['bytes'], start, end='\n')
+    stats.update(sec=sec, files_per_sec=(stats['done'] + stats['skipped']) / max(sec, 1e-9),
+                 mb_per_sec=stats['bytes'] / max(sec, 1e-9) / 1024 ** 2)
+    if log_path and stats['failed'] == 0 and os.path.exists(log_path):
+        os.remove(log_path)
+    for op, err in stats['errors'][:10]:
+        print(f"  ✗ {op[0]} ไม่สำเร็จ {op[1] or op[2]}: {err}")
+    return stats
+
+
+if __name__ == '__main__':
+    # รันงานที่ค้างใน op log ต่อ: python file_ops.py <log_path>
+    sys.stdout.reconfigure(encoding='utf-8')
+    if len(sys.argv) != 2:
+        print("Usage: python file_ops.py <op_log>")
+        sys.exit(1)
+    result = run_ops([], log_path=sys.argv[1])
+    print(f"done={result['done']} skipped={result['skipped']} failed={result['failed']}")
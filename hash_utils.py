@@ -0,0 +1,48 @@
+import os
+import json
+import hashlib
+
+_memo = {}
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def cached_file_sha256(path):
+    # ไฟล์ใหญ่ (เช่น best.pt) จะ hash ใหม่เฉพาะเมื่อขนาดหรือเวลาแก้ไขเปลี่ยน
+    st = os.stat(path)
+    key = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+    if key not in _memo:
+        _memo[key] = file_sha256(path)
+    return _memo[key]
+
+
+def dict_sha256(data):
+    return hashlib.sha256(json.dumps(data, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+def tree_manifest_sha256(root, subdirs=('images', 'labels')):
+    # fingerprint ของโฟลเดอร์จาก (path, size, mtime) ของทุกไฟล์ ไม่ต้องอ่านเนื้อหาไฟล์
+    # (ข้ามไฟล์ *.cache ที่ Ultralytics เขียนลง labels/ ตอนเทรน)
+    h = hashlib.sha256()
+    for sub in subdirs:
+        base = os.path.join(root, sub)
+        if not os.path.isdir(base):
+            continue
+        entries = []
+        stack = [base]
+        while stack:
+            for e in os.scandir(stack.pop()):
+                if e.is_dir(follow_symlinks=False):
+                    stack.append(e.path)
+                elif not e.name.endswith('.cache'):
+                    st = e.stat(follow_symlinks=False)
+                    entries.append((os.path.relpath(e.path, root), st.st_size, st.st_mtime_ns))
+        for rel, size, mtime in sorted(entries):
+            h.update(f'{rel}\t{size}\t{mtime}\n'.encode('utf-8'))
+    return h.hexdigest()
@@ -0,0 +1,329 @@
+import os
+import sys
+import json
+import math
+import time
+import random
+import argparse
+import itertools
+import subprocess
+from datetime import datetime
+
+import report_utils
+
+# ค่าเริ่มต้นเดียวกับ train_main_method_3.py; search space จะ override ทับ
+BASE_TRAIN_ARGS = {
+    'epochs': 100,
+    'batch': 16,
+    'imgsz': 640,
+    'patience': 50,
+    'save': True,
+    'verbose': True,
+    'plots': True,
+}
+
+# ตัวอย่าง search space (recipe ของ train_main_method_1_3.py เทียบกับค่า default)
+EXAMPLE_SPACE = {
+    'optimizer': ['auto', 'AdamW'],
+    'lr0': [0.001, 0.01],
+    'cos_lr': [False, True],
+    'warmup_epochs': [3.0],
+}
+
+FITNESS_KEY = 'metrics/mAP50-95(B)'
+
+
+def _sample(spec, rng):
+    if isinstance(spec, list):
+        return rng.choice(spec)
+    if 'values' in spec:
+        return rng.choice(spec['values'])
+    if 'uniform' in spec:
+        lo, hi = spec['uniform']
+        return rng.uniform(lo, hi)
+    if 'loguniform' in spec:
+        lo, hi = spec['loguniform']
+        return math.exp(rng.uniform(math.log(lo), math.log(hi)))
+    if 'int' in spec:
+        lo, hi = spec['int']
+        return rng.randint(lo, hi)
+    raise ValueError(f'search space ไม่รองรับ: {spec}')
+
+
+def generate_trials(space, mode='grid', n_trials=10, seed=0):
+    """
+    สร้างรายการ trial แบบ deterministic (seed เดิม = รายการเดิม) เพื่อให้ resume ได้
+    """
+    if mode == 'grid':
+        keys = sorted(space)
+        values = []
+        for k in keys:
+            spec = space[k]
+            if isinstance(spec, dict):
+                if 'values' not in spec:
+                    raise ValueError(f'grid search ต้องใช้ list หรือ {{"values": [...]}} ที่ {k}')
+                spec = spec['values']
+            values.append(spec)
+        return [dict(zip(keys, combo)) for combo in itertools.product(*values)]
+
+    rng = random.Random(seed)
+    return [{k: _sample(space[k], rng) for k in sorted(space)} for _ in range(n_trials)]
+
+
+def _read_jsonl(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _write_json(path, data):
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2, default=str)
+    os.replace(tmp, path)
+
+
+def _best_so_far(sweep_dir, exclude, epoch):
+    # ค่า fitness ที่ดีที่สุดจนถึง epoch นี้ของ trial อื่นๆ (ใช้กับ median stopping rule)
+    values = []
+    trials_dir = os.path.join(sweep_dir, 'trials')
+    for tid in os.listdir(trials_dir):
+        if tid == exclude:
+            continue
+        rows = [r for r in _read_jsonl(os.path.join(trials_dir, tid, 'epochs.jsonl')) if r['epoch'] <= epoch]
+        if rows and rows[-1]['epoch'] == epoch:
+            values.append(max(r['fitness'] for r in rows))
+    return values
+
+
+def run_trial(trial_dir):
+    """
+    รันใน subprocess แยก: เทรน 1 trial, บันทึก metric ทุก epoch และหยุดเองถ้าแย่กว่า trial อื่น
+    """
+    from ultralytics import YOLO
+
+    with open(os.path.join(trial_dir, 'trial.json'), 'r', encoding='utf-8') as f:
+        trial = json.load(f)
+    sweep_dir = os.path.dirname(os.path.dirname(trial_dir))
+    tid = os.path.basename(trial_dir)
+    epochs_log = os.path.join(trial_dir, 'epochs.jsonl')
+    prune = trial['prune']
+    state = {'pruned': False}
+
+    def on_fit_epoch_end(trainer):
+        epoch = trainer.epoch + 1
+        fitness = float(trainer.metrics.get(FITNESS_KEY, 0.0))
+        with open(epochs_log, 'a', encoding='utf-8') as f:
+            f.write(json.dumps({'epoch': epoch, 'fitness': fitness,
+                                'metrics': {k: float(v) for k, v in trainer.metrics.items()}}) + '\n')
+        if epoch < prune['min_epochs']:
+            return
+        others = sorted(_best_so_far(sweep_dir, tid, epoch))
+        if len(others) < prune['min_trials']:
+            return
+        mine = max(r['fitness'] for r in _read_jsonl(epochs_log))
+        pos = (len(others) - 1) * prune['percentile'] / 100.0
+        lo = int(pos)
+        hi = min(lo + 1, len(others) - 1)
+        cutoff = others[lo] + (others[hi] - others[lo]) * (pos - lo)
+        if mine < cutoff:
+            print(f" [{tid}] early stop at epoch {epoch}: {mine:.4f} < {cutoff:.4f}")
+            state['pruned'] = True
+            trainer.stop = True
+
+    last_pt = os.path.join(trial_dir, 'train', 'weights', 'last.pt')
+    if os.path.exists(last_pt):
+        # ต่อจาก checkpoint เดิมหลังถูก interrupt
+        model = YOLO(last_pt)
+        model.add_callback('on_fit_epoch_end', on_fit_epoch_end)
+        try:
+            results = model.train(resume=True)
+        except AssertionError:
+            # เทรนครบแล้วแต่ crash ก่อนเขียน result.json -> ทำแค่ส่วน report
+            results = None
+    else:
+        if os.path.exists(epochs_log):
+            os.remove(epochs_log)
+        model = YOLO(trial['weights'])
+        model.add_callback('on_fit_epoch_end', on_fit_epoch_end)
+        results = model.train(data=trial['data'], device=trial['device'], project=trial_dir, name='train',
+                              exist_ok=True, **trial['train_args'])
+
+    save_dir = str(results.save_dir) if results is not None else os.path.join(trial_dir, 'train')
+    best_pt = os.path.join(save_dir, 'weights', 'best.pt')
+    log_dir = report_utils.create_log_directory(os.path.join(sweep_dir, 'logs', tid))
+    summary = report_utils.save_results(save_dir, log_dir, best_pt)
+    report_utils.generate_text_report(log_dir, {**trial['train_args'], 'Trial': tid, 'Device': trial['device']}, summary)
+
+    rows = _read_jsonl(epochs_log)
+    _write_json(os.path.join(trial_dir, 'result.json'), {
+        'status': 'pruned' if state['pruned'] else 'done',
+        'epochs_run': len(rows),
+        'best_fitness': max((r['fitness'] for r in rows), default=0.0),
+        'summary': summary,
+        'log_dir': log_dir,
+    })
+
+
+def _limit_resources(cores, mem_gb):
+    # ใช้ได้เฉพาะ Linux/macOS; บน Windows ข้ามการจำกัดไป
+    def fn():
+        if cores and hasattr(os, 'sched_setaffinity'):
+            os.sched_setaffinity(0, cores)
+        if mem_gb:
+            try:
+                import resource
+                limit = int(mem_gb * 1024 ** 3)
+                resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+            except (ImportError, ValueError, OSError):
+                pass
+    return fn
+
+
+def _slots(devices, workers, threads):
+    n_cpu = os.cpu_count() or 1
+    threads = threads or max(1, n_cpu // workers)
+    slots = []
+    for i in range(workers):
+        cores = set(range(i * threads, min((i + 1) * threads, n_cpu))) or None
+        slots.append({'device': devices[i % len(devices)], 'cores': cores, 'threads': threads})
+    return slots
+
+
+def run_sweep(args):
+    sweep_dir = args.sweep_dir or os.path.join('sweeps', datetime.now().strftime('sweep_%Y%m%d_%H%M%S'))
+    os.makedirs(os.path.join(sweep_dir, 'trials'), exist_ok=True)
+    sweep_json = os.path.join(sweep_dir, 'sweep.json')
+
+    if os.path.exists(sweep_json):
+        with open(sweep_json, 'r', encoding='utf-8') as f:
+            sweep = json.load(f)
+        print(f" Resuming sweep: {sweep_dir} ({len(sweep['trials'])} trials)")
+    else:
+        if args.space:
+            with open(args.space, 'r', encoding='utf-8') as f:
+                space = json.load(f)
+        else:
+            space = EXAMPLE_SPACE
+        base = {**BASE_TRAIN_ARGS, 'epochs': args.epochs}
+        sweep = {
+            'data': os.path.abspath(args.data),
+            'weights': args.weights,
+            'space': space,
+            'mode': args.mode,
+            'seed': args.seed,
+            'prune': {'min_epochs': args.min_epochs, 'min_trials': args.min_trials, 'percentile': args.percentile},
+            'trials': [{**base, **p} for p in generate_trials(space, args.mode, args.trials, args.seed)],
+        }
+        _write_json(sweep_json, sweep)
+        print(f" New sweep: {sweep_dir} ({len(sweep['trials'])} trials)")
+
+    todo = []
+    for i, train_args in enumerate(sweep['trials']):
+        tid = f'trial_{i:03d}'
+        if os.path.exists(os.path.join(sweep_dir, 'trials', tid, 'result.json')):
+            continue
+        todo.append((tid, train_args))
+    print(f" Trials remaining: {len(todo)}")
+
+    slots = _slots(args.devices.split(','), args.workers, args.threads)
+    running = {}
+    while todo or running:
+        for slot_id, slot in enumerate(slots):
+            if slot_id in running or not todo:
+                continue
+            tid, train_args = todo.pop(0)
+            trial_dir = os.path.join(sweep_dir, 'trials', tid)
+            os.makedirs(trial_dir, exist_ok=True)
+            _write_json(os.path.join(trial_dir, 'trial.json'), {
+                'data': sweep['data'], 'weights': sweep['weights'], 'device': slot['device'],
+                'prune': sweep['prune'], 'train_args': {**train_args, 'workers': min(8, slot['threads'])},
+            })
+            env = {**os.environ, 'OMP_NUM_THREADS': str(slot['threads']), 'MKL_NUM_THREADS': str(slot['threads'])}
+            log = open(os.path.join(trial_dir, 'stdout.log'), 'a', encoding='utf-8')
+            kwargs = {}
+            if os.name == 'posix':
+                kwargs['preexec_fn'] = _limit_resources(slot['cores'], args.mem_gb)
+            proc = subprocess.Popen([sys.executable, os.path.abspath(__file__), '_trial', trial_dir],
+                                    stdout=log, stderr=subprocess.STDOUT, env=env, **kwargs)
+            running[slot_id] = (tid, proc, log)
+            print(f" ▶ {tid} on device={slot['device']}: {train_args}")
+
+        for slot_id, (tid, proc, log) in list(running.items()):
+            if proc.poll() is None:
+                continue
+            log.close()
+            del running[slot_id]
+            print(f" ■ {tid} finished (exit {proc.returncode})")
+        time.sleep(2)
+
+    write_leaderboard(sweep_dir)
+
+
+def write_leaderboard(sweep_dir):
+    with open(os.path.join(sweep_dir, 'sweep.json'), 'r', encoding='utf-8') as f:
+        sweep = json.load(f)
+    rows = []
+    for i, train_args in enumerate(sweep['trials']):
+        tid = f'trial_{i:03d}'
+        path = os.path.join(sweep_dir, 'trials', tid, 'result.json')
+        if not os.path.exists(path):
+            rows.append({'trial': tid, 'status': 'pending', 'best_fitness': None, 'args': train_args})
+            continue
+        with open(path, 'r', encoding='utf-8') as f:
+            res = json.load(f)
+        rows.append({'trial': tid, 'status': res['status'], 'best_fitness': res['best_fitness'],
+                     'epochs_run': res['epochs_run'], 'mAP50': res['summary'].get('mAP50'),
+                     'log_dir': res['log_dir'], 'args': train_args})
+    rows.sort(key=lambda r: -(r['best_fitness'] or -1))
+    _write_json(os.path.join(sweep_dir, 'leaderboard.json'), rows)
+
+    print(f"\n{'=' * 60}")
+    print(f"{'Trial':<12} {'Status':<8} {'mAP50-95':<10} {'Epochs':<7} Params")
+    print("-" * 60)
+    space_keys = sorted(sweep['space'])
+    for r in rows:
+        fit = f"{r['best_fitness']:.4f}" if r['best_fitness'] is not None else '-'
+        params = {k: r['args'][k] for k in space_keys if k in r['args']}
+        print(f"{r['trial']:<12} {r['status']:<8} {fit:<10} {str(r.get('epochs_run', '-')):<7} {params}")
+
+
+def main():
+    sys.stdout.reconfigure(encoding='utf-8')
+    if len(sys.argv) == 3 and sys.argv[1] == '_trial':
+        run_trial(sys.argv[2])
+        return
+
+    parser = argparse.ArgumentParser(description="Parallel, resumable hyperparameter sweep for model.train")
+    sub = parser.add_subparsers(dest='cmd', required=True)
+
+    p_run = sub.add_parser('run')
+    p_run.add_argument("--data", required=True, help="data.yaml")
+    p_run.add_argument("--weights", default='yolov8n.pt')
+    p_run.add_argument("--space", default=None, help="search space (.json) ถ้าไม่ใส่จะใช้ EXAMPLE_SPACE")
+    p_run.add_argument("--mode", choices=['grid', 'random'], default='grid')
+    p_run.add_argument("--trials", type=int, default=10, help="จำนวน trial (random search)")
+    p_run.add_argument("--seed", type=int, default=0)
+    p_run.add_argument("--epochs", type=int, default=30)
+    p_run.add_argument("--devices", default='0', help="เช่น 0,1 หรือ cpu")
+    p_run.add_argument("--workers", type=int, default=1, help="จำนวน trial ที่รันพร้อมกัน")
+    p_run.add_argument("--threads", type=int, default=None, help="จำนวน CPU core ต่อ trial")
+    p_run.add_argument("--mem-gb", type=float, default=None, help="จำกัด address space ต่อ trial (Linux)")
+    p_run.add_argument("--min-epochs", type=int, default=5, help="ไม่ early stop ก่อน epoch นี้")
+    p_run.add_argument("--min-trials", type=int, default=2, help="ต้องมี trial อื่นอย่างน้อยกี่ตัวถึงจะเทียบ")
+    p_run.add_argument("--percentile", type=float, default=50.0, help="หยุดถ้าต่ำกว่า percentile นี้ของ trial อื่น")
+    p_run.add_argument("--sweep-dir", default=None, help="ใส่โฟลเดอร์เดิมเพื่อ resume")
+
+    p_st = sub.add_parser('status')
+    p_st.add_argument("--sweep-dir", required=True)
+    args = parser.parse_args()
+
+    if args.cmd == 'run':
+        run_sweep(args)
+    else:
+        write_leaderboard(args.sweep_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,226 @@
+from __future__ import annotations
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import List, Optional
+
+import numpy as np
+import cv2
+
+IMG_EXTS = ('.jpg', '.jpeg', '.png')
+# re-encode แล้วต้องเล็กลงอย่างน้อย 5% (กรณีไม่ได้ย่อ) ไม่อย่างนั้นคงไฟล์เดิม
+# รันซ้ำกับรูปที่ optimize แล้วจึงไม่ถูก encode ทับซ้ำจนคุณภาพลดลงเรื่อยๆ
+MIN_GAIN = 0.95
+
+
+def list_images(root: str, exclude: Optional[str] = None) -> List[str]:
+    paths, stack = [], [root]
+    exclude = os.path.abspath(exclude) if exclude else None
+    while stack:
+        for e in os.scandir(stack.pop()):
+            if e.is_dir(follow_symlinks=False):
+                if os.path.abspath(e.path) != exclude:
+                    stack.append(e.path)
+            elif e.name.lower().endswith(IMG_EXTS) and e.is_file(follow_symlinks=False):
+                paths.append(e.path)
+    return sorted(paths)
+
+
+def _decode(data: bytes):
+    t0 = time.perf_counter()
+    img = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+    return img, (time.perf_counter() - t0) * 1000
+
+
+def optimize_one(path: str, root: str, max_side: int, quality: int, write: bool = False,
+                 keep_dir: Optional[str] = None) -> dict:
+    """
+    ย่อรูปให้ด้านยาวไม่เกิน max_side (INTER_AREA, คงสัดส่วน) แล้ว encode ใหม่ในนามสกุลเดิม
+    label YOLO เป็นพิกัด normalized จึงใช้ได้เหมือนเดิมโดยไม่ต้องแก้
+    เวลา decode วัดจาก bytes ในหน่วยความจำทั้งก่อนและหลัง (ไม่รวมเวลาอ่านดิสก์)
+    """
+    with open(path, 'rb') as f:
+        raw = f.read()
+    img, ms_before = _decode(raw)
+    rec = {'path': path, 'bytes_before': len(raw), 'bytes_after': len(raw),
+           'decode_ms_before': ms_before, 'decode_ms_after': ms_before, 'status': 'kept'}
+    if img is None:
+        rec['status'] = 'unreadable'
+        return rec
+
+    h, w = img.shape[:2]
+    scale = max_side / max(h, w)
+    if scale < 1:
+        img = cv2.resize(img, (max(1, round(w * scale)), max(1, round(h * scale))), interpolation=cv2.INTER_AREA)
+    ext = os.path.splitext(path)[1].lower()
+    params = [cv2.IMWRITE_JPEG_QUALITY, quality] if ext in ('.jpg', '.jpeg') else [cv2.IMWRITE_PNG_COMPRESSION, 3]
+    ok, buf = cv2.imencode(ext, img, params)
+    if not ok or (scale >= 1 and len(buf) >= len(raw) * MIN_GAIN):
+        return rec
+    data = buf.tobytes()
+    rec.update(status='optimized', bytes_after=len(data), decode_ms_after=_decode(data)[1],
+               shape_before=[w, h], shape_after=[img.shape[1], img.shape[0]])
+    if write:
+        if keep_dir:
+            backup = os.path.join(keep_dir, os.path.relpath(path, root))
+            os.makedirs(os.path.dirname(backup), exist_ok=True)
+            if not os.path.exists(backup):
+                shutil.copy2(path, backup)
+        with open(path + '.tmp', 'wb') as f:
+            f.write(data)
+        os.replace(path + '.tmp', path)
+    return rec
+
+
+def optimize_dataset(root: str, max_side: int = 1280, quality: int = 90, dry_run: bool = True,
+                     keep_dir: Optional[str] = None, workers: Optional[int] = None) -> dict:
+    """
+    optimize รูปทุกไฟล์ใต้ root ใน process pool (decode / resize / encode ใช้ CPU ล้วน)
+    dry_run=True คำนวณทุกอย่างแต่ไม่เขียนไฟล์ (ได้ตัวเลขประหยัดจริงก่อนตัดสินใจ)
+    """
+    paths = list_images(root, exclude=keep_dir)
+    fn = partial(optimize_one, root=root, max_side=max_side, quality=quality, write=not dry_run, keep_dir=keep_dir)
+    records = []
+    start = time.time()
+    with ProcessPoolExecutor(workers) as pool:
+        for n, rec in enumerate(pool.map(fn, paths, chunksize=16), 1):
+            records.append(rec)
+            if n % 200 == 0 or n == len(paths):
+                print(f"  {n}/{len(paths)} files | {n / max(time.time() - start, 1e-9):.1f} files/s", end='\r', flush=True)
+    if paths:
+        print()
+    return summarize(records, time.time() - start)
+
+
+def summarize(records: List[dict], sec: float) -> dict:
+    ok = [r for r in records if r['status'] != 'unreadable']
+    before = np.array([r['decode_ms_before'] for r in ok]) if ok else np.zeros(1)
+    after = np.array([r['decode_ms_after'] for r in ok]) if ok else np.zeros(1)
+    bytes_before = sum(r['bytes_before'] for r in records)
+    bytes_after = sum(r['bytes_after'] for r in records)
+    return {
+        'files': len(records),
+        'optimized': sum(r['status'] == 'optimized' for r in records),
+        'kept': sum(r['status'] == 'kept' for r in records),
+        'unreadable': [r['path'] for r in records if r['status'] == 'unreadable'],
+        'bytes_before': bytes_before,
+        'bytes_after': bytes_after,
+        'saved_ratio': 1 - bytes_after / bytes_before if bytes_before else 0.0,
+        'decode_ms_before': float(before.mean()),
+        'decode_ms_after': float(after.mean()),
+        'decode_speedup': float(before.sum() / after.sum()) if after.sum() else 1.0,
+        'decode_speedup_p50': float(np.median(before / np.maximum(after, 1e-9))),
+        'sec': sec,
+    }
+
+
+def print_summary(s: dict) -> None:
+    mb = 1024 ** 2
+    print(f" รูปทั้งหมด      : {s['files']} (optimize {s['optimized']}, คงเดิม {s['kept']}, อ่านไม่ได้ {len(s['unreadable'])})")
+    print(f" ขนาดรวม        : {s['bytes_before'] / mb:.1f} MB -> {s['bytes_after'] / mb:.1f} MB "
+          f"(ประหยัด {(s['bytes_before'] - s['bytes_after']) / mb:.1f} MB, {s['saved_ratio']:.1%})")
+    print(f" decode ต่อรูป   : {s['decode_ms_before']:.2f} ms -> {s['decode_ms_after']:.2f} ms "
+          f"(เร็วขึ้น {s['decode_speedup']:.2f}x, median ต่อรูป {s['decode_speedup_p50']:.2f}x)")
+    print(f" เวลา           : {s['sec']:.1f} s")
+    for p in s['unreadable'][:5]:
+        print(f"   ⚠️  อ่านไม่ได้: {p}")
+
+
+def restore(keep_dir: str, root: str, dry_run: bool = True) -> int:
+    # copy ต้นฉบับจาก --keep-originals กลับไปทับรูปที่ optimize แล้ว (ต้นฉบับยังอยู่ที่เดิม)
+    paths = list_images(keep_dir)
+    for src in paths:
+        dst = os.path.join(root, os.path.relpath(src, keep_dir))
+        if not dry_run:
+            shutil.copy2(src, dst + '.tmp')
+            os.replace(dst + '.tmp', dst)
+    return len(paths)
+
+
+def val_map(weights: str, data_yaml: str, imgsz: int = 640, batch: int = 16, device=None) -> dict:
+    from ultralytics import YOLO  # import ตอนใช้: worker ของ process pool (spawn บน Windows) จะได้ไม่ต้องโหลด torch
+    metrics = YOLO(weights).val(data=data_yaml, split='test', imgsz=imgsz, batch=batch, device=device,
+                                plots=False, verbose=False)
+    return {'mAP50': float(metrics.box.map50), 'mAP50-95': float(metrics.box.map)}
+
+
+def main() -> None:
+    sys.stdout.reconfigure(encoding='utf-8')
+    parser = argparse.ArgumentParser(description="Downscale and re-encode dataset images (labels are untouched)")
+    parser.add_argument("--dataset", default=r'D:\model_cuu\dataset', help="โฟลเดอร์ที่มี images/")
+    parser.add_argument("--images", default=None, help="ระบุโฟลเดอร์ images เอง (แทน --dataset)")
+    parser.add_argument("--max-side", type=int, default=1280,
+                        help="ด้านยาวสูงสุด (ควร >= 2 x imgsz เผื่อ scale augment; ใช้ tiled inference ให้ตั้งสูงกว่านี้)")
+    parser.add_argument("--quality", type=int, default=90, help="JPEG quality (1-100)")
+    parser.add_argument("--workers", type=int, default=None, help="จำนวน process (ค่าเริ่มต้น = จำนวน CPU)")
+    parser.add_argument("--keep-originals", default=None, help="copy ต้นฉบับไปเก็บที่โฟลเดอร์นี้ก่อนเขียนทับ")
+    parser.add_argument("--restore", default=None, help="copy ต้นฉบับจากโฟลเดอร์นี้กลับ (ไม่ optimize)")
+    parser.add_argument("--validate", action='store_true', help="เทียบ mAP บน test split ก่อน/หลัง")
+    parser.add_argument("--weights", default=None, help="best.pt สำหรับ --validate")
+    parser.add_argument("--data", default=None, help="data.yaml (ค่าเริ่มต้น = <dataset>/data.yaml)")
+    parser.add_argument("--tolerance", type=float, default=0.005, help="mAP50-95 ลดลงได้ไม่เกินเท่านี้")
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--batch", type=int, default=16)
+    parser.add_argument("--device", default=None)
+    parser.add_argument("--report", default=None, help="บันทึกผลเป็น JSON")
+    parser.add_argument("--yes", action='store_true', help="ยืนยันทำจริง (ถ้าไม่ใส่จะเป็นแค่ Preview)")
+    args = parser.parse_args()
+
+    root = args.images or os.path.join(args.dataset, 'images')
+    if not os.path.isdir(root):
+        print(f"Error: ไม่พบโฟลเดอร์: {root}")
+        return
+    if args.validate and not args.weights:
+        print("Error: --validate ต้องระบุ --weights")
+        return
+
+    is_dry_run = not args.yes
+    if is_dry_run:
+        print("\n!!! นี่คือโหมดทดสอบ (Dry Run) - ยังไม่มีการแก้ไขไฟล์จริง !!!")
+        print("ให้เติม --yes ต่อท้ายคำสั่งเพื่อรันจริง\n")
+
+    if args.restore:
+        n = restore(args.restore, root, is_dry_run)
+        print(f"✓ {'จะคืน' if is_dry_run else 'คืน'}ต้นฉบับ {n} รูป -> {root}")
+        return
+
+    data_yaml = args.data or os.path.join(args.dataset, 'data.yaml')
+    before = None
+    if args.validate and not is_dry_run:
+        print("--- mAP ก่อน optimize (test split) ---")
+        before = val_map(args.weights, data_yaml, args.imgsz, args.batch, args.device)
+
+    print(f"--- Optimize {root}: max side {args.max_side}px, JPEG quality {args.quality} ---")
+    summary = optimize_dataset(root, args.max_side, args.quality, is_dry_run, args.keep_originals, args.workers)
+    print("=" * 60)
+    print_summary(summary)
+    print("=" * 60)
+
+    if before is not None:
+        after = val_map(args.weights, data_yaml, args.imgsz, args.batch, args.device)
+        delta = after['mAP50-95'] - before['mAP50-95']
+        summary['validation'] = {'before': before, 'after': after, 'delta_mAP50-95': delta,
+                                 'tolerance': args.tolerance, 'passed': delta >= -args.tolerance}
+        print(f" mAP50     : {before['mAP50']:.4f} -> {after['mAP50']:.4f}")
+        print(f" mAP50-95  : {before['mAP50-95']:.4f} -> {after['mAP50-95']:.4f} (Δ {delta:+.4f})")
+        if delta >= -args.tolerance:
+            print(f"✓ mAP อยู่ในเกณฑ์ (tolerance {args.tolerance})")
+        elif args.keep_originals:
+            print(f"❌ mAP ลดลงเกิน {args.tolerance} คืนต้นฉบับด้วย: --restore {args.keep_originals} --yes")
+        else:
+            print(f"❌ mAP ลดลงเกิน {args.tolerance} (ไม่ได้เก็บต้นฉบับ ลองเพิ่ม --max-side / --quality กับสำเนา dataset)")
+
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+        print(f" Report saved: {args.report}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,283 @@
+import os
+import sys
+import json
+import time
+import argparse
+from datetime import datetime
+
+import numpy as np
+import cv2
+import torch
+from ultralytics import YOLO
+from ultralytics.utils import ops
+
+import inference_utils
+import latency_utils
+
+
+def letterbox(img, imgsz=640, color=114):
+    # resize รักษาสัดส่วน + pad ให้เป็นสี่เหลี่ยมจัตุรัส (ขนาดเท่ากันทุกรูป จึงรวมเป็น batch ได้)
+    h, w = img.shape[:2]
+    r = min(imgsz / h, imgsz / w)
+    nw, nh = round(w * r), round(h * r)
+    if (nw, nh) != (w, h):
+        img = cv2.resize(img, (nw, nh), interpolation=cv2.INTER_LINEAR)
+    left, top = (imgsz - nw) // 2, (imgsz - nh) // 2
+    out = np.full((imgsz, imgsz, 3), color, np.uint8)
+    out[top:top + nh, left:left + nw] = img
+    return out, r, (left, top)
+
+
+def preprocess(images, imgsz=640):
+    """
+    รูป BGR (cv2) หลายรูป -> input float32 (B, 3, imgsz, imgsz) และ meta สำหรับแปลงพิกัดกลับ
+    """
+    batch, metas = [], []
+    for img in images:
+        lb, r, pad = letterbox(img, imgsz)
+        batch.append(lb[:, :, ::-1].transpose(2, 0, 1))
+        metas.append((r, pad, img.shape[:2]))
+    x = np.ascontiguousarray(np.stack(batch)).astype(np.float32) / 255.0
+    return x, metas
+
+
+def postprocess(raw, metas, conf=0.25, iou=0.7, max_det=300):
+    """
+    output ดิบของโมเดล (B, 4 + nc, anchors) -> NMS ของ ultralytics -> detections ในพิกัดรูปต้นฉบับ
+    ทุก backend ใช้ฟังก์ชันนี้ ผลจึงต่างกันได้เฉพาะจากตัวเลขของ output ดิบ
+    """
+    preds = ops.non_max_suppression(torch.from_numpy(np.ascontiguousarray(raw, np.float32)), conf, iou, max_det=max_det)
+    dets = []
+    for det, (r, (left, top), (h, w)) in zip(preds, metas):
+        d = det.numpy()
+        boxes = d[:, :4].copy()
+        boxes[:, [0, 2]] = ((boxes[:, [0, 2]] - left) / r).clip(0, w)
+        boxes[:, [1, 3]] = ((boxes[:, [1, 3]] - top) / r).clip(0, h)
+        dets.append({'boxes': boxes.astype(np.float32), 'scores': d[:, 4].astype(np.float32),
+                     'classes': d[:, 5].astype(np.int64), 'width': int(w), 'height': int(h)})
+    return dets
+
+
+def _first(out):
+    # nn model (eval) คืนค่า (y, feature maps) ใช้เฉพาะ y
+    out = out[0] if isinstance(out, (list, tuple)) else out
+    return out.detach().float().cpu().numpy()
+
+
+class EagerBackend:
+    name = 'eager'
+
+    def __init__(self, weights, imgsz=640):
+        self.module = YOLO(weights).model.float().eval().fuse()
+
+    def __call__(self, x):
+        with torch.inference_mode():
+            return _first(self.module(torch.from_numpy(x)))
+
+
+class TorchScriptBackend(EagerBackend):
+    # trace + freeze ต่อ shape ของ input (batch size ต่างกันจะ trace ใหม่ครั้งเดียว)
+    name = 'torchscript'
+
+    def __init__(self, weights, imgsz=640):
+        super().__init__(weights, imgsz)
+        self.traced = {}
+
+    def __call__(self, x):
+        xt = torch.from_numpy(x)
+        with torch.inference_mode():
+            fn = self.traced.get(x.shape)
+            if fn is None:
+                fn = torch.jit.freeze(torch.jit.trace(self.module, xt, strict=False))
+                self.traced[x.shape] = fn
+            return _first(fn(xt))
+
+
+class CompileBackend(EagerBackend):
+    name = 'compile'
+
+    def __init__(self, weights, imgsz=640):
+        if not hasattr(torch, 'compile'):
+            raise RuntimeError('torch.compile ต้องใช้ PyTorch 2.0 ขึ้นไป')
+        super().__init__(weights, imgsz)
+        self.compiled = torch.compile(self.module)
+
+    def __call__(self, x):
+        with torch.inference_mode():
+            return _first(self.compiled(torch.from_numpy(x)))
+
+
+class OnnxBackend:
+    name = 'onnx'
+
+    def __init__(self, weights, imgsz=640):
+        import onnxruntime as ort
+        path = latency_utils.export_onnx(weights, imgsz, dynamic=True)
+        opts = ort.SessionOptions()
+        opts.intra_op_num_threads = torch.get_num_threads()  # จำนวน thread เท่ากับ backend ของ torch
+        self.sess = ort.InferenceSession(path, opts, providers=['CPUExecutionProvider'])
+        self.input_name = self.sess.get_inputs()[0].name
+
+    def __call__(self, x):
+        return self.sess.run(None, {self.input_name: x})[0]
+
+
+BACKENDS = {b.name: b for b in (EagerBackend, TorchScriptBackend, CompileBackend, OnnxBackend)}
+
+
+class Detector:
+    """
+    inference interface เดียวสำหรับทุก backend: preprocess -> backend -> NMS (ฟังก์ชันเดียวกันหมด)
+    คืนค่า detections รูปแบบเดียวกับ inference_utils (boxes xyxy, scores, classes, width, height)
+    """
+
+    def __init__(self, weights, backend='eager', imgsz=640, conf=0.25, iou=0.7):
+        if backend not in BACKENDS:
+            raise ValueError(f"ไม่รู้จัก backend: {backend} (มี {', '.join(BACKENDS)})")
+        self.imgsz, self.conf, self.iou = imgsz, conf, iou
+        self.backend = BACKENDS[backend](weights, imgsz)
+
+    def predict(self, images):
+        x, metas = preprocess(images, self.imgsz)
+        return postprocess(self.backend(x), metas, self.conf, self.iou)
+
+    def predict_paths(self, paths, batch=16):
+        out = {}
+        for i in range(0, len(paths), batch):
+            chunk = paths[i:i + batch]
+            for p, d in zip(chunk, self.predict([cv2.imread(p) for p in chunk])):
+                out[p] = d
+        return out
+
+
+def _box_iou(a, b):
+    lt = np.maximum(a[:, None, :2], b[None, :, :2])
+    rb = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = np.clip(rb - lt, 0, None).prod(axis=2)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-9)
+
+
+def parity(ref, dets, iou_thr=0.95):
+    """
+    เทียบ detections กับ backend อ้างอิง: สัดส่วนกล่องที่จับคู่ได้ (class เดียวกัน, IoU >= iou_thr)
+    และค่าต่างของ score สูงสุด
+    """
+    matched = total = 0
+    max_score_diff = 0.0
+    identical = 0
+    for a, b in zip(ref, dets):
+        total += max(len(a['scores']), len(b['scores']))
+        if len(a['scores']) and len(b['scores']):
+            ious = _box_iou(a['boxes'], b['boxes'])
+            ious[a['classes'][:, None] != b['classes'][None, :]] = 0
+            best = ious.argmax(1)
+            ok = ious[np.arange(len(best)), best] >= iou_thr
+            matched += int(ok.sum())
+            if ok.any():
+                max_score_diff = max(max_score_diff, float(np.abs(a['scores'][ok] - b['scores'][best[ok]]).max()))
+        identical += int(len(a['scores']) == len(b['scores']) and
+                         np.allclose(a['boxes'], b['boxes'], atol=1.0) and np.array_equal(a['classes'], b['classes']))
+    return {'match_rate': matched / total if total else 1.0, 'max_score_diff': max_score_diff,
+            'identical_images': identical / max(len(ref), 1)}
+
+
+def benchmark(weights, images, backends, batch_sizes=(1, 4, 8, 16), imgsz=640, runs=20, warmup=3):
+    """
+    ต่อ backend: เวลาโหลด + เรียกครั้งแรก (warm-up), latency p50/p90/p99 ต่อ batch (รวม pre/NMS),
+    throughput (images/s) ต่อ batch size และ parity เทียบกับ backend แรก
+    """
+    results, ref = {}, None
+    for name in backends:
+        row = {'backend': name}
+        try:
+            t0 = time.perf_counter()
+            det = Detector(weights, name, imgsz)
+            det.predict(images[:1])
+            row['warmup_sec'] = time.perf_counter() - t0
+        except Exception as e:
+            print(f" ✗ {name}: {e}")
+            results[name] = {'backend': name, 'error': str(e)}
+            continue
+
+        row['batches'] = {}
+        for bs in batch_sizes:
+            chunk = (images * (bs // len(images) + 1))[:bs]
+            for _ in range(warmup):
+                det.predict(chunk)
+            times = []
+            for _ in range(runs):
+                t = time.perf_counter()
+                det.predict(chunk)
+                times.append((time.perf_counter() - t) * 1000)
+            p50, p90, p99 = np.percentile(times, [50, 90, 99])
+            row['batches'][bs] = {'p50_ms': float(p50), 'p90_ms': float(p90), 'p99_ms': float(p99),
+                                  'images_per_sec': bs * 1000 / float(np.mean(times))}
+            print(f"  {name:<12} batch={bs:<3} p50={p50:8.1f} ms  p99={p99:8.1f} ms  "
+                  f"{row['batches'][bs]['images_per_sec']:7.1f} img/s")
+
+        bs = max(batch_sizes)
+        dets = []
+        for i in range(0, len(images), bs):
+            dets += det.predict(images[i:i + bs])
+        if ref is None:
+            ref, row['parity'] = dets, {'reference': True}
+        else:
+            row['parity'] = parity(ref, dets)
+        results[name] = row
+    return results
+
+
+def summary_lines(results, batch_sizes):
+    bs_cols = ''.join(f"{f'b{bs} img/s':>11}" for bs in batch_sizes)
+    lines = [f"{'Backend':<12} {'Warm-up s':>9} {'p50 b1':>8} {'p99 b1':>8}{bs_cols} {'Match':>7} {'ΔScore':>7}"]
+    for name, r in results.items():
+        if 'error' in r:
+            lines.append(f"{name:<12} failed: {r['error'][:60]}")
+            continue
+        b1 = r['batches'][batch_sizes[0]]
+        tput = ''.join(f"{r['batches'][bs]['images_per_sec']:>11.1f}" for bs in batch_sizes)
+        par = r['parity']
+        match = 'ref' if par.get('reference') else f"{par['match_rate']:.1%}"
+        dscore = '' if par.get('reference') else f"{par['max_score_diff']:.4f}"
+        lines.append(f"{name:<12} {r['warmup_sec']:>9.2f} {b1['p50_ms']:>8.1f} {b1['p99_ms']:>8.1f}{tput} {match:>7} {dscore:>7}")
+    return lines
+
+
+def main():
+    sys.stdout.reconfigure(encoding='utf-8')
+    parser = argparse.ArgumentParser(description="Compare inference backends (eager, TorchScript, torch.compile, ONNX Runtime)")
+    parser.add_argument("--weights", required=True, help="best.pt")
+    parser.add_argument("--source", default=r'D:\model_cuu\dataset\images\test', help="โฟลเดอร์รูป (test split)")
+    parser.add_argument("--backends", default=','.join(BACKENDS), help="เช่น eager,onnx")
+    parser.add_argument("--batch-sizes", default='1,4,8,16')
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--max-images", type=int, default=64)
+    parser.add_argument("--runs", type=int, default=20, help="จำนวนครั้งที่วัดต่อ batch size")
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--out", default=None, help="บันทึกผลเป็น JSON")
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    paths = inference_utils.list_images(args.source)[:args.max_images]
+    if not paths:
+        print(f"Error: ไม่พบรูปใน {args.source}")
+        return
+    images = [cv2.imread(p) for p in paths]
+    batch_sizes = [int(b) for b in args.batch_sizes.split(',')]
+    print(f"--- {len(images)} รูป, threads={torch.get_num_threads()}, backends={args.backends} ---")
+    results = benchmark(args.weights, images, args.backends.split(','), batch_sizes, args.imgsz, args.runs)
+    print("\n" + "\n".join(summary_lines(results, batch_sizes)))
+
+    out = args.out or os.path.join('runs', 'backends', f"bench_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, 'w', encoding='utf-8') as f:
+        json.dump({'weights': args.weights, 'images': len(images), 'threads': torch.get_num_threads(),
+                   'results': results}, f, indent=2)
+    print(f" ผลลัพธ์: {out}")
+
+
+if __name__ == '__main__':
+    main()
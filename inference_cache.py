@@ -0,0 +1,170 @@
+import os
+import sys
+import json
+import time
+import sqlite3
+import argparse
+
+import hash_utils
+import inference_utils
+
+
+def model_weights_path(model):
+    # YOLO('best.pt') เก็บ path ไว้ที่ ckpt_path, ส่วน YOLO('best.onnx') เก็บ path ไว้ที่ model.model
+    path = getattr(model, 'ckpt_path', None)
+    if not path and isinstance(getattr(model, 'model', None), str):
+        path = model.model
+    return path if path and os.path.exists(path) else None
+
+
+class InferenceCache:
+    """
+    cache ผล detection บนดิสก์ key = hash(เนื้อหารูป, hash ของ weights, imgsz, conf, iou, ...)
+    เปลี่ยน best.pt ใหม่ -> hash ของ weights เปลี่ยน -> entry เก่าไม่ถูกใช้อีกและจะถูก evict ตามขนาด
+    """
+
+    def __init__(self, root='inference_cache', max_bytes=2 * 1024 ** 3):
+        self.root = root
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.join(root, 'objects'), exist_ok=True)
+        self.db = sqlite3.connect(os.path.join(root, 'index.db'), check_same_thread=False)
+        self.db.execute('CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, size INTEGER, last_access REAL)')
+        self.db.execute('CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER)')
+        self.db.commit()
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+
+    def _obj_path(self, key):
+        return os.path.join(self.root, 'objects', key[:2], key + '.json')
+
+    def make_key(self, image_path, weights_hash, params):
+        return hash_utils.dict_sha256({
+            'image': hash_utils.file_sha256(image_path),
+            'weights': weights_hash,
+            'params': params,
+        })
+
+    def get(self, key):
+        path = self._obj_path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                det = inference_utils.detections_from_json(json.load(f))
+        except (OSError, ValueError, KeyError):
+            self.misses += 1
+            return None
+        self.db.execute('UPDATE entries SET last_access = ? WHERE key = ?', (time.time(), key))
+        self.hits += 1
+        return det
+
+    def put(self, key, det):
+        path = self._obj_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(inference_utils.detections_to_json(det), f)
+        os.replace(tmp, path)
+        self.db.execute('INSERT OR REPLACE INTO entries VALUES (?, ?, ?)', (key, os.path.getsize(path), time.time()))
+
+    def evict(self):
+        # ลบ entry ที่ถูกใช้ล่าสุดนานที่สุด (LRU) จนขนาดรวมไม่เกิน max_bytes
+        total = self.db.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+        if total <= self.max_bytes:
+            return 0
+        removed = []
+        for key, size in self.db.execute('SELECT key, size FROM entries ORDER BY last_access'):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(self._obj_path(key))
+            except OSError:
+                pass
+            total -= size
+            removed.append((key,))
+        self.db.executemany('DELETE FROM entries WHERE key = ?', removed)
+        self.evicted += len(removed)
+        return len(removed)
+
+    def flush(self):
+        for name, value in (('hits', self.hits), ('misses', self.misses), ('evicted', self.evicted)):
+            self.db.execute('INSERT INTO counters VALUES (?, ?) ON CONFLICT(name) DO UPDATE SET value = value + ?',
+                            (name, value, value))
+        self.hits = self.misses = self.evicted = 0
+        self.evict()
+        self.db.commit()
+
+    def lookup_many(self, model, paths, params):
+        """
+        แยกรูปที่มีผลใน cache แล้วออกจากรูปที่ต้องรันโมเดล
+        คืนค่า (cached_dets, misses, keys)
+        """
+        weights = model_weights_path(model)
+        if weights is None:
+            return {}, list(paths), {}
+        weights_hash = hash_utils.cached_file_sha256(weights)
+        cached, misses, keys = {}, [], {}
+        for p in paths:
+            key = self.make_key(p, weights_hash, params)
+            keys[p] = key
+            det = self.get(key)
+            if det is None:
+                misses.append(p)
+            else:
+                cached[p] = det
+        return cached, misses, keys
+
+    def store_many(self, dets, keys):
+        for p, det in dets.items():
+            if p in keys:
+                self.put(keys[p], det)
+        self.flush()
+
+    def stats(self):
+        counters = dict(self.db.execute('SELECT name, value FROM counters').fetchall())
+        entries, size = self.db.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries').fetchone()
+        hits, misses = counters.get('hits', 0) + self.hits, counters.get('misses', 0) + self.misses
+        return {
+            'entries': entries,
+            'bytes': size,
+            'hits': hits,
+            'misses': misses,
+            'evicted': counters.get('evicted', 0) + self.evicted,
+            'hit_rate': hits / (hits + misses) if hits + misses else 0.0,
+        }
+
+    def clear(self):
+        for key, in self.db.execute('SELECT key FROM entries').fetchall():
+            try:
+                os.remove(self._obj_path(key))
+            except OSError:
+                pass
+        self.db.execute('DELETE FROM entries')
+        self.db.execute('DELETE FROM counters')
+        self.db.commit()
+
+
+def main():
+    sys.stdout.reconfigure(encoding='utf-8')
+    parser = argparse.ArgumentParser(description="Inspect or clear the on-disk inference cache")
+    parser.add_argument("action", choices=['stats', 'evict', 'clear'])
+    parser.add_argument("--root", default='inference_cache')
+    parser.add_argument("--max-gb", type=float, default=2.0)
+    args = parser.parse_args()
+
+    cache = InferenceCache(args.root, int(args.max_gb * 1024 ** 3))
+    if args.action == 'evict':
+        print(f" Evicted {cache.evict()} entries")
+        cache.db.commit()
+    elif args.action == 'clear':
+        cache.clear()
+        print(" Cache cleared")
+    s = cache.stats()
+    print(f" Entries  : {s['entries']} ({s['bytes'] / 1024 ** 2:.1f} MB)")
+    print(f" Hits     : {s['hits']}")
+    print(f" Misses   : {s['misses']}")
+    print(f" Hit rate : {s['hit_rate'] * 100:.1f}%")
+    print(f" Evicted  : {s['evicted']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,248 @@
+import sys
+import json
+import time
+import queue
+import random
+import argparse
+import threading
+import urllib.request
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+import cv2
+from ultralytics import YOLO
+
+import bf16_utils
+import inference_utils
+
+
+class _Request:
+    __slots__ = ('image', 't_enqueue', 'event', 'result', 'error')
+
+    def __init__(self, image):
+        self.image = image
+        self.t_enqueue = time.perf_counter()
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class MicroBatcher:
+    """
+    โหลดโมเดลครั้งเดียวแล้วรวม request ที่เข้ามาพร้อมกันเป็น micro-batch
+    batch จะถูกส่งเข้าโมเดลเมื่อครบ max_batch หรือเมื่อ request แรกรอครบ max_wait_ms
+    """
+
+    def __init__(self, weights, max_batch=16, max_wait_ms=10, imgsz=640, conf=0.25, iou=0.7, device=None, bf16=False):
+        self.model = YOLO(weights)
+        if bf16:
+            bf16_utils.setup(self.model, device, phase='predict')
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.predict_kwargs = dict(imgsz=imgsz, conf=conf, iou=iou, device=device, verbose=False)
+        self.queue = queue.Queue()
+        self.latencies = deque(maxlen=10000)
+        self.batch_hist = Counter()
+        self.max_queue_depth = 0
+        self.requests = 0
+        self.lock = threading.Lock()
+        self.model.predict([np.zeros((imgsz, imgsz, 3), np.uint8)], **self.predict_kwargs)  # warm-up
+        self.worker = threading.Thread(target=self._loop, daemon=True)
+        self.worker.start()
+
+    def submit(self, image, timeout=30.0):
+        req = _Request(image)
+        self.queue.put(req)
+        with self.lock:
+            self.max_queue_depth = max(self.max_queue_depth, self.queue.qsize())
+        if not req.event.wait(timeout):
+            raise TimeoutError('inference timeout')
+        if req.error is not None:
+            raise req.error
+        return req.result
+
+    def _collect(self):
+        batch = [self.queue.get()]
+        deadline = batch[0].t_enqueue + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                batch.append(self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _loop(self):
+        while True:
+            batch = self._collect()
+            try:
+                results = self.model.predict([r.image for r in batch], **self.predict_kwargs)
+                for req, res in zip(batch, results):
+                    req.result = inference_utils.result_to_detections(res)
+            except Exception as e:
+                for req in batch:
+                    req.error = e
+            now = time.perf_counter()
+            with self.lock:
+                self.batch_hist[len(batch)] += 1
+                self.requests += len(batch)
+                for req in batch:
+                    self.latencies.append(now - req.t_enqueue)
+            for req in batch:
+                req.event.set()
+
+    def metrics(self):
+        with self.lock:
+            lat = np.array(self.latencies) * 1000 if self.latencies else np.zeros(1)
+            hist = dict(sorted(self.batch_hist.items()))
+            n_batches = sum(hist.values())
+            return {
+                'requests': self.requests,
+                'latency_ms_p50': float(np.percentile(lat, 50)),
+                'latency_ms_p99': float(np.percentile(lat, 99)),
+                'batch_size_hist': {str(k): v for k, v in hist.items()},
+                'batch_size_mean': self.requests / n_batches if n_batches else 0.0,
+                'queue_depth': self.queue.qsize(),
+                'queue_depth_max': self.max_queue_depth,
+            }
+
+
+def make_handler(batcher):
+    class Handler(BaseHTTPRequestHandler):
+        def _send_json(self, code, data):
+            body = json.dumps(data).encode('utf-8')
+            self.send_response(code)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == '/metrics':
+                self._send_json(200, batcher.metrics())
+            elif self.path == '/health':
+                self._send_json(200, {'status': 'ok'})
+            else:
+                self._send_json(404, {'error': 'not found'})
+
+        def do_POST(self):
+            if self.path != '/predict':
+                self._send_json(404, {'error': 'not found'})
+                return
+            length = int(self.headers.get('Content-Length', 0))
+            data = np.frombuffer(self.rfile.read(length), np.uint8)
+            image = cv2.imdecode(data, cv2.IMREAD_COLOR)
+            if image is None:
+                self._send_json(400, {'error': 'cannot decode image'})
+                return
+            try:
+                det = batcher.submit(image)
+            except Exception as e:
+                self._send_json(500, {'error': str(e)})
+                return
+            self._send_json(200, inference_utils.detections_to_json(det))
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def serve(args):
+    print(f"--- Loading model once: {args.weights} ---")
+    batcher = MicroBatcher(args.weights, args.max_batch, args.max_wait_ms, args.imgsz, args.conf, args.iou, args.device,
+                           args.bf16)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(batcher))
+    print(f" Serving on http://{args.host}:{args.port}  (POST /predict, GET /metrics)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(json.dumps(batcher.metrics(), indent=2))
+
+
+def bench(args):
+    """
+    load generator: ยิง request พร้อมกัน args.concurrency เธรดไปที่ server บน localhost
+    """
+    paths = inference_utils.list_images(args.source)
+    if not paths:
+        print(f"Error: ไม่พบรูปใน {args.source}")
+        return
+    payloads = []
+    for p in paths[:args.max_images]:
+        with open(p, 'rb') as f:
+            payloads.append(f.read())
+    url = f"http://{args.host}:{args.port}"
+
+    def one(i):
+        body = payloads[i % len(payloads)] if not args.shuffle else random.choice(payloads)
+        req = urllib.request.Request(url + '/predict', data=body, method='POST',
+                                     headers={'Content-Type': 'application/octet-stream'})
+        t0 = time.perf_counter()
+        with urllib.request.urlopen(req, timeout=60) as resp:
+            resp.read()
+        return time.perf_counter() - t0
+
+    print(f"--- Benchmark: {args.requests} requests, concurrency {args.concurrency} -> {url} ---")
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(args.concurrency) as pool:
+        lat = np.array(list(pool.map(one, range(args.requests)))) * 1000
+    total = time.perf_counter() - t0
+
+    with urllib.request.urlopen(url + '/metrics', timeout=10) as resp:
+        server_metrics = json.loads(resp.read())
+
+    report = {
+        'requests': args.requests,
+        'concurrency': args.concurrency,
+        'throughput_rps': args.requests / total,
+        'client_latency_ms_p50': float(np.percentile(lat, 50)),
+        'client_latency_ms_p99': float(np.percentile(lat, 99)),
+        'server': server_metrics,
+    }
+    print(json.dumps(report, indent=2))
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+
+def main():
+    sys.stdout.reconfigure(encoding='utf-8')
+    parser = argparse.ArgumentParser(description="Local micro-batching inference server with a warm model")
+    sub = parser.add_subparsers(dest='cmd', required=True)
+
+    p_s = sub.add_parser('serve')
+    p_s.add_argument("--weights", required=True, help="best.pt หรือ best.onnx")
+    p_s.add_argument("--max-batch", type=int, default=16)
+    p_s.add_argument("--max-wait-ms", type=float, default=10.0)
+    p_s.add_argument("--imgsz", type=int, default=640)
+    p_s.add_argument("--conf", type=float, default=0.25)
+    p_s.add_argument("--iou", type=float, default=0.7)
+    p_s.add_argument("--device", default=None)
+    p_s.add_argument("--bf16", action='store_true', help="bf16 autocast (เฉพาะ --device cpu กับ .pt)")
+
+    p_b = sub.add_parser('bench')
+    p_b.add_argument("--source", required=True, help="โฟลเดอร์รูปที่ใช้ยิง")
+    p_b.add_argument("--requests", type=int, default=500)
+    p_b.add_argument("--concurrency", type=int, default=16)
+    p_b.add_argument("--max-images", type=int, default=64)
+    p_b.add_argument("--shuffle", action='store_true')
+    p_b.add_argument("--out", default=None, help="บันทึกผลเป็น JSON")
+
+    for p in (p_s, p_b):
+        p.add_argument("--host", default='127.0.0.1')
+        p.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    if args.cmd == 'serve':
+        serve(args)
+    else:
+        bench(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,180 @@
+import os
+import json
+import numpy as np
+
+IMG_EXTS = ('.jpg', '.png', '.jpeg')
+
+
+def list_images(folder):
+    return sorted(e.path for e in os.scandir(folder)
+                  if e.is_file() and e.name.lower().endswith(IMG_EXTS))
+
+
+def empty_detections(width=0, height=0):
+    return {
+        'boxes': np.zeros((0, 4), np.float32),
+        'scores': np.zeros(0, np.float32),
+        'classes': np.zeros(0, np.int64),
+        'width': int(width),
+        'height': int(height),
+    }
+
+
+def result_to_detections(result, offset=(0, 0)):
+    # แปลง ultralytics Results -> dict ของ numpy (เลื่อนพิกัดตาม offset ของ tile)
+    b = result.boxes
+    boxes = b.xyxy.cpu().numpy().astype(np.float32)
+    if offset[0] or offset[1]:
+        boxes[:, [0, 2]] += offset[0]
+        boxes[:, [1, 3]] += offset[1]
+    h, w = result.orig_shape[:2]
+    return {
+        'boxes': boxes,
+        'scores': b.conf.cpu().numpy().astype(np.float32),
+        'classes': b.cls.cpu().numpy().astype(np.int64),
+        'width': int(w),
+        'height': int(h),
+    }
+
+
+def concat_detections(dets, width, height):
+    if not dets:
+        return empty_detections(width, height)
+    return {
+        'boxes': np.concatenate([d['boxes'] for d in dets]),
+        'scores': np.concatenate([d['scores'] for d in dets]),
+        'classes': np.concatenate([d['classes'] for d in dets]),
+        'width': int(width),
+        'height': int(height),
+    }
+
+
+def pairwise_overlap(boxes, metric='iou'):
+    # iou = intersection / union, ios = intersection / พื้นที่กล่องที่เล็กกว่า (เหมาะกับกล่องที่โดนตัดที่ขอบ tile)
+    lt = np.maximum(boxes[:, None, :2], boxes[None, :, :2])
+    rb = np.minimum(boxes[:, None, 2:], boxes[None, :, 2:])
+    inter = np.clip(rb - lt, 0, None).prod(axis=2)
+    area = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    if metric == 'ios':
+        denom = np.minimum(area[:, None], area[None, :])
+    else:
+        denom = area[:, None] + area[None, :] - inter
+    return inter / (denom + 1e-9)
+
+
+def _sorted_overlap(det, metric):
+    order = np.argsort(-det['scores'])
+    boxes, classes = det['boxes'][order], det['classes'][order]
+    ov = pairwise_overlap(boxes, metric)
+    ov *= classes[:, None] == classes[None, :]
+    return order, ov
+
+
+def nms_merge(det, thr=0.5, metric='ios'):
+    """
+    Fast-NMS แบบ vectorized: กล่องถูกเก็บไว้ถ้าไม่ทับกับกล่องคลาสเดียวกันที่ score สูงกว่าเกิน thr
+    """
+    n = len(det['scores'])
+    if n < 2:
+        return det
+    order, ov = _sorted_overlap(det, metric)
+    keep = order[np.triu(ov, 1).max(axis=0) < thr]
+    keep.sort()
+    return {**det, 'boxes': det['boxes'][keep], 'scores': det['scores'][keep], 'classes': det['classes'][keep]}
+
+
+def wbf_merge(det, thr=0.5, metric='ios'):
+    """
+    Weighted Box Fusion แบบ vectorized: หัวกลุ่มคือกล่องที่รอดจาก Fast-NMS
+    กล่องอื่นถูกรวมเข้ากับหัวกลุ่มที่ทับมากที่สุด แล้วเฉลี่ยพิกัดถ่วงน้ำหนักด้วย score
+    """
+    n = len(det['scores'])
+    if n < 2:
+        return det
+    order, ov = _sorted_overlap(det, metric)
+    boxes, scores, classes = det['boxes'][order], det['scores'][order], det['classes'][order]
+    is_head = np.triu(ov, 1).max(axis=0) < thr
+    heads = np.flatnonzero(is_head)
+
+    # กล่องที่ไม่ทับหัวกลุ่มใดเกิน thr (หัวกลุ่มของมันโดน suppress ไปแล้ว) ถูกตัดทิ้งแบบเดียวกับ Fast-NMS
+    head_ov = ov[heads]
+    cluster = np.argmax(head_ov, axis=0)
+    cluster[heads] = np.arange(len(heads))
+    valid = is_head | (head_ov.max(axis=0) >= thr)
+    boxes, scores, cluster = boxes[valid], scores[valid], cluster[valid]
+
+    w_sum = np.zeros(len(heads), np.float64)
+    b_sum = np.zeros((len(heads), 4), np.float64)
+    np.add.at(w_sum, cluster, scores)
+    np.add.at(b_sum, cluster, boxes * scores[:, None])
+    s_max = np.zeros(len(heads), np.float32)
+    np.maximum.at(s_max, cluster, scores)
+
+    return {
+        **det,
+        'boxes': (b_sum / w_sum[:, None]).astype(np.float32),
+        'scores': s_max,
+        'classes': classes[heads],
+    }
+
+
+MERGE_FUNCS = {'nms': nms_merge, 'wbf': wbf_merge}
+
+
+def predict_images(model, paths, imgsz=640, conf=0.25, iou=0.7, batch=16, device=None, cache=None):
+    """
+    รัน inference ปกติ (letterbox ทั้งภาพ) ทีละ batch คืนค่า {path: detections}
+    cache: InferenceCache (ถ้ามี) รูปที่เคยรันด้วย weights/ค่าเดียวกันจะไม่ถูกรันซ้ำ
+    """
+    out, keys = {}, {}
+    if cache is not None:
+        out, paths, keys = cache.lookup_many(model, paths, {'mode': 'full', 'imgsz': imgsz, 'conf': conf, 'iou': iou})
+    new = {}
+    for i in range(0, len(paths), batch):
+        chunk = paths[i:i + batch]
+        results = model.predict(chunk, imgsz=imgsz, conf=conf, iou=iou, device=device, verbose=False)
+        # จับคู่ด้วย r.path ไม่ใช่ลำดับ: ultralytics รุ่นใหม่ข้ามรูปที่อ่านไม่ได้ ผลจึงอาจน้อยกว่า chunk
+        # (รูปที่ไม่มีผลจะไม่อยู่ใน dict ที่คืนค่า)
+        by_path = {os.path.abspath(p): p for p in chunk}
+        for r in results:
+            p = by_path.get(os.path.abspath(r.path))
+            if p is not None:
+                new[p] = result_to_detections(r)
+    if cache is not None:
+        cache.store_many(new, keys)
+    out.update(new)
+    return out
+
+
+def detections_to_json(det):
+    return {
+        'width': det['width'],
+        'height': det['height'],
+        'boxes': np.round(det['boxes'], 2).tolist(),
+        'scores': np.round(det['scores'], 4).tolist(),
+        'classes': det['classes'].tolist(),
+    }
+
+
+def detections_from_json(d):
+    return {
+        'boxes': np.array(d['boxes'], np.float32).reshape(-1, 4),
+        'scores': np.array(d['scores'], np.float32),
+        'classes': np.array(d['classes'], np.int64),
+        'width': int(d['width']),
+        'height': int(d['height']),
+    }
+
+
+def save_detections(dets_by_path, out_path):
+    data = {os.path.basename(p): detections_to_json(d) for p, d in dets_by_path.items()}
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+    with open(out_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+    return out_path
+
+
+def load_detections(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    return {name: detections_from_json(d) for name, d in data.items()}
@@ -0,0 +1,117 @@
+import os
+import hashlib
+from datetime import datetime
+
+import file_ops
+
+IMG_EXTS = ('.jpg', '.png', '.jpeg')
+SPLITS = ('train', 'val', 'test')
+SPLIT_RATIOS = (0.70, 0.15, 0.15)
+JOURNAL_NAME = 'split_journal.tsv'
+OPS_LOG = os.path.join('.file_ops', 'ingest.log')
+
+
+def assign_split(name, ratios=SPLIT_RATIOS):
+    # แบ่งตาม hash ของชื่อไฟล์ (ไม่รวมนามสกุล): ไฟล์เดิมได้ split เดิมเสมอ และสัดส่วนรวมเป็น 70/15/15
+    stem = os.path.splitext(name)[0]
+    x = int(hashlib.sha1(stem.encode('utf-8')).hexdigest()[:8], 16) / 0x100000000
+    if x < ratios[0]:
+        return 'train'
+    if x < ratios[0] + ratios[1]:
+        return 'val'
+    return 'test'
+
+
+def journal_path(base_path):
+    return os.path.join(base_path, JOURNAL_NAME)
+
+
+def load_journal(base_path):
+    """
+    คืนค่า {ชื่อรูป: (split, batch)} ถ้ายังไม่มี journal จะสร้างจาก split ที่มีอยู่แล้วในโฟลเดอร์ (ครั้งเดียว)
+    """
+    path = journal_path(base_path)
+    if not os.path.exists(path):
+        seed_journal(base_path)
+    journal = {}
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            parts = line.rstrip('\n').split('\t')
+            if len(parts) >= 3:
+                journal[parts[0]] = (parts[1], parts[2])
+    return journal
+
+
+def seed_journal(base_path):
+    rows = []
+    for split in SPLITS:
+        d = os.path.join(base_path, 'images', split)
+        if not os.path.isdir(d):
+            continue
+        for e in os.scandir(d):
+            if e.is_file() and e.name.lower().endswith(IMG_EXTS):
+                rows.append(f'{e.name}\t{split}\tseed\n')
+    os.makedirs(base_path, exist_ok=True)
+    with open(journal_path(base_path), 'w', encoding='utf-8') as f:
+        f.writelines(sorted(rows))
+    if rows:
+        print(f" สร้าง journal จาก split เดิม: {len(rows)} รูป")
+
+
+def scan_new_images(src_img, journal):
+    # scandir ครั้งเดียว แล้ว diff กับ journal (ไม่ stat ทีละไฟล์)
+    if not os.path.isdir(src_img):
+        return []
+    return sorted(e.name for e in os.scandir(src_img)
+                  if e.name not in journal and e.name.lower().endswith(IMG_EXTS) and e.is_file())
+
+
+def ingest_new_images(base_path, src_img, src_lbl, move_files=False, batch_id=None, workers=8):
+    """
+    เพิ่มรูปใหม่ (ที่ยังไม่อยู่ใน journal) เข้า images/{train,val,test} ของ base_path
+    ค่าใช้จ่ายขึ้นกับจำนวนไฟล์ใหม่ ไม่ใช่ขนาดของ dataset ทั้งหมด (copy/move ผ่าน file_ops แบบขนาน)
+    คืนค่า dict จำนวนรูปที่เพิ่มในแต่ละ split
+    """
+    journal = load_journal(base_path)
+    new_images = scan_new_images(src_img, journal)
+    counts = {s: 0 for s in SPLITS}
+    ops_log = os.path.join(base_path, OPS_LOG)
+    if not new_images:
+        if os.path.exists(ops_log):
+            file_ops.run_ops([], workers=workers, log_path=ops_log)
+        return counts
+
+    batch_id = batch_id or datetime.now().strftime('%Y%m%d_%H%M%S')
+    labels = set(os.listdir(src_lbl)) if os.path.isdir(src_lbl) else set()
+
+    action = 'move' if move_files else 'copy'
+    ops = []
+    with open(journal_path(base_path), 'a', encoding='utf-8') as jf:
+        for name in new_images:
+            split = assign_split(name)
+            ops.append((action, os.path.join(src_img, name), os.path.join(base_path, 'images', split, name)))
+            txt = os.path.splitext(name)[0] + '.txt'
+            if txt in labels:
+                ops.append((action, os.path.join(src_lbl, txt), os.path.join(base_path, 'labels', split, txt)))
+            # บันทึก journal ก่อนย้ายไฟล์ ถ้าถูก interrupt งานที่ค้างจะถูกทำต่อจาก op log ในรอบถัดไป
+            jf.write(f'{name}\t{split}\t{batch_id}\n')
+            counts[split] += 1
+
+    file_ops.run_ops(ops, workers=workers, log_path=ops_log)
+    return counts
+
+
+
+def latest_batches(base_path, n=1):
+    # batch ล่าสุด n ชุด (ไม่นับ 'seed' ที่สร้างจาก split เดิม)
+    batches = sorted({b for _, b in load_journal(base_path).values() if b != 'seed'})
+    return batches[-n:]
+
+
+def batch_images(base_path, batch_ids, split=None):
+    journal = load_journal(base_path)
+    return sorted(name for name, (s, b) in journal.items() if b in batch_ids and (split is None or s == split))
+
+
+def split_images(base_path, split):
+    return sorted(name for name, (s, _) in load_journal(base_path).items() if s == split)
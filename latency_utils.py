@@ -0,0 +1,75 @@
+import os
+import time
+import shutil
+import numpy as np
+import torch
+from ultralytics import YOLO
+
+
+def _summary(times_ms):
+    t = np.asarray(times_ms)
+    return {'mean_ms': float(t.mean()), 'p50_ms': float(np.percentile(t, 50)),
+            'p95_ms': float(np.percentile(t, 95)), 'runs': len(t)}
+
+
+def export_onnx(weights, imgsz=640, dynamic=False):
+    # export ครั้งเดียว ถ้ามีไฟล์ .onnx ที่ใหม่กว่า .pt อยู่แล้วจะใช้ไฟล์เดิม
+    # dynamic=True (batch ไม่คงที่) export จากสำเนา <ชื่อ>_dynamic.pt เพื่อไม่ให้ทับไฟล์ .onnx แบบ static
+    if weights.endswith('.onnx'):
+        return weights
+    stem = os.path.splitext(weights)[0] + ('_dynamic' if dynamic else '')
+    onnx_path = stem + '.onnx'
+    if not os.path.exists(onnx_path) or os.path.getmtime(onnx_path) < os.path.getmtime(weights):
+        src = weights
+        if dynamic:
+            src = stem + '.pt'
+            shutil.copy2(weights, src)
+        try:
+            onnx_path = str(YOLO(src).export(format='onnx', imgsz=imgsz, dynamic=dynamic))
+        finally:
+            if src != weights:
+                os.remove(src)
+    return onnx_path
+
+
+def cpu_latency_ms(weights, imgsz=640, runs=30, warmup=5, backend='onnx', threads=None):
+    """
+    วัด latency ของโมเดล 1 รูป (batch=1) บน CPU คืนค่า {mean_ms, p50_ms, p95_ms, runs, backend}
+    backend='onnx' ใช้ onnxruntime (เส้นทางเดียวกับตอน deploy) ถ้าไม่ได้ติดตั้งจะใช้ torch แทน
+    """
+    x = np.random.rand(1, 3, imgsz, imgsz).astype(np.float32)
+    if backend == 'onnx':
+        try:
+            import onnxruntime as ort
+        except ImportError:
+            print(" ไม่พบ onnxruntime ใช้ torch วัด latency แทน")
+            backend = 'torch'
+    times = []
+    if backend == 'onnx':
+        opts = ort.SessionOptions()
+        if threads:
+            opts.intra_op_num_threads = threads
+        sess = ort.InferenceSession(export_onnx(weights, imgsz), opts, providers=['CPUExecutionProvider'])
+        name = sess.get_inputs()[0].name
+        for i in range(warmup + runs):
+            t0 = time.perf_counter()
+            sess.run(None, {name: x})
+            if i >= warmup:
+                times.append((time.perf_counter() - t0) * 1000)
+    else:
+        if threads:
+            torch.set_num_threads(threads)
+        model = YOLO(weights).model.float().eval().cpu()
+        xt = torch.from_numpy(x)
+        with torch.inference_mode():
+            for i in range(warmup + runs):
+                t0 = time.perf_counter()
+                model(xt)
+                if i >= warmup:
+                    times.append((time.perf_counter() - t0) * 1000)
+    return dict(_summary(times), backend=backend)
+
+
+def count_params(weights):
+    model = YOLO(weights).model
+    return sum(p.numel() for p in model.parameters())
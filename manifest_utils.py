@@ -0,0 +1,30 @@
+import os
+import yaml
+
+
+def write_image_list(paths, out_path):
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+    with open(out_path, 'w', encoding='utf-8') as f:
+        for p in paths:
+            f.write(os.path.abspath(p) + '\n')
+    return out_path
+
+
+def write_data_yaml(base_yaml, out_yaml, **splits):
+    """
+    คัดลอก data.yaml เดิม (names / nc) แล้วเปลี่ยน train/val/test เป็นไฟล์รายชื่อรูป (.txt) ที่กำหนด
+    path จะถูกแปลงเป็น absolute เพื่อให้ split ที่ไม่ได้เปลี่ยนยังชี้ไปที่เดิม
+    """
+    with open(base_yaml, 'r', encoding='utf-8') as f:
+        data = yaml.safe_load(f)
+    root = data.get('path') or '.'
+    if not os.path.isabs(root):
+        root = os.path.join(os.path.dirname(os.path.abspath(base_yaml)), root)
+    data['path'] = os.path.normpath(root)
+    for split, value in splits.items():
+        if value is not None:
+            data[split] = os.path.abspath(value)
+    os.makedirs(os.path.dirname(os.path.abspath(out_yaml)), exist_ok=True)
+    with open(out_yaml, 'w', encoding='utf-8') as f:
+        yaml.safe_dump(data, f, allow_unicode=True, sort_keys=False)
+    return out_yaml
@@ -0,0 +1,196 @@
+from __future__ import annotations
+
+import os
+import sys
+import json
+import argparse
+from collections import defaultdict
+from fnmatch import fnmatch
+from typing import Dict, List, Set, Tuple
+
+import file_ops
+
+IMG_EXTS = ('.jpg', '.jpeg', '.png')
+
+Key = Tuple[str, str]  # (โฟลเดอร์ย่อยแบบ relative เช่น 'train', ชื่อไฟล์ไม่รวมนามสกุล)
+
+
+def scan_tree(root: str) -> Dict[Key, List[str]]:
+    """
+    scandir ทั้ง tree ครั้งเดียว คืนค่า {(subdir, stem): [ชื่อไฟล์...]}
+    """
+    index: Dict[Key, List[str]] = defaultdict(list)
+    if not os.path.isdir(root):
+        return index
+    stack = ['']
+    while stack:
+        rel = stack.pop()
+        for e in os.scandir(os.path.join(root, rel)):
+            if e.is_dir(follow_symlinks=False):
+                stack.append(os.path.join(rel, e.name))
+            elif e.is_file(follow_symlinks=False):
+                stem, _ = os.path.splitext(e.name)
+                index[(rel, stem)].append(e.name)
+    return index
+
+
+def build_pairing(images_root: str, labels_root: str) -> dict:
+    """
+    จับคู่รูปกับ label ด้วย hash join บน (subdir, stem)
+    """
+    images = {k: v for k, v in scan_tree(images_root).items()
+              if any(n.lower().endswith(IMG_EXTS) for n in v)}
+    labels_all = scan_tree(labels_root)
+    labels = {k: v for k, v in labels_all.items() if any(n.endswith('.txt') for n in v)}
+
+    img_keys, lbl_keys = set(images), set(labels)
+    collisions = {k: sorted(n for n in v if n.lower().endswith(IMG_EXTS))
+                  for k, v in images.items() if sum(n.lower().endswith(IMG_EXTS) for n in v) > 1}
+    return {
+        'images_root': images_root,
+        'labels_root': labels_root,
+        'images': images,
+        'labels': labels,
+        'paired': sorted(img_keys & lbl_keys),
+        'images_without_labels': sorted(img_keys - lbl_keys),
+        'labels_without_images': sorted(lbl_keys - img_keys),
+        'stem_collisions': collisions,
+    }
+
+
+def print_summary(p: dict, limit: int = 10) -> None:
+    print(f"📂 Images : {p['images_root']} ({len(p['images'])} stems)")
+    print(f"📂 Labels : {p['labels_root']} ({len(p['labels'])} stems)")
+    print(f"   ✅ จับคู่ได้          : {len(p['paired'])}")
+    print(f"   ⚠️  รูปไม่มี label     : {len(p['images_without_labels'])}")
+    print(f"   ⚠️  label ไม่มีรูป     : {len(p['labels_without_images'])}")
+    print(f"   ⚠️  stem ซ้ำต่างนามสกุล: {len(p['stem_collisions'])}")
+    sections = [
+        ('รูปไม่มี label', [os.path.join(k[0], n) for k in p['images_without_labels'] for n in p['images'][k]]),
+        ('label ไม่มีรูป', [os.path.join(k[0], k[1] + '.txt') for k in p['labels_without_images']]),
+        ('stem ซ้ำ', [f"{os.path.join(k[0], k[1])}: {', '.join(v)}" for k, v in p['stem_collisions'].items()]),
+    ]
+    for title, items in sections:
+        if not items:
+            continue
+        print(f"\n -- {title} (แสดง {min(limit, len(items))}/{len(items)}) --")
+        for item in items[:limit]:
+            print(f"    - {item}")
+
+
+def select_empty_labels(p: dict, spec: str) -> Set[Key]:
+    """
+    เลือกรูปที่ไม่มี label ที่ตั้งใจให้เป็นรูป background (label ว่าง ไม่มี object)
+    spec = ไฟล์รายชื่อ (บรรทัดละชื่อไฟล์ / path relative กับ images root / glob) หรือ glob ตัวเดียว เช่น 'train/*_bg_*.jpg'
+    ถาดที่ไม่มีต้นต้องติด label class 5 (Empty) ไม่ใช่ label ว่าง จึงห้ามสร้าง label ว่างให้ทุกรูปแบบเหมารวม
+    """
+    if os.path.isfile(spec):
+        with open(spec, 'r', encoding='utf-8') as f:
+            patterns = [line.strip() for line in f if line.strip() and not line.startswith('#')]
+    else:
+        patterns = [spec]
+    patterns = [pat.replace('\\', '/') for pat in patterns]
+    root = p['images_root'].replace('\\', '/').rstrip('/')
+    selected = set()
+    for key in p['images_without_labels']:
+        rel = key[0].replace('\\', '/')
+        for n in p['images'][key]:
+            rel_path = f'{rel}/{n}' if rel else n
+            if any(fnmatch(c, pat) for pat in patterns for c in (n, rel_path, f'{root}/{rel_path}')):
+                selected.add(key)
+                break
+    return selected
+
+
+def plan_repairs(p: dict, empty_labels: Set[Key], quarantine: str | None) -> List[Tuple[str, str, str]]:
+    """
+    คืนค่า list ของ (action, src, dst)
+    - empty_labels: key ของรูปที่จะสร้าง label ว่าง (ไม่มี object) ให้ จาก select_empty_labels
+    - quarantine: ย้าย label ที่ไม่มีรูป, รูปที่ stem ซ้ำ (เก็บ .jpg ไว้ตัวเดียว)
+      และรูปที่ไม่มี label ที่ไม่ได้ถูกเลือกให้สร้าง label ว่าง ไปไว้ในโฟลเดอร์แยก
+    """
+    ops = []
+    for rel, stem in p['images_without_labels']:
+        if (rel, stem) in empty_labels:
+            ops.append(('touch', '', os.path.join(p['labels_root'], rel, stem + '.txt')))
+    if quarantine:
+        for rel, stem in p['labels_without_images']:
+            name = stem + '.txt'
+            ops.append(('move', os.path.join(p['labels_root'], rel, name),
+                        os.path.join(quarantine, 'labels', rel, name)))
+        for (rel, stem), names in p['stem_collisions'].items():
+            keep = sorted(names, key=lambda n: (not n.lower().endswith('.jpg'), n))[0]
+            for n in names:
+                if n != keep:
+                    ops.append(('move', os.path.join(p['images_root'], rel, n),
+                                os.path.join(quarantine, 'images', rel, n)))
+        for key in p['images_without_labels']:
+            if key in empty_labels:
+                continue
+            rel = key[0]
+            for n in p['images'][key]:
+                ops.append(('move', os.path.join(p['images_root'], rel, n),
+                            os.path.join(quarantine, 'images', rel, n)))
+    return ops
+
+
+def apply_repairs(ops: List[Tuple[str, str, str]], dry_run: bool = True, workers: int = 8) -> int:
+    if dry_run:
+        for action, src, dst in ops:
+            print(f"  [{action}] {src} -> {dst}" if src else f"  [{action}] {dst}")
+        return 0
+    stats = file_ops.run_ops(ops, workers=workers)
+    return stats['done'] + stats['skipped']
+
+
+def main() -> None:
+    sys.stdout.reconfigure(encoding='utf-8')
+    parser = argparse.ArgumentParser(description="Image/label pairing check with orphan detection and repair")
+    parser.add_argument("--dataset", default=r'D:\model_cuu\dataset', help="โฟลเดอร์ที่มี images/ และ labels/")
+    parser.add_argument("--images", default=None, help="ระบุโฟลเดอร์ images เอง (แทน --dataset)")
+    parser.add_argument("--labels", default=None, help="ระบุโฟลเดอร์ labels เอง (แทน --dataset)")
+    parser.add_argument("--empty-labels-for", default=None, metavar='FILE|GLOB',
+                        help="สร้าง label ว่าง (รูป background) เฉพาะรูปที่ไม่มี label ที่ตรงกับรายชื่อในไฟล์หรือ glob นี้ "
+                             "(ถาดไม่มีต้นใช้ class 5 Empty ไม่ใช่ label ว่าง)")
+    parser.add_argument("--quarantine", default=None, help="ย้ายไฟล์ orphan ไปโฟลเดอร์นี้")
+    parser.add_argument("--report", default=None, help="บันทึกผลเป็น JSON")
+    parser.add_argument("--workers", type=int, default=8, help="จำนวน thread สำหรับ copy/move")
+    parser.add_argument("--yes", action='store_true', help="ยืนยันทำจริง (ถ้าไม่ใส่จะเป็นแค่ Preview)")
+    args = parser.parse_args()
+
+    images_root = args.images or os.path.join(args.dataset, 'images')
+    labels_root = args.labels or os.path.join(args.dataset, 'labels')
+    if not os.path.isdir(images_root):
+        print(f"Error: ไม่พบโฟลเดอร์: {images_root}")
+        return
+
+    pairing = build_pairing(images_root, labels_root)
+    print("=" * 60)
+    print_summary(pairing)
+    print("=" * 60)
+
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump({k: pairing[k] for k in ('images_without_labels', 'labels_without_images', 'paired')}
+                      | {'stem_collisions': [[list(k), v] for k, v in pairing['stem_collisions'].items()]},
+                      f, ensure_ascii=False, indent=2)
+        print(f" Report saved: {args.report}")
+
+    empty = select_empty_labels(pairing, args.empty_labels_for) if args.empty_labels_for else set()
+    if args.empty_labels_for:
+        print(f" สร้าง label ว่าง {len(empty)} รูป (ตรงกับ {args.empty_labels_for}), "
+              f"ยังไม่มี label อีก {len(pairing['images_without_labels']) - len(empty)} รูป")
+    ops = plan_repairs(pairing, empty, args.quarantine)
+    if not ops:
+        return
+    is_dry_run = not args.yes
+    if is_dry_run:
+        print("\n!!! นี่คือโหมดทดสอบ (Dry Run) - ยังไม่มีการแก้ไขไฟล์จริง !!!")
+        print("ให้เติม --yes ต่อท้ายคำสั่งเพื่อรันจริง\n")
+    done = apply_repairs(ops, dry_run=is_dry_run, workers=args.workers)
+    if not is_dry_run:
+        print(f"\n✓ ดำเนินการสำเร็จ {done}/{len(ops)} รายการ")
+
+
+if __name__ == '__main__':
+    main()
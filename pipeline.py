@@ -0,0 +1,179 @@
+import os
+import sys
+import json
+import argparse
+import importlib
+from datetime import datetime
+from ultralytics import YOLO
+
+import hash_utils
+import report_utils
+
+# สคริปต์เทรนที่ใช้เป็น recipe ได้ (ใช้ dataset_root / train_args / base_weights / auto_split_data ของสคริปต์นั้น)
+RECIPES = {
+    'method_3': 'train_main_method_3',
+    'method_1_3': 'train_main_method_1_3',
+    'bestmodel_1_3': 'Traning_model_1_3_bestmodel',
+}
+STAGES = ['split', 'train', 'report', 'export']
+
+
+def load_recipe(name):
+    mod = importlib.import_module(RECIPES[name])
+    return {
+        'name': name,
+        'module': mod,
+        'dataset_root': mod.dataset_root,
+        'extras': list(getattr(mod, 'additional_datasets', [])),
+        'base_weights': mod.base_weights,
+        'train_args': dict(mod.train_args),
+        'yaml_path': os.path.join(mod.dataset_root, 'data.yaml'),
+    }
+
+
+def _file_sha(path):
+    return hash_utils.cached_file_sha256(path) if path and os.path.exists(path) else None
+
+
+def _load_record(state_dir, stage):
+    path = os.path.join(state_dir, f'{stage}.json')
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _save_record(state_dir, stage, fingerprint, outputs):
+    os.makedirs(state_dir, exist_ok=True)
+    path = os.path.join(state_dir, f'{stage}.json')
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump({'fingerprint': fingerprint, 'outputs': outputs,
+                   'time': datetime.now().strftime('%Y-%m-%d %H:%M:%S')}, f, indent=2)
+    os.replace(path + '.tmp', path)
+
+
+# ---------------------------------------------------------------
+# fingerprint ของแต่ละ stage (ขึ้นกับ input และ output ของ stage ก่อนหน้า)
+# ---------------------------------------------------------------
+def fp_split(recipe, outputs):
+    manifests = [hash_utils.tree_manifest_sha256(recipe['dataset_root'])]
+    manifests += [hash_utils.tree_manifest_sha256(p) for p in recipe['extras'] if os.path.exists(p)]
+    return hash_utils.dict_sha256(manifests)
+
+
+def fp_train(recipe, outputs):
+    return hash_utils.dict_sha256({
+        'dataset': outputs['split']['manifest'],
+        'yaml': _file_sha(recipe['yaml_path']),
+        'train_args': recipe['train_args'],
+        'weights': _file_sha(recipe['base_weights']) or recipe['base_weights'],
+    })
+
+
+def fp_report(recipe, outputs):
+    train = outputs['train']
+    return hash_utils.dict_sha256({
+        'best': train['best_sha'],
+        'results_csv': _file_sha(os.path.join(train['save_dir'], 'results.csv')),
+        'epochs': recipe['train_args'].get('epochs'),
+    })
+
+
+def fp_export(recipe, outputs):
+    return hash_utils.dict_sha256({'best': outputs['train']['best_sha'], 'format': 'onnx'})
+
+
+# ---------------------------------------------------------------
+# ตัวรันของแต่ละ stage คืนค่า outputs (dict)
+# ---------------------------------------------------------------
+def run_split(recipe, outputs):
+    mod = recipe['module']
+    if recipe['extras']:
+        mod.auto_split_data(recipe['dataset_root'], recipe['extras'])
+    else:
+        mod.auto_split_data(recipe['dataset_root'])
+    return {'manifest': fp_split(recipe, outputs)}
+
+
+def run_train(recipe, outputs):
+    model = YOLO(recipe['base_weights'])
+    results = model.train(data=recipe['yaml_path'], **recipe['train_args'])
+    save_dir = str(results.save_dir)
+    best_pt = os.path.join(save_dir, 'weights', 'best.pt')
+    return {'save_dir': save_dir, 'best_pt': best_pt, 'best_sha': _file_sha(best_pt)}
+
+
+def run_report(recipe, outputs):
+    train = outputs['train']
+    log_dir = report_utils.create_log_directory()
+    summary = report_utils.save_results(train['save_dir'], log_dir, train['best_pt'])
+    report_utils.generate_text_report(log_dir, {'Epochs': recipe['train_args'].get('epochs'),
+                                                'Device': recipe['train_args'].get('device')}, summary)
+    return {'log_dir': log_dir}
+
+
+def run_export(recipe, outputs):
+    onnx_path = YOLO(outputs['train']['best_pt']).export(format='onnx')
+    return {'onnx': str(onnx_path), 'onnx_sha': _file_sha(str(onnx_path))}
+
+
+def outputs_valid(stage, out):
+    if out is None:
+        return False
+    if stage == 'train':
+        return _file_sha(out.get('best_pt')) == out.get('best_sha')
+    if stage == 'report':
+        return os.path.exists(os.path.join(out.get('log_dir', ''), 'TRAINING_REPORT.txt'))
+    if stage == 'export':
+        return _file_sha(out.get('onnx')) == out.get('onnx_sha')
+    return True
+
+
+FINGERPRINTS = {'split': fp_split, 'train': fp_train, 'report': fp_report, 'export': fp_export}
+RUNNERS = {'split': run_split, 'train': run_train, 'report': run_report, 'export': run_export}
+
+
+def run_pipeline(recipe_name, force=(), until='export', state_root='.pipeline'):
+    """
+    รัน split -> train -> report -> export โดยข้าม stage ที่ fingerprint ของ input ไม่เปลี่ยน
+    """
+    recipe = load_recipe(recipe_name)
+    state_dir = os.path.join(state_root, recipe_name)
+    outputs = {}
+    for stage in STAGES[:STAGES.index(until) + 1]:
+        fp = FINGERPRINTS[stage](recipe, outputs)
+        record = _load_record(state_dir, stage)
+        if (stage not in force and record is not None and record['fingerprint'] == fp
+                and outputs_valid(stage, record['outputs'])):
+            print(f" ✓ {stage:<7} up to date ({record['time']})")
+            outputs[stage] = record['outputs']
+            continue
+
+        print(f" ▶ {stage:<7} running...")
+        outputs[stage] = RUNNERS[stage](recipe, outputs)
+        # split ย้ายไฟล์ใน dataset เอง จึงต้องคำนวณ fingerprint ใหม่หลังรัน
+        fp_after = FINGERPRINTS[stage](recipe, outputs)
+        _save_record(state_dir, stage, fp_after, outputs[stage])
+    return outputs
+
+
+def main():
+    sys.stdout.reconfigure(encoding='utf-8')
+    parser = argparse.ArgumentParser(description="Cached split -> train -> report -> export pipeline")
+    parser.add_argument("--recipe", choices=sorted(RECIPES), default='method_1_3')
+    parser.add_argument("--force", nargs='*', default=[], choices=STAGES, help="บังคับรัน stage เหล่านี้ใหม่")
+    parser.add_argument("--until", choices=STAGES, default='export', help="หยุดหลัง stage นี้")
+    parser.add_argument("--state-dir", default='.pipeline')
+    args = parser.parse_args()
+
+    recipe_root = load_recipe(args.recipe)['dataset_root']
+    if not os.path.exists(recipe_root):
+        print(f"Error: ไม่พบโฟลเดอร์ {recipe_root}")
+        return
+    outputs = run_pipeline(args.recipe, set(args.force), args.until, args.state_dir)
+    print("\n--- Pipeline outputs ---")
+    print(json.dumps(outputs, indent=2))
+
+
+if __name__ == '__main__':
+    main()
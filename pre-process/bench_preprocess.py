@@ -0,0 +1,190 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import List, Optional
+
+import make_synthetic_dataset
+
+# ตั้งค่า encoding เพื่อให้แสดงผลภาษาไทยได้
+sys.stdout.reconfigure(encoding='utf-8')
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+
+# เครื่องมือที่วัด: (ชื่อ, คำสั่ง, โฟลเดอร์เป้าหมาย, args โหมด dry, args โหมด apply)
+# {dir} = images/ หรือ labels/ ของ dataset, {root} = รากของ dataset
+# check.py / changeclass.py ไม่มี CLI จึงเรียกฟังก์ชันผ่าน runpy
+TOOLS = [
+    ('delename_time', ['delename_time.py', '--dir', '{dir}'], 'labels', ['--dry-run'], ['--yes']),
+    ('delete', ['delete.py', '--dir', '{dir}'], 'labels', [], ['--yes']),
+    ('delete_image', ['delete_image.py', '--dir', '{dir}'], 'images', ['--dry-run'], ['--yes']),
+    ('delete_imagejpg', ['delete_imagejpg.py', '--dir', '{dir}'], 'images', ['--dry-run'], ['--yes']),
+    ('delete_imagetxt', ['delete_imagetxt.py', '--dir', '{dir}'], 'labels', ['--dry-run'], ['--yes']),
+    ('delete_name', ['delete_name.py', '--dir', '{dir}'], 'images', ['--dry-run'], ['--yes']),
+    ('check', ['-c', "import runpy; runpy.run_path('check.py', run_name='bench')['check_multiple_folders']([r'{dir}'])"],
+     'labels', None, None),
+    ('changeclass', ['-c', "import runpy; runpy.run_path('changeclass.py', run_name='bench')['remap_yolo_labels']"
+                           "(r'{dir}', {{0: 0, 1: 3, 2: 4, 3: 5}})"], 'labels', None, None),
+    ('check_geometry', ['check_geometry.py', '{dir}', '--out', '{tmp}'], 'labels', None, None),
+    ('pairing_index', [os.path.join(ROOT, 'pairing_index.py'), '--dataset', '{root}'], 'root', None, None),
+]
+# เครื่องมือที่แก้ไขไฟล์เสมอ (ไม่มีโหมด dry) ต้องรันบนสำเนา
+ALWAYS_MUTATES = {'changeclass'}
+
+
+def count_files(path: str) -> int:
+    return sum(1 for e in os.scandir(path) if e.is_file())
+
+
+def parse_strace_summary(path: str) -> Optional[dict]:
+    """
+    อ่านผลของ strace -c: คืนค่า {'total': จำนวน syscall, 'top': {syscall: calls}}
+    """
+    if not os.path.exists(path):
+        return None
+    calls = {}
+    with open(path, 'r', errors='replace') as f:
+        for line in f:
+            toks = line.split()
+            if len(toks) < 5 or toks[-1] == 'total' or not toks[0].replace('.', '', 1).isdigit():
+                continue
+            try:
+                calls[toks[-1]] = int(toks[3])
+            except ValueError:
+                continue
+    top = dict(sorted(calls.items(), key=lambda kv: -kv[1])[:10])
+    return {'total': sum(calls.values()), 'top': top}
+
+
+def run_tool(cmd: List[str], cwd: str, strace: bool, tmp_dir: str) -> dict:
+    full = [sys.executable] + cmd
+    env = dict(os.environ, PYTHONIOENCODING='utf-8')
+    t0 = time.perf_counter()
+    proc = subprocess.run(full, cwd=cwd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, env=env)
+    sec = time.perf_counter() - t0
+    result = {'sec': sec, 'returncode': proc.returncode}
+    if proc.returncode != 0:
+        result['stderr'] = proc.stderr.decode('utf-8', 'replace')[-2000:]
+    if strace:
+        # รันแยกอีกรอบ เพื่อไม่ให้ overhead ของ strace ปนกับเวลาที่วัด
+        out = os.path.join(tmp_dir, 'strace.txt')
+        subprocess.run(['strace', '-c', '-f', '-o', out] + full, cwd=cwd,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, env=env)
+        result['syscalls'] = parse_strace_summary(out)
+    return result
+
+
+def bench_size(template: str, size: int, mode: str, repeat: int, strace: bool, only: Optional[set]) -> List[dict]:
+    rows = []
+    for name, cmd, target, dry_args, apply_args in TOOLS:
+        if only and name not in only:
+            continue
+        extra = dry_args if mode == 'dry' else apply_args
+        mutates = name in ALWAYS_MUTATES or (mode == 'apply' and extra is not None)
+        times = []
+        result = {}
+        for _ in range(repeat):
+            with tempfile.TemporaryDirectory(prefix='bench_') as tmp:
+                root = template
+                if mutates:
+                    # ไม่นับเวลา copy ในผลวัด
+                    root = os.path.join(tmp, 'data')
+                    shutil.copytree(template, root)
+                target_dir = root if target == 'root' else os.path.join(root, target)
+                args = [a.format(dir=target_dir, root=root, tmp=os.path.join(tmp, 'out')) for a in cmd] + (extra or [])
+                result = run_tool(args, HERE, strace and shutil.which('strace') is not None, tmp)
+                times.append(result['sec'])
+        n_files = count_files(os.path.join(template, 'labels' if target == 'root' else target))
+        sec = min(times)
+        row = {'tool': name, 'size': size, 'mode': mode, 'files': n_files, 'sec': sec,
+               'sec_all': times, 'files_per_sec': n_files / sec if sec > 0 else None,
+               'returncode': result.get('returncode'), 'syscalls': result.get('syscalls')}
+        if 'stderr' in result:
+            row['stderr'] = result['stderr']
+        status = '✓' if row['returncode'] == 0 else '✗'
+        syscalls = f", syscalls={row['syscalls']['total']}" if row['syscalls'] else ''
+        print(f"  {status} {name:<16} {n_files:>8} files  {sec:8.3f}s  {row['files_per_sec']:>10.0f} files/s{syscalls}")
+        rows.append(row)
+    return rows
+
+
+def compare(results: List[dict], baseline_path: str, tolerance: float) -> List[dict]:
+    # เทียบกับผลรอบก่อน: เครื่องมือที่ช้าลงเกิน tolerance ถือเป็น regression
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        base = {(r['tool'], r['size'], r['mode']): r for r in json.load(f)['results']}
+    regressions = []
+    for r in results:
+        b = base.get((r['tool'], r['size'], r['mode']))
+        if not b or not b.get('files_per_sec') or not r.get('files_per_sec'):
+            continue
+        ratio = r['files_per_sec'] / b['files_per_sec']
+        if ratio < 1 - tolerance:
+            regressions.append({'tool': r['tool'], 'size': r['size'], 'mode': r['mode'],
+                                'baseline_fps': b['files_per_sec'], 'fps': r['files_per_sec'], 'ratio': ratio})
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark เครื่องมือใน pre-process บน dataset จำลอง")
+    parser.add_argument("--sizes", type=int, nargs='+', default=[1000, 10000], help="จำนวนรูปต่อชุด (1k - 1M)")
+    parser.add_argument("--mode", choices=['dry', 'apply'], default='dry',
+                        help="dry = โหมด preview, apply = แก้ไฟล์จริงบนสำเนาของ dataset")
+    parser.add_argument("--repeat", type=int, default=1, help="รันซ้ำแล้วใช้เวลาที่น้อยที่สุด")
+    parser.add_argument("--tools", nargs='*', default=None, help="วัดเฉพาะเครื่องมือเหล่านี้")
+    parser.add_argument("--strace", action='store_true', help="นับ syscall ด้วย strace -c (Linux)")
+    parser.add_argument("--cache-dir", default='bench_datasets', help="เก็บ dataset จำลองไว้ใช้ซ้ำ")
+    parser.add_argument("--out", default=None, help="ไฟล์ JSON ผลลัพธ์")
+    parser.add_argument("--baseline", default=None, help="JSON ผลรอบก่อนสำหรับเทียบ regression")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="ช้าลงได้ไม่เกินสัดส่วนนี้")
+    args = parser.parse_args()
+
+    if args.strace and shutil.which('strace') is None:
+        print("⚠️  ไม่พบ strace ในเครื่องนี้ จะไม่นับ syscall")
+
+    only = set(args.tools) if args.tools else None
+    results = []
+    for size in args.sizes:
+        template = os.path.abspath(os.path.join(args.cache_dir, f'synthetic_{size}'))
+        if not os.path.exists(os.path.join(template, 'manifest.json')):
+            print(f"📦 สร้าง dataset จำลอง {size} รูป -> {template}")
+            shutil.rmtree(template, ignore_errors=True)
+            make_synthetic_dataset.make_dataset(template, size, seed=size)
+        print(f"\n{'='*60}\n⏱  size={size} mode={args.mode}\n{'='*60}")
+        results += bench_size(template, size, args.mode, args.repeat, args.strace, only)
+
+    report = {
+        'time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'results': results,
+    }
+    if args.baseline:
+        report['regressions'] = compare(results, args.baseline, args.tolerance)
+        if report['regressions']:
+            print(f"\n🚨 พบ regression {len(report['regressions'])} รายการ:")
+            for r in report['regressions']:
+                print(f" - {r['tool']} size={r['size']}: {r['fps']:.0f} vs {r['baseline_fps']:.0f} files/s ({r['ratio']:.2f}x)")
+        else:
+            print("\n✨ ไม่พบ regression เทียบกับ baseline")
+
+    out = args.out or os.path.join('bench_results', f"preprocess_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"\n📄 ผลลัพธ์: {out}")
+    if any(r['returncode'] != 0 for r in results):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -109,5 +109,6 @@ folders_to_check = [
     r'D:\model_cuu\dataset_method_1\labels'
 ]
 
-# รันโปรแกรม
-check_multiple_folders(folders_to_check)
\ No newline at end of file
+# รันโปรแกรม (เฉพาะตอนรันไฟล์นี้ตรงๆ ไม่ใช่ตอนถูกโหลดจาก bench_preprocess.py)
+if __name__ == "__main__":
+    check_multiple_folders(folders_to_check)
\ No newline at end of file
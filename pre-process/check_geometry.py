@@ -0,0 +1,221 @@
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+# ตั้งค่า encoding เพื่อให้แสดงผลภาษาไทยได้
+sys.stdout.reconfigure(encoding='utf-8')
+
+CLASS_NAMES = {
+    0: "Italian",
+    1: "Deer Tongue",
+    2: "Green Lollo Rossa",
+    3: "Red Coral",
+    4: "Caramel Romaine",
+    5: "Empty"
+}
+
+
+def load_labels(folders: List[str]) -> dict:
+    """
+    อ่าน label ทุกไฟล์ (YOLO detect: cls cx cy w h) เข้า NumPy array ก้อนเดียว
+    ไฟล์ที่จำนวน token ไม่ลงตัว 5 (เช่น polygon) จะถูกนับเป็น malformed และข้าม
+    """
+    files, tokens, counts, malformed = [], [], [], []
+    for folder in folders:
+        if not os.path.isdir(folder):
+            print(f"❌ ไม่พบโฟลเดอร์: {folder}")
+            continue
+        stack = [folder]
+        while stack:
+            for e in os.scandir(stack.pop()):
+                if e.is_dir(follow_symlinks=False):
+                    stack.append(e.path)
+                elif e.name.endswith('.txt') and e.name != 'classes.txt':
+                    with open(e.path, 'r') as f:
+                        toks = f.read().split()
+                    if len(toks) % 5:
+                        malformed.append(e.path)
+                        continue
+                    files.append(e.path)
+                    tokens.extend(toks)
+                    counts.append(len(toks) // 5)
+
+    arr = np.array(tokens, dtype=np.float64).reshape(-1, 5)
+    counts = np.asarray(counts, dtype=np.int64)
+    return {
+        'files': files,
+        'img': np.repeat(np.arange(len(files)), counts),
+        'line': np.arange(len(arr)) - np.repeat(np.cumsum(counts) - counts, counts),
+        'cls': arr[:, 0].astype(np.int64),
+        'xywh': arr[:, 1:],
+        'malformed': malformed,
+    }
+
+
+def xywh2xyxy(xywh: np.ndarray) -> np.ndarray:
+    xy, wh = xywh[:, :2], xywh[:, 2:] / 2
+    return np.concatenate([xy - wh, xy + wh], axis=1)
+
+
+def within_image_pairs(img: np.ndarray, max_pairs: int = 5_000_000):
+    """
+    สร้างคู่ (i, j), i < j ของกล่องที่อยู่ในรูปเดียวกันด้วย repeat-index (ไม่วนลูปทีละรูป)
+    img ต้องเรียงจากน้อยไปมาก; แบ่งเป็น chunk เพื่อคุมหน่วยความจำ
+    """
+    n = len(img)
+    if n == 0:
+        return
+    _, start, size = np.unique(img, return_index=True, return_counts=True)
+    group_end = np.repeat(start + size, size)
+    after = group_end - np.arange(n) - 1  # จำนวนกล่องที่ตามหลังในรูปเดียวกัน
+    cum = np.cumsum(after)
+    lo = 0
+    while lo < n:
+        hi = int(np.searchsorted(cum, (cum[lo - 1] if lo else 0) + max_pairs, side='right'))
+        hi = max(hi, lo + 1)
+        r = after[lo:hi]
+        a = np.repeat(np.arange(lo, hi), r)
+        offs = np.arange(len(a)) - np.repeat(np.cumsum(r) - r, r)
+        yield a, a + 1 + offs
+        lo = hi
+
+
+def pair_iou(xyxy: np.ndarray, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    ba, bb = xyxy[a], xyxy[b]
+    iw = (np.minimum(ba[:, 2], bb[:, 2]) - np.maximum(ba[:, 0], bb[:, 0])).clip(0)
+    ih = (np.minimum(ba[:, 3], bb[:, 3]) - np.maximum(ba[:, 1], bb[:, 1])).clip(0)
+    inter = iw * ih
+    area_a = (ba[:, 2] - ba[:, 0]) * (ba[:, 3] - ba[:, 1])
+    area_b = (bb[:, 2] - bb[:, 0]) * (bb[:, 3] - bb[:, 1])
+    return inter / (area_a + area_b - inter + 1e-12)
+
+
+def robust_outliers(values: np.ndarray, groups: np.ndarray, thresh: float = 3.5) -> np.ndarray:
+    # modified z-score (median / MAD) แยกตามคลาส
+    z = np.zeros_like(values)
+    for g in np.unique(groups):
+        m = groups == g
+        med = np.median(values[m])
+        mad = np.median(np.abs(values[m] - med))
+        if mad > 0:
+            z[m] = 0.6745 * (values[m] - med) / mad
+    return np.abs(z) > thresh
+
+
+def check_geometry(data: dict, iou_thr: float = 0.9, tol: float = 1e-3, min_size: float = 1e-4,
+                   z_thresh: float = 3.5) -> pd.DataFrame:
+    """
+    คืนค่า DataFrame ของปัญหาที่พบ: file, line, cls, issue, detail
+    """
+    xywh, cls = data['xywh'], data['cls']
+    xyxy = xywh2xyxy(xywh)
+    issues = []
+
+    def add(idx, issue, detail):
+        if len(idx):
+            issues.append(pd.DataFrame({'box': idx, 'issue': issue, 'detail': detail}))
+
+    degenerate = (xywh[:, 2] <= min_size) | (xywh[:, 3] <= min_size)
+    idx = np.flatnonzero(degenerate)
+    add(idx, 'zero_area', np.char.mod('w=%.5f', xywh[idx, 2]))
+
+    oob = ((xyxy[:, :2] < -tol) | (xyxy[:, 2:] > 1 + tol)).any(1) & ~degenerate
+    idx = np.flatnonzero(oob)
+    add(idx, 'out_of_bounds', [f"xyxy=({a:.3f},{b:.3f},{c:.3f},{d:.3f})" for a, b, c, d in xyxy[idx]])
+
+    for a, b in within_image_pairs(data['img']):
+        iou = pair_iou(xyxy, a, b)
+        hit = iou > iou_thr
+        a, b, iou = a[hit], b[hit], iou[hit]
+        same = cls[a] == cls[b]
+        add(b[same], 'duplicate', [f"IoU={v:.3f} กับบรรทัด {data['line'][j] + 1}" for v, j in zip(iou[same], a[same])])
+        add(b[~same], 'class_conflict', [f"IoU={v:.3f} กับบรรทัด {data['line'][j] + 1} (cls {cls[j]})"
+                                         for v, j in zip(iou[~same], a[~same])])
+
+    ok = ~degenerate
+    log_area = np.log(np.where(ok, xywh[:, 2] * xywh[:, 3], 1.0))
+    log_aspect = np.log(np.where(ok, xywh[:, 2] / np.where(ok, xywh[:, 3], 1.0), 1.0))
+    idx = np.flatnonzero(ok & robust_outliers(log_area, cls, z_thresh))
+    add(idx, 'size_outlier', np.char.mod('area=%.5f', xywh[idx, 2] * xywh[idx, 3]))
+    idx = np.flatnonzero(ok & robust_outliers(log_aspect, cls, z_thresh))
+    add(idx, 'aspect_outlier', np.char.mod('w/h=%.3f', np.exp(log_aspect[idx])))
+
+    if not issues:
+        return pd.DataFrame(columns=['file', 'line', 'cls', 'issue', 'detail'])
+    df = pd.concat(issues, ignore_index=True)
+    files = np.asarray(data['files'], dtype=object)
+    df.insert(0, 'file', files[data['img'][df['box']]])
+    df.insert(1, 'line', data['line'][df['box']] + 1)
+    df.insert(2, 'cls', cls[df['box']])
+    return df.drop(columns='box').sort_values(['file', 'line'], kind='stable').reset_index(drop=True)
+
+
+def write_histograms(data: dict, out_dir: str, bins: int = 20) -> None:
+    # histogram ขนาด (sqrt(area) สัดส่วนของภาพ) และ aspect (log2 w/h) แยกคลาส
+    xywh, cls = data['xywh'], data['cls']
+    ok = (xywh[:, 2] > 0) & (xywh[:, 3] > 0)
+    size = np.sqrt(xywh[ok, 2] * xywh[ok, 3])
+    aspect = np.log2(xywh[ok, 2] / xywh[ok, 3])
+    c = cls[ok]
+    for name, values, edges in (('size', size, np.linspace(0, 1, bins + 1)),
+                                ('aspect', aspect, np.linspace(-3, 3, bins + 1))):
+        table = {'bin_lo': edges[:-1], 'bin_hi': edges[1:]}
+        for k in np.unique(c):
+            table[CLASS_NAMES.get(int(k), f'cls_{k}')] = np.histogram(values[c == k].clip(edges[0], edges[-1]), edges)[0]
+        pd.DataFrame(table).to_csv(os.path.join(out_dir, f'{name}_hist.csv'), index=False)
+
+    rows = []
+    for k in np.unique(c):
+        m = c == k
+        rows.append({'cls': int(k), 'name': CLASS_NAMES.get(int(k), 'UNKNOWN'), 'boxes': int(m.sum()),
+                     'size_median': float(np.median(size[m])), 'size_p5': float(np.percentile(size[m], 5)),
+                     'size_p95': float(np.percentile(size[m], 95)), 'aspect_median': float(np.median(2 ** aspect[m]))})
+    pd.DataFrame(rows).to_csv(os.path.join(out_dir, 'class_stats.csv'), index=False)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Vectorized box-geometry QA for YOLO labels")
+    parser.add_argument("folders", nargs='*', default=[r'D:\model_cuu\dataset\labels'], help="โฟลเดอร์ labels (ค้นหาแบบ recursive)")
+    parser.add_argument("--iou", type=float, default=0.9, help="IoU ที่ถือว่าเป็นกล่องซ้ำ")
+    parser.add_argument("--z", type=float, default=3.5, help="modified z-score สำหรับ size/aspect outlier")
+    parser.add_argument("--out", default='geometry_qa', help="โฟลเดอร์สำหรับ issues.csv และ histogram")
+    args = parser.parse_args()
+
+    t0 = time.time()
+    data = load_labels(args.folders)
+    t_load = time.time() - t0
+    issues = check_geometry(data, iou_thr=args.iou, z_thresh=args.z)
+    t_check = time.time() - t0 - t_load
+
+    os.makedirs(args.out, exist_ok=True)
+    issues.to_csv(os.path.join(args.out, 'issues.csv'), index=False, encoding='utf-8-sig')
+    if len(data['cls']):
+        write_histograms(data, args.out)
+
+    print(f"{'='*60}")
+    print(f"📐 Geometry QA: {len(data['files'])} ไฟล์, {len(data['cls'])} กล่อง "
+          f"(อ่าน {t_load:.2f}s, ตรวจ {t_check:.2f}s)")
+    print(f"{'='*60}")
+    if data['malformed']:
+        print(f"⚠️  ไฟล์ที่ format ไม่ใช่ cls cx cy w h: {len(data['malformed'])} ไฟล์ (ข้าม)")
+    if issues.empty:
+        print("✨ ไม่พบปัญหา geometry")
+    else:
+        print(f"{'Issue':<16} {'Count':<8}")
+        print("-" * 30)
+        for issue, n in issues['issue'].value_counts().items():
+            print(f"{issue:<16} {n:<8}")
+        print("-" * 30)
+        print(issues.head(10).to_string(index=False))
+    print(f"\n📄 ผลลัพธ์: {os.path.join(args.out, 'issues.csv')} และ *_hist.csv")
+
+
+if __name__ == '__main__':
+    main()
@@ -11,6 +11,10 @@ import codecs
 sys.stdout = codecs.getwriter('utf-8')(sys.stdout.buffer, errors='replace')
 sys.stderr = codecs.getwriter('utf-8')(sys.stderr.buffer, errors='replace')
 
+# file_ops.py อยู่ที่รากของ repo
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import file_ops  # noqa: E402
+
 
 def find_non_hourly_images(directory: Path, exts: Set[str]) -> List[Path]:
     """
@@ -44,6 +48,7 @@ def rename_files_remove_hash(directory: Path, exts: Set[str], dry_run: bool = Tr
     pattern = re.compile(r'^[a-f0-9]+-(\d+_.+)$', re.IGNORECASE)
     
     renamed = 0
+    ops, taken = [], set()
     for p in directory.iterdir():
         if not p.is_file():
             continue
@@ -56,21 +61,22 @@ def rename_files_remove_hash(directory: Path, exts: Set[str], dry_run: bool = Tr
             new_name = match.group(1)
             new_path = p.parent / new_name
             
-            # ตรวจสอบว่าไฟล์ใหม่มีอยู่แล้วหรือไม่
-            if new_path.exists():
+            # ตรวจสอบว่าไฟล์ใหม่มีอยู่แล้วหรือไม่ (รวมชื่อที่ไฟล์อื่นในรอบนี้จะเปลี่ยนไปใช้)
+            if new_path.exists() or new_path in taken:
                 print(f"  ⚠ ข้าม: {p.name} (ไฟล์ {new_name} มีอยู่แล้ว)")
                 continue
+            taken.add(new_path)
             
             if dry_run:
                 print(f"  {p.name} → {new_name}")
             else:
-                try:
-                    p.rename(new_path)
-                    print(f"  ✓ {p.name} → {new_name}")
-                    renamed += 1
-                except Exception as e:
-                    print(f"  ✗ ไม่สามารถเปลี่ยนชื่อ {p.name}: {e}")
-    
+                ops.append(('rename', str(p), str(new_path)))
+
+    if ops:
+        # rename ทั้งหมดผ่าน thread pool (retry / แสดง files/s / resume ได้จาก <dataset>/.file_ops/cleanup.log)
+        stats = file_ops.run_ops(ops, log_path=str(directory.parent / '.file_ops' / 'cleanup.log'))
+        renamed = stats['done']
+
     return renamed
 
 
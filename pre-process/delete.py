@@ -11,6 +11,10 @@ import codecs
 sys.stdout = codecs.getwriter('utf-8')(sys.stdout.buffer, errors='replace')
 sys.stderr = codecs.getwriter('utf-8')(sys.stderr.buffer, errors='replace')
 
+# file_ops.py อยู่ที่รากของ repo
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import file_ops  # noqa: E402
+
 def rename_files_clean_format(directory: Path, exts: Set[str], dry_run: bool = True) -> int:
     """
     Logic ใหม่:
@@ -26,6 +30,7 @@ def rename_files_clean_format(directory: Path, exts: Set[str], dry_run: bool = T
     shorten_pattern = re.compile(r'^(\d+)_.+?_(\d{8}_\d{6}_panorama.*)$')
 
     files = list(directory.iterdir())
+    ops, taken = [], set()
     
     print(f"กำลังตรวจสอบ {len(files)} ไฟล์...")
 
@@ -75,7 +80,8 @@ def rename_files_clean_format(directory: Path, exts: Set[str], dry_run: bool = T
             
             # กรณีที่ 1: ไฟล์ปลายทางมีอยู่แล้ว (Duplicate)
             # เช่นมีทั้ง image.txt และ image_jpg.txt -> เราจะลบ image_jpg.txt ทิ้ง
-            if new_path.exists():
+            # (รวมกรณีที่ไฟล์อื่นในรอบนี้จะถูกเปลี่ยนชื่อไปเป็นชื่อเดียวกัน ไฟล์นั้นยังอยู่จึงลบตัวนี้ได้)
+            if new_path.exists() or new_path in taken:
                 if dry_run:
                     print(f" [Dry-Run] 🗑 จะลบไฟล์ซ้ำ: {original_name} (เพราะมี {new_name} อยู่แล้ว)")
                 else:
@@ -88,15 +94,16 @@ def rename_files_clean_format(directory: Path, exts: Set[str], dry_run: bool = T
 
             # กรณีที่ 2: ไฟล์ปลายทางยังไม่มี -> เปลี่ยนชื่อตามปกติ
             else:
+                taken.add(new_path)
                 if dry_run:
                     print(f" [Dry-Run] ✏ จะเปลี่ยนชื่อ: {original_name} --> {new_name}")
                 else:
-                    try:
-                        p.rename(new_path)
-                        print(f" ✓ เปลี่ยนชื่อ: {original_name} --> {new_name}")
-                        renamed_count += 1
-                    except Exception as e:
-                        print(f" ✗ เปลี่ยนชื่อไม่สำเร็จ {original_name}: {e}")
+                    ops.append(('rename', str(p), str(new_path)))
+
+    if ops:
+        # rename ทั้งหมดผ่าน thread pool (retry / แสดง files/s / resume ได้จาก <dataset>/.file_ops/cleanup.log)
+        stats = file_ops.run_ops(ops, log_path=str(directory.parent / '.file_ops' / 'cleanup.log'))
+        renamed_count = stats['done']
 
     return renamed_count
 
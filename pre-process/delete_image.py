@@ -11,12 +11,17 @@ import codecs
 sys.stdout = codecs.getwriter('utf-8')(sys.stdout.buffer, errors='replace')
 sys.stderr = codecs.getwriter('utf-8')(sys.stderr.buffer, errors='replace')
 
+# file_ops.py อยู่ที่รากของ repo
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import file_ops  # noqa: E402
+
 def convert_jpg_labels_to_txt(directory: Path, dry_run: bool = True) -> int:
     """
     ฟังก์ชันพิเศษ: แปลง .jpg เป็น .txt (ใช้เฉพาะในโฟลเดอร์ labels)
     แก้ปัญหาไฟล์ labels ที่ถูกเปลี่ยนนามสกุลผิด
     """
     converted = 0
+    ops, taken = [], set()
     for p in directory.iterdir():
         if not p.is_file(): continue
         
@@ -25,19 +30,19 @@ def convert_jpg_labels_to_txt(directory: Path, dry_run: bool = True) -> int:
             new_name = p.stem + ".txt" # ใช้ชื่อเดิมแต่เปลี่ยนนามสกุล
             new_path = p.parent / new_name
             
-            if new_path.exists():
+            if new_path.exists() or new_path in taken:
                 print(f"  ⚠ ข้าม: {p.name} (มีไฟล์ {new_name} อยู่แล้ว)")
                 continue
+            taken.add(new_path)
                 
             if dry_run:
                 print(f"  [แก้ JPG->TXT] {p.name} \n             --> {new_name}")
             else:
-                try:
-                    p.rename(new_path)
-                    print(f"  ✓ แก้ไข: {p.name} \n         --> {new_name}")
-                    converted += 1
-                except Exception as e:
-                    print(f"  ✗ แก้ไขไม่ได้ {p.name}: {e}")
+                ops.append(('rename', str(p), str(new_path)))
+    if ops:
+        # rename ทั้งหมดผ่าน thread pool (retry / แสดง files/s / resume ได้จาก <dataset>/.file_ops/cleanup.log)
+        stats = file_ops.run_ops(ops, log_path=str(directory.parent / '.file_ops' / 'cleanup.log'))
+        converted = stats['done']
     return converted
 
 def delete_rf_files(directory: Path, exts: Set[str], dry_run: bool = True) -> int:
@@ -71,6 +76,7 @@ def rename_files_clean_format(directory: Path, exts: Set[str], dry_run: bool = T
     (ฟังก์ชันเดิม) จัดระเบียบชื่อไฟล์ 5_05-17_... -> 5_2025...
     """
     renamed = 0
+    ops, taken = [], set()
     shorten_pattern = re.compile(r'^(\d+)_.+?_(\d{8}_\d{6}_panorama.*)$')
 
     for p in directory.iterdir():
@@ -96,23 +102,24 @@ def rename_files_clean_format(directory: Path, exts: Set[str], dry_run: bool = T
 
         if current_name != p.name:
             new_path = p.parent / current_name
-            if new_path.exists():
+            if new_path.exists() or new_path in taken:
                 # ถ้าไฟล์ปลายทางมีอยู่แล้ว (อาจจะเป็นไฟล์ clean ที่มีอยู่แล้ว)
                 # เราอาจจะเลือกลบไฟล์ duplicate นี้ทิ้งแทนการ rename
                 if dry_run:
                     print(f"  ⚠ ข้าม (ไฟล์ซ้ำ): {p.name} -> {current_name} มีอยู่แล้ว")
                 continue
+            taken.add(new_path)
             
             if dry_run:
                 print(f"  [เปลี่ยนชื่อ] {p.name} \n           --> {current_name}")
             else:
-                try:
-                    p.rename(new_path)
-                    print(f"  ✓ เปลี่ยนชื่อ: {p.name} \n           --> {current_name}")
-                    renamed += 1
-                except Exception as e:
-                    print(f"  ✗ Error: {e}")
-                    
+                ops.append(('rename', str(p), str(new_path)))
+
+    if ops:
+        # rename ทั้งหมดผ่าน thread pool (retry / แสดง files/s / resume ได้จาก <dataset>/.file_ops/cleanup.log)
+        stats = file_ops.run_ops(ops, log_path=str(directory.parent / '.file_ops' / 'cleanup.log'))
+        renamed = stats['done']
+
     return renamed
 
 def find_non_hourly_files(directory: Path, exts: Set[str]) -> List[Path]:
@@ -11,6 +11,10 @@ import codecs
 sys.stdout = codecs.getwriter('utf-8')(sys.stdout.buffer, errors='replace')
 sys.stderr = codecs.getwriter('utf-8')(sys.stderr.buffer, errors='replace')
 
+# file_ops.py อยู่ที่รากของ repo
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import file_ops  # noqa: E402
+
 
 def find_non_hourly_images(directory: Path, exts: Set[str]) -> List[Path]:
     """
@@ -35,6 +39,7 @@ def rename_files_remove_hash(directory: Path, exts: Set[str], dry_run: bool = Tr
     """
     pattern = re.compile(r'^[a-f0-9]+-(\d+_.+)$', re.IGNORECASE)
     renamed = 0
+    ops, taken = [], set()
     for p in directory.iterdir():
         if not p.is_file(): continue
         if p.suffix.lower().lstrip('.') not in exts: continue
@@ -44,19 +49,20 @@ def rename_files_remove_hash(directory: Path, exts: Set[str], dry_run: bool = Tr
             new_name = match.group(1)
             new_path = p.parent / new_name
             
-            if new_path.exists():
+            if new_path.exists() or new_path in taken:
                 print(f"  ⚠ ข้าม (Hash): {p.name} (ไฟล์ {new_name} มีอยู่แล้ว)")
                 continue
+            taken.add(new_path)
             
             if dry_run:
                 print(f"  [แก้ Hash] {p.name} \n             --> {new_name}")
             else:
-                try:
-                    p.rename(new_path)
-                    print(f"  ✓ แก้ Hash: {p.name} \n             --> {new_name}")
-                    renamed += 1
-                except Exception as e:
-                    print(f"  ✗ ไม่สามารถเปลี่ยนชื่อ {p.name}: {e}")
+                ops.append(('rename', str(p), str(new_path)))
+
+    if ops:
+        # rename ทั้งหมดผ่าน thread pool (retry / แสดง files/s / resume ได้จาก <dataset>/.file_ops/cleanup.log)
+        stats = file_ops.run_ops(ops, log_path=str(directory.parent / '.file_ops' / 'cleanup.log'))
+        renamed = stats['done']
     return renamed
 
 
@@ -67,6 +73,7 @@ def clean_long_duplicate_files(directory: Path, exts: Set[str], dry_run: bool =
     - ถ้าไม่มีไฟล์ชื่อสั้น -> เปลี่ยนชื่อไฟล์ยาวเป็นไฟล์สั้น (Rename)
     """
     cleaned = 0
+    ops, taken = [], set()
     
     # Regex จับ Pattern: เลข_เดือน-วัน_เลข_(วันเวลา...)
     # Group 1: เลขหน้า (เช่น 5)
@@ -83,8 +90,8 @@ def clean_long_duplicate_files(directory: Path, exts: Set[str], dry_run: bool =
             short_name = f"{match.group(1)}_{match.group(2)}"
             short_path = p.parent / short_name
             
-            if short_path.exists():
-                # กรณีที่ 1: ไฟล์ชื่อสั้นมีอยู่แล้ว = ไฟล์นี้คือตัวซ้ำ -> ลบทิ้ง
+            if short_path.exists() or short_path in taken:
+                # กรณีที่ 1: ไฟล์ชื่อสั้นมีอยู่แล้ว (หรือไฟล์อื่นในรอบนี้จะเปลี่ยนไปเป็นชื่อนั้น) = ไฟล์นี้คือตัวซ้ำ -> ลบทิ้ง
                 if dry_run:
                     print(f"  [ลบตัวซ้ำ] {p.name} (เพราะมี {short_name} แล้ว)")
                 else:
@@ -96,16 +103,17 @@ def clean_long_duplicate_files(directory: Path, exts: Set[str], dry_run: bool =
                         print(f"  ✗ ลบไม่ได้ {p.name}: {e}")
             else:
                 # กรณีที่ 2: ไฟล์ชื่อสั้นยังไม่มี = ไฟล์นี้ชื่อผิด -> เปลี่ยนชื่อ
+                taken.add(short_path)
                 if dry_run:
                     print(f"  [แก้ชื่อยาว] {p.name} \n              --> {short_name}")
                 else:
-                    try:
-                        p.rename(short_path)
-                        print(f"  ✓ แก้ชื่อยาว: {p.name} \n              --> {short_name}")
-                        cleaned += 1
-                    except Exception as e:
-                        print(f"  ✗ เปลี่ยนชื่อไม่ได้ {p.name}: {e}")
-                        
+                    ops.append(('rename', str(p), str(short_path)))
+
+    if ops:
+        # rename ทั้งหมดผ่าน thread pool (retry / แสดง files/s / resume ได้จาก <dataset>/.file_ops/cleanup.log)
+        stats = file_ops.run_ops(ops, log_path=str(directory.parent / '.file_ops' / 'cleanup.log'))
+        cleaned += stats['done']
+
     return cleaned
 
 
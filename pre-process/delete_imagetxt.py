@@ -11,11 +11,16 @@ import codecs
 sys.stdout = codecs.getwriter('utf-8')(sys.stdout.buffer, errors='replace')
 sys.stderr = codecs.getwriter('utf-8')(sys.stderr.buffer, errors='replace')
 
+# file_ops.py อยู่ที่รากของ repo
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import file_ops  # noqa: E402
+
 def clean_extension_mistakes(directory: Path, exts: Set[str], dry_run: bool = True) -> int:
     """
     แก้ไขนามสกุลผิด: _jpg.txt -> .txt
     """
     fixed = 0
+    ops, taken = [], set()
     for p in directory.iterdir():
         if not p.is_file(): continue
         
@@ -28,19 +33,20 @@ def clean_extension_mistakes(directory: Path, exts: Set[str], dry_run: bool = Tr
             continue
 
         new_path = p.parent / new_name
-        if new_path.exists():
+        if new_path.exists() or new_path in taken:
              # ถ้าแก้แล้วชื่อไปซ้ำกับที่มีอยู่ ก็ข้ามไปก่อน เดี๋ยวฟังก์ชัน duplicate จะจัดการต่อ
              continue
+        taken.add(new_path)
 
         if dry_run:
             print(f"  [แก้ชื่อ] {p.name} -> {new_name}")
         else:
-            try:
-                p.rename(new_path)
-                print(f"  ✓ แก้ชื่อ: {p.name} -> {new_name}")
-                fixed += 1
-            except Exception as e:
-                print(f"  ✗ Error: {e}")
+            ops.append(('rename', str(p), str(new_path)))
+
+    if ops:
+        # rename ทั้งหมดผ่าน thread pool (retry / แสดง files/s / resume ได้จาก <dataset>/.file_ops/cleanup.log)
+        stats = file_ops.run_ops(ops, log_path=str(directory.parent / '.file_ops' / 'cleanup.log'))
+        fixed = stats['done']
     return fixed
 
 def clean_long_duplicate_files(directory: Path, exts: Set[str], dry_run: bool = True) -> int:
@@ -50,6 +56,7 @@ def clean_long_duplicate_files(directory: Path, exts: Set[str], dry_run: bool =
     2. ถ้าไม่มีไฟล์ชื่อสั้น -> เปลี่ยนชื่อไฟล์ยาวเป็นไฟล์สั้น (Rename)
     """
     cleaned = 0
+    ops, taken = [], set()
     
     # Regex จับ Pattern: เลขหน้า_ขยะตรงกลาง_วันเวลา...
     # ใช้ได้ทั้ง .txt และ .jpg
@@ -68,8 +75,8 @@ def clean_long_duplicate_files(directory: Path, exts: Set[str], dry_run: bool =
             short_name = f"{match.group(1)}_{match.group(2)}"
             short_path = p.parent / short_name
             
-            if short_path.exists():
-                # กรณีที่ 1: ไฟล์ชื่อสั้นมีอยู่แล้ว = ไฟล์นี้คือตัวซ้ำ -> ลบทิ้ง
+            if short_path.exists() or short_path in taken:
+                # กรณีที่ 1: ไฟล์ชื่อสั้นมีอยู่แล้ว (หรือไฟล์อื่นในรอบนี้จะเปลี่ยนไปเป็นชื่อนั้น) = ไฟล์นี้คือตัวซ้ำ -> ลบทิ้ง
                 if dry_run:
                     print(f"  [ลบตัวซ้ำ] {p.name}")
                     print(f"             (เพราะมี {short_name} อยู่แล้ว)")
@@ -82,18 +89,18 @@ def clean_long_duplicate_files(directory: Path, exts: Set[str], dry_run: bool =
                         print(f"  ✗ ลบไม่ได้ {p.name}: {e}")
             else:
                 # กรณีที่ 2: ไฟล์ชื่อสั้นยังไม่มี -> เปลี่ยนชื่อให้สั้นลง
+                taken.add(short_path)
                 if dry_run:
                     print(f"  [แก้ชื่อยาว] {p.name}")
                     print(f"              -> {short_name}")
                 else:
-                    try:
-                        p.rename(short_path)
-                        print(f"  ✓ แก้ชื่อยาว: {p.name}")
-                        print(f"              -> {short_name}")
-                        cleaned += 1
-                    except Exception as e:
-                        print(f"  ✗ เปลี่ยนชื่อไม่ได้ {p.name}: {e}")
-                        
+                    ops.append(('rename', str(p), str(short_path)))
+
+    if ops:
+        # rename ทั้งหมดผ่าน thread pool (retry / แสดง files/s / resume ได้จาก <dataset>/.file_ops/cleanup.log)
+        stats = file_ops.run_ops(ops, log_path=str(directory.parent / '.file_ops' / 'cleanup.log'))
+        cleaned += stats['done']
+
     return cleaned
 
 def find_non_hourly_files(directory: Path, exts: Set[str]) -> List[Path]:
@@ -11,12 +11,17 @@ import codecs
 sys.stdout = codecs.getwriter('utf-8')(sys.stdout.buffer, errors='replace')
 sys.stderr = codecs.getwriter('utf-8')(sys.stderr.buffer, errors='replace')
 
+# file_ops.py อยู่ที่รากของ repo
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import file_ops  # noqa: E402
+
 def rename_files_clean_format(directory: Path, exts: Set[str], dry_run: bool = True) -> int:
     """
     1. ตัดส่วนที่เป็น .rf.xxxxx ออก
     2. ตัดส่วนเกินตรงกลางออก (เช่น 5_05-17_5_2025... -> 5_2025...)
     """
     renamed = 0
+    ops, taken = [], set()
     
     # Regex สำหรับจับ pattern: เลขหน้า_ขยะตรงกลาง_วันเวลา...
     # Group 1 = เลขหน้า (เช่น 5)
@@ -68,20 +73,21 @@ def rename_files_clean_format(directory: Path, exts: Set[str], dry_run: bool = T
         if current_name != p.name:
             new_path = p.parent / current_name
             
-            if new_path.exists():
+            if new_path.exists() or new_path in taken:
                 print(f"  ⚠ ข้าม: {p.name} (ไฟล์ {current_name} มีอยู่แล้ว)")
                 continue
+            taken.add(new_path)
             
             if dry_run:
                 print(f"  {p.name} \n    --> {current_name}")
             else:
-                try:
-                    p.rename(new_path)
-                    print(f"  ✓ {p.name} \n    --> {current_name}")
-                    renamed += 1
-                except Exception as e:
-                    print(f"  ✗ ไม่สามารถเปลี่ยนชื่อ {p.name}: {e}")
-                    
+                ops.append(('rename', str(p), str(new_path)))
+
+    if ops:
+        # rename ทั้งหมดผ่าน thread pool (retry / แสดง files/s / resume ได้จาก <dataset>/.file_ops/cleanup.log)
+        stats = file_ops.run_ops(ops, log_path=str(directory.parent / '.file_ops' / 'cleanup.log'))
+        renamed = stats['done']
+
     return renamed
 
 def find_non_hourly_files(directory: Path, exts: Set[str]) -> List[Path]:
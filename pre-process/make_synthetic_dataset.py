@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+from typing import Dict
+
+# ตั้งค่า encoding เพื่อให้แสดงผลภาษาไทยได้
+sys.stdout.reconfigure(encoding='utf-8')
+
+# สัดส่วนของปัญหาชื่อไฟล์ที่พบจริงใน export จาก Roboflow / กล้อง (ที่เหลือเป็นชื่อปกติ)
+DEFAULT_RATES = {
+    'hash_prefix': 0.10,   # 62fb71e-5_20250517_000034_panorama.jpg
+    'roboflow_rf': 0.10,   # 5_20250517_000034_panorama_jpg.rf.<hash>.jpg
+    'jpg_txt': 0.05,       # label: 5_20250517_000034_panorama_jpg.txt
+    'long_name': 0.05,     # 5_05-17_5_20250517_000034_panorama.jpg
+    'non_hourly': 0.10,    # ถ่ายนาทีที่ 20 / 40
+    'jpeg_label': 0.03,    # label ถูกบันทึกเป็น .jpg ในโฟลเดอร์ labels
+}
+
+# JPEG ขนาดเล็ก (มี SOI/EOI) ใช้แทนรูปจริง สคริปต์ pre-process ดูแค่ชื่อไฟล์ ไม่ได้ decode รูป
+_FAKE_JPEG = b'\xff\xd8\xff\xe0\x00\x10JFIF\x00\x01\x01\x00\x00\x01\x00\x01\x00\x00' + b'\x00' * 512 + b'\xff\xd9'
+
+
+def _label_text(rng: random.Random) -> str:
+    # class 0-3 ตาม data1 ก่อน remap (changeclass.py)
+    lines = []
+    for _ in range(rng.randint(0, 12)):
+        w, h = rng.uniform(0.03, 0.12), rng.uniform(0.03, 0.12)
+        lines.append(f"{rng.randint(0, 3)} {rng.uniform(w / 2, 1 - w / 2):.6f} {rng.uniform(h / 2, 1 - h / 2):.6f} {w:.6f} {h:.6f}")
+    return '\n'.join(lines) + ('\n' if lines else '')
+
+
+def make_dataset(out_dir: str, n_images: int, seed: int = 0, rates: Dict[str, float] = None) -> dict:
+    """
+    สร้าง dataset จำลอง out_dir/images + out_dir/labels จำนวน n_images รูป
+    คืนค่าจำนวนไฟล์ของแต่ละ pathology (บันทึกไว้ที่ out_dir/manifest.json ด้วย)
+    """
+    rates = dict(DEFAULT_RATES, **(rates or {}))
+    rng = random.Random(seed)
+    img_dir = os.path.join(out_dir, 'images')
+    lbl_dir = os.path.join(out_dir, 'labels')
+    os.makedirs(img_dir, exist_ok=True)
+    os.makedirs(lbl_dir, exist_ok=True)
+
+    counts = {k: 0 for k in rates}
+    counts['clean'] = 0
+    start = datetime(2025, 5, 1)
+    used = set()
+    for i in range(n_images):
+        while True:
+            tower = rng.randint(1, 12)
+            ts = start + timedelta(hours=rng.randint(0, 24 * 365 * 3))
+            minute = rng.choice((20, 40)) if rng.random() < rates['non_hourly'] else 0
+            ts = ts.replace(minute=minute, second=rng.randint(0, 59))
+            stem = f"{tower}_{ts:%Y%m%d_%H%M%S}_panorama"
+            if stem not in used:
+                used.add(stem)
+                break
+        if minute:
+            counts['non_hourly'] += 1
+
+        img_name, lbl_name = stem + '.jpg', stem + '.txt'
+        r = rng.random()
+        edges = 0.0
+        kind = 'clean'
+        for k in ('hash_prefix', 'roboflow_rf', 'jpg_txt', 'long_name', 'jpeg_label'):
+            edges += rates[k]
+            if r < edges:
+                kind = k
+                break
+        if kind == 'hash_prefix':
+            prefix = f"{rng.getrandbits(28):07x}-"
+            img_name, lbl_name = prefix + img_name, prefix + lbl_name
+        elif kind == 'roboflow_rf':
+            rf = f"{rng.getrandbits(128):032x}"
+            img_name, lbl_name = f"{stem}_jpg.rf.{rf}.jpg", f"{stem}_jpg.rf.{rf}.txt"
+        elif kind == 'jpg_txt':
+            lbl_name = stem + '_jpg.txt'
+        elif kind == 'long_name':
+            long_stem = f"{tower}_{ts:%m-%d}_{tower}_{ts:%Y%m%d_%H%M%S}_panorama"
+            img_name, lbl_name = long_stem + '.jpg', long_stem + '.txt'
+        elif kind == 'jpeg_label':
+            lbl_name = stem + '.jpg'
+        counts[kind] += 1
+
+        with open(os.path.join(img_dir, img_name), 'wb') as f:
+            f.write(_FAKE_JPEG)
+        with open(os.path.join(lbl_dir, lbl_name), 'w') as f:
+            f.write(_label_text(rng))
+        if (i + 1) % 100000 == 0:
+            print(f"  ... {i + 1}/{n_images}")
+
+    manifest = {'images': n_images, 'seed': seed, 'rates': rates, 'counts': counts}
+    with open(os.path.join(out_dir, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="สร้าง dataset จำลองที่มีปัญหาชื่อไฟล์แบบที่พบจริง")
+    parser.add_argument("--out", default='synthetic_dataset', help="โฟลเดอร์ปลายทาง")
+    parser.add_argument("--n", type=int, default=1000, help="จำนวนรูป (1k - 1M)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if os.path.exists(os.path.join(args.out, 'images')) and os.listdir(os.path.join(args.out, 'images')):
+        print(f"Error: โฟลเดอร์ {args.out} มีข้อมูลอยู่แล้ว")
+        return
+    manifest = make_dataset(args.out, args.n, args.seed)
+    print(f"✓ สร้าง dataset จำลอง {args.n} รูปที่ {args.out}")
+    for k, v in manifest['counts'].items():
+        print(f"   - {k:<12}: {v}")
+
+
+if __name__ == '__main__':
+    main()
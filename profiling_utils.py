@@ -0,0 +1,141 @@
+import os
+import time
+import torch
+from torch.profiler import profile, schedule, record_function, ProfilerActivity
+
+PROFILE_DIR = 'profile'
+SUMMARY_NAME = 'top_ops.txt'
+
+
+class BatchProfiler:
+    """
+    จับ torch profiler trace ช่วง step ที่กำหนด (ข้าม wait step แรก, warmup แล้วบันทึก active step)
+    - operator time / memory จาก torch.profiler (CPU เสมอ, CUDA ถ้ามี GPU)
+    - เวลารอ dataloader = ช่วงระหว่าง batch_end ถึง batch_start ถัดไป (บันทึกเป็น record_function 'dataloader_wait')
+    ผลลัพธ์: <save_dir>/profile/trace_*.json (เปิดด้วย chrome://tracing หรือ Perfetto) และ top_ops.txt
+    """
+
+    def __init__(self, wait=10, warmup=2, active=10, row_limit=25):
+        self.wait, self.warmup, self.active = wait, warmup, active
+        self.row_limit = row_limit
+        self.use_cuda = torch.cuda.is_available()
+        self.prof = None
+        self.out_dir = None
+        self.step_idx = 0
+        self.done = False
+        self._wait_rf = None
+        self._t_end = None
+        self.data_wait_ms = []
+        self.step_ms = []
+        self._t_start = None
+
+    def _on_trace_ready(self, prof):
+        prof.export_chrome_trace(os.path.join(self.out_dir, f'trace_step{self.step_idx}.json'))
+
+    def _start(self, save_dir):
+        self.out_dir = os.path.join(str(save_dir), PROFILE_DIR)
+        os.makedirs(self.out_dir, exist_ok=True)
+        activities = [ProfilerActivity.CPU] + ([ProfilerActivity.CUDA] if self.use_cuda else [])
+        self.prof = profile(
+            activities=activities,
+            schedule=schedule(wait=self.wait, warmup=self.warmup, active=self.active, repeat=1),
+            on_trace_ready=self._on_trace_ready,
+            record_shapes=True,
+            profile_memory=True,
+        )
+        self.prof.__enter__()
+        print(f" Profiler: wait={self.wait} warmup={self.warmup} active={self.active} steps -> {self.out_dir}")
+
+    def batch_start(self, save_dir):
+        if self.done:
+            return
+        if self.prof is None:
+            self._start(save_dir)
+        now = time.perf_counter()
+        if self._wait_rf is not None:
+            self._wait_rf.__exit__(None, None, None)
+            self._wait_rf = None
+            if self.step_idx >= self.wait:
+                self.data_wait_ms.append((now - self._t_end) * 1000)
+        self._t_start = now
+
+    def batch_end(self):
+        if self.done or self.prof is None:
+            return
+        self._t_end = time.perf_counter()
+        if self.step_idx >= self.wait:
+            self.step_ms.append((self._t_end - self._t_start) * 1000)
+        self.prof.step()
+        self.step_idx += 1
+        if self.step_idx >= self.wait + self.warmup + self.active:
+            self.finish()
+            return
+        self._wait_rf = record_function('dataloader_wait')
+        self._wait_rf.__enter__()
+
+    def finish(self):
+        if self.done or self.prof is None:
+            return
+        if self._wait_rf is not None:
+            self._wait_rf.__exit__(None, None, None)
+            self._wait_rf = None
+        self.prof.__exit__(None, None, None)
+        self.done = True
+        self.write_summary()
+
+    def write_summary(self):
+        try:
+            averages = self.prof.key_averages()
+        except Exception:
+            averages = []
+        if not len(averages):
+            # จำนวน batch น้อยกว่า wait + warmup จึงไม่มีช่วง active
+            print(f" Profiler: ไม่มีข้อมูล (มีเพียง {self.step_idx} step ลองลด --profile-wait)")
+            return
+        sort_by = 'self_cpu_time_total'
+        if self.use_cuda:
+            # torch เวอร์ชันใหม่เปลี่ยนชื่อคอลัมน์ cuda -> device
+            sort_by = 'self_device_time_total' if hasattr(averages[0], 'self_device_time_total') else 'self_cuda_time_total'
+        path = os.path.join(self.out_dir, SUMMARY_NAME)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(f"Profiled steps: {len(self.step_ms)} (after {self.wait} skipped)\n")
+            if self.step_ms:
+                f.write(f"Step time (ms)      : mean {sum(self.step_ms) / len(self.step_ms):.1f}, max {max(self.step_ms):.1f}\n")
+            if self.data_wait_ms:
+                total = sum(self.data_wait_ms) + sum(self.step_ms)
+                f.write(f"Dataloader wait (ms): mean {sum(self.data_wait_ms) / len(self.data_wait_ms):.1f}, "
+                        f"max {max(self.data_wait_ms):.1f} ({100 * sum(self.data_wait_ms) / max(total, 1e-9):.1f}% of wall time)\n")
+            f.write(f"Device: {'CUDA' if self.use_cuda else 'CPU'}\n\n")
+            f.write(averages.table(sort_by=sort_by, row_limit=self.row_limit))
+            f.write("\n\n-- Top operators by CPU memory --\n")
+            f.write(averages.table(sort_by='self_cpu_memory_usage', row_limit=self.row_limit))
+        print(f" Profiler summary saved: {path}")
+
+
+def attach(model, phase='train', **kw):
+    """
+    เพิ่ม callback ให้ YOLO model: phase='train' จับ train batch, phase='val' จับ val batch (เช่นใน test.py)
+    """
+    profiler = BatchProfiler(**kw)
+    if phase == 'train':
+        model.add_callback('on_train_batch_start', lambda trainer: profiler.batch_start(trainer.save_dir))
+        model.add_callback('on_train_batch_end', lambda trainer: profiler.batch_end())
+        model.add_callback('on_train_end', lambda trainer: profiler.finish())
+    else:
+        model.add_callback('on_val_batch_start', lambda validator: profiler.batch_start(validator.save_dir))
+        model.add_callback('on_val_batch_end', lambda validator: profiler.batch_end())
+        model.add_callback('on_val_end', lambda validator: profiler.finish())
+    return profiler
+
+
+def add_profile_args(parser):
+    parser.add_argument("--profile", action='store_true', help="จับ torch profiler trace (ใช้ได้ทั้ง CPU/GPU)")
+    parser.add_argument("--profile-wait", type=int, default=10, help="จำนวน step แรกที่ข้ามก่อนเริ่มจับ")
+    parser.add_argument("--profile-steps", type=int, default=10, help="จำนวน step ที่บันทึก")
+    return parser
+
+
+def attach_from_args(model, args, phase='train'):
+    if not args.profile:
+        return None
+    return attach(model, phase, wait=args.profile_wait, active=args.profile_steps)
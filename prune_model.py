@@ -0,0 +1,198 @@
+import os
+import sys
+import json
+import argparse
+import torch
+import torch.nn as nn
+from ultralytics import YOLO
+from ultralytics.models.yolo.detect import DetectionTrainer
+from ultralytics.nn.modules.block import Bottleneck
+
+import latency_utils
+import report_utils
+
+dataset_root = r'D:\model_cuu\dataset'
+best_weights = r'D:\model_cuu\runs\train\my_lettuce_model_1_34\weights\best.pt'
+finetune_args = dict(
+    epochs=10,
+    batch=16,
+    imgsz=640,
+    device='0',
+    project='runs/prune',
+    verbose=False,
+    plots=False,
+    optimizer='AdamW',
+    lr0=0.0005,
+    warmup_epochs=0.0,
+)
+
+
+def prunable_blocks(model):
+    # prune เฉพาะ hidden channel ของ Bottleneck (cv1 out -> cv2 in) ซึ่งไม่กระทบ shape ของ residual/concat
+    return [m for m in model.modules() if isinstance(m, Bottleneck) and m.cv1.conv.groups == 1 and m.cv2.conv.groups == 1]
+
+
+def _prune_conv_out(conv, keep):
+    # conv = ultralytics Conv (conv + bn + act)
+    c, bn = conv.conv, conv.bn
+    new = nn.Conv2d(c.in_channels, len(keep), c.kernel_size, c.stride, c.padding, c.dilation, c.groups,
+                    bias=c.bias is not None).to(c.weight.device, c.weight.dtype)
+    new.weight.data = c.weight.data[keep].clone()
+    if c.bias is not None:
+        new.bias.data = c.bias.data[keep].clone()
+    nb = nn.BatchNorm2d(len(keep), eps=bn.eps, momentum=bn.momentum).to(bn.weight.device, bn.weight.dtype)
+    nb.weight.data = bn.weight.data[keep].clone()
+    nb.bias.data = bn.bias.data[keep].clone()
+    nb.running_mean = bn.running_mean[keep].clone()
+    nb.running_var = bn.running_var[keep].clone()
+    conv.conv, conv.bn = new, nb
+
+
+def _prune_conv_in(conv, keep):
+    c = conv.conv
+    new = nn.Conv2d(len(keep), c.out_channels, c.kernel_size, c.stride, c.padding, c.dilation, c.groups,
+                    bias=c.bias is not None).to(c.weight.device, c.weight.dtype)
+    new.weight.data = c.weight.data[:, keep].clone()
+    if c.bias is not None:
+        new.bias.data = c.bias.data.clone()
+    conv.conv = new
+
+
+def prune_step(model, ratio=0.1, min_channels=8):
+    """
+    ตัด channel ที่ |BN gamma| ต่ำที่สุด ratio ของ channel ที่ prune ได้ทั้งหมด (threshold เดียวทั้งโมเดล)
+    แต่ละ block เหลืออย่างน้อย min_channels คืนค่าจำนวน channel ที่ถูกตัด
+    """
+    blocks = prunable_blocks(model)
+    if not blocks:
+        return 0
+    gammas = torch.cat([m.cv1.bn.weight.detach().abs().float().flatten() for m in blocks])
+    k = int(len(gammas) * ratio)
+    if k == 0:
+        return 0
+    thr = torch.kthvalue(gammas.cpu(), k).values.item()
+    removed = 0
+    for m in blocks:
+        g = m.cv1.bn.weight.detach().abs().float()
+        keep = torch.nonzero(g > thr).flatten()
+        if len(keep) < min_channels:
+            keep = torch.sort(torch.argsort(g, descending=True)[:min(min_channels, len(g))]).values
+        if len(keep) == len(g):
+            continue
+        _prune_conv_out(m.cv1, keep)
+        _prune_conv_in(m.cv2, keep)
+        removed += len(g) - len(keep)
+    return removed
+
+
+def count_params(model):
+    return sum(p.numel() for p in model.parameters())
+
+
+class PrunedTrainer(DetectionTrainer):
+    # ใช้โมเดลที่ถูก prune แล้วโดยตรง (ไม่สร้างใหม่จาก yaml ซึ่งยังเป็นขนาดเดิม)
+    def get_model(self, cfg=None, weights=None, verbose=True):
+        for p in weights.parameters():
+            p.requires_grad_(True)
+        return weights
+
+
+def measure(weights, yaml_path, imgsz, device, latency_runs):
+    metrics = YOLO(weights).val(data=yaml_path, split='val', imgsz=imgsz, device=device, plots=False, verbose=False)
+    lat = latency_utils.cpu_latency_ms(weights, imgsz=imgsz, runs=latency_runs, backend='onnx')
+    return {'weights': weights, 'mAP50': float(metrics.box.map50), 'mAP50-95': float(metrics.box.map),
+            'params': latency_utils.count_params(weights), 'cpu_latency_ms': lat['mean_ms'],
+            'latency_backend': lat['backend']}
+
+
+def prune_to_budget(weights, yaml_path, budget_ms, map_floor=None, min_map_ratio=0.97, ratio=0.1,
+                    max_iters=10, latency_runs=30, train_kw=None):
+    """
+    prune + fine-tune ทีละรอบจน latency (ONNX บน CPU) <= budget_ms หรือ mAP50-95 ต่ำกว่า floor
+    คืนค่า (weights สุดท้าย, history, save_dir ของรอบ fine-tune ล่าสุดที่ผ่าน)
+    """
+    train_kw = dict(finetune_args, **(train_kw or {}))
+    imgsz, device = train_kw['imgsz'], train_kw['device']
+    base = measure(weights, yaml_path, imgsz, device, latency_runs)
+    base.update(iter=0, removed=0, status='baseline')
+    floor = map_floor if map_floor is not None else base['mAP50-95'] * min_map_ratio
+    print(f" baseline: {base['cpu_latency_ms']:.1f} ms, {base['params'] / 1e6:.2f}M params, "
+          f"mAP50-95={base['mAP50-95']:.4f} (floor {floor:.4f}, budget {budget_ms} ms)")
+    history = [base]
+    current, save_dir = weights, None
+
+    for it in range(1, max_iters + 1):
+        if history[-1]['cpu_latency_ms'] <= budget_ms:
+            print(f" ✓ latency อยู่ใน budget แล้ว ({history[-1]['cpu_latency_ms']:.1f} ms)")
+            break
+        yolo = YOLO(current)
+        removed = prune_step(yolo.model, ratio)
+        if removed == 0:
+            print(" ไม่มี channel ให้ prune เพิ่มแล้ว")
+            break
+        print(f"--- Iteration {it}: ตัด {removed} channels, params={count_params(yolo.model) / 1e6:.2f}M -> fine-tune ---")
+        results = yolo.train(data=yaml_path, trainer=PrunedTrainer, name=f'prune_iter{it}', exist_ok=True, **train_kw)
+        best = os.path.join(str(results.save_dir), 'weights', 'best.pt')
+        row = measure(best, yaml_path, imgsz, device, latency_runs)
+        row.update(iter=it, removed=removed)
+        if row['mAP50-95'] < floor:
+            row['status'] = 'below_floor'
+            history.append(row)
+            print(f" ✗ mAP50-95 {row['mAP50-95']:.4f} ต่ำกว่า floor {floor:.4f} ใช้ผลของรอบก่อนหน้า")
+            break
+        row['status'] = 'accepted'
+        history.append(row)
+        current, save_dir = best, str(results.save_dir)
+        print(f" iter {it}: {row['cpu_latency_ms']:.1f} ms, {row['params'] / 1e6:.2f}M params, mAP50-95={row['mAP50-95']:.4f}")
+    return current, history, save_dir
+
+
+def history_lines(history, budget_ms):
+    lines = [f"{'Iter':<5} {'Removed':>8} {'Params(M)':>10} {'CPU ms':>8} {'mAP50':>7} {'mAP50-95':>9}  Status"]
+    for r in history:
+        lines.append(f"{r['iter']:<5} {r['removed']:>8} {r['params'] / 1e6:>10.2f} {r['cpu_latency_ms']:>8.1f} "
+                     f"{r['mAP50']:>7.4f} {r['mAP50-95']:>9.4f}  {r['status']}")
+    final = [r for r in history if r['status'] != 'below_floor'][-1]
+    met = 'met' if final['cpu_latency_ms'] <= budget_ms else 'NOT met'
+    lines.append(f"Budget {budget_ms} ms: {met} (final {final['cpu_latency_ms']:.1f} ms, backend {final['latency_backend']})")
+    return lines
+
+
+if __name__ == '__main__':
+    sys.stdout.reconfigure(encoding='utf-8')
+    parser = argparse.ArgumentParser(description="Structured channel pruning + fine-tune to a CPU latency budget")
+    parser.add_argument("--weights", default=best_weights)
+    parser.add_argument("--data", default=os.path.join(dataset_root, 'data.yaml'))
+    parser.add_argument("--budget-ms", type=float, required=True, help="latency เป้าหมายต่อรูปบน CPU (ONNX)")
+    parser.add_argument("--map-floor", type=float, default=None, help="mAP50-95 ขั้นต่ำ (ค่าจริง)")
+    parser.add_argument("--min-map-ratio", type=float, default=0.97, help="ถ้าไม่ระบุ --map-floor ใช้สัดส่วนของ baseline")
+    parser.add_argument("--ratio", type=float, default=0.1, help="สัดส่วน channel ที่ตัดต่อรอบ")
+    parser.add_argument("--max-iters", type=int, default=10)
+    parser.add_argument("--epochs", type=int, default=finetune_args['epochs'], help="epoch ของ fine-tune ต่อรอบ")
+    parser.add_argument("--device", default=finetune_args['device'])
+    args = parser.parse_args()
+
+    if not os.path.exists(args.data):
+        print(f"Error: ไม่พบไฟล์ data.yaml ที่ {args.data}")
+        exit()
+
+    final, history, save_dir = prune_to_budget(
+        args.weights, args.data, args.budget_ms, args.map_floor, args.min_map_ratio, args.ratio, args.max_iters,
+        train_kw={'epochs': args.epochs, 'device': args.device})
+    lines = history_lines(history, args.budget_ms)
+    print("\n".join(lines))
+
+    onnx_path = latency_utils.export_onnx(final, finetune_args['imgsz'])
+    print(f" Final model: {final}\n ONNX: {onnx_path}")
+
+    try:
+        log_dir = report_utils.create_log_directory()
+        summary = report_utils.save_results(save_dir, log_dir, final) if save_dir else {}
+        with open(os.path.join(log_dir, 'metrics', 'prune_history.json'), 'w') as f:
+            json.dump(history, f, indent=4)
+        config = {'Source': args.weights, 'Budget (ms)': args.budget_ms, 'Prune ratio / iter': args.ratio,
+                  'Fine-tune epochs': args.epochs, 'Device': args.device, 'ONNX': onnx_path}
+        report_utils.generate_text_report(log_dir, config, summary, extra_sections={'Pruning iterations': lines})
+        print(f"Report generated at: {log_dir}")
+    except Exception as e:
+        print(f" Report generation failed (ข้ามได้): {e}")
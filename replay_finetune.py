@@ -0,0 +1,117 @@
+import os
+import random
+from collections import defaultdict
+
+import ingest_journal
+import manifest_utils
+
+TRAINED_NAME = 'trained_batches.txt'  # batch ใน journal ที่ fine-tune ไปแล้ว (อยู่ใน <dataset>/incremental/)
+WEIGHTS_NAME = 'last_weights.txt'     # path ของ best.pt จากรอบ incremental ล่าสุด (อยู่ข้าง trained_batches.txt)
+
+
+def read_label_classes(label_path):
+    if not os.path.exists(label_path):
+        return set()
+    with open(label_path, 'r') as f:
+        return {int(line.split()[0]) for line in f if line.strip()}
+
+
+def sample_replay(base_path, candidates, replay_size, seed=0):
+    """
+    สุ่มรูปเก่าแบบสมดุลคลาส: วนเลือกทีละคลาส (round-robin) จนครบ replay_size
+    รูปที่ไม่มี object จัดอยู่ในกลุ่ม -1
+    """
+    if replay_size <= 0 or not candidates:
+        return []
+    if replay_size >= len(candidates):
+        return list(candidates)
+
+    rng = random.Random(seed)
+    by_class = defaultdict(list)
+    lbl_dir = os.path.join(base_path, 'labels', 'train')
+    for name in candidates:
+        classes = read_label_classes(os.path.join(lbl_dir, os.path.splitext(name)[0] + '.txt')) or {-1}
+        for c in classes:
+            by_class[c].append(name)
+    for names in by_class.values():
+        rng.shuffle(names)
+
+    chosen, seen = [], set()
+    pools = [by_class[c] for c in sorted(by_class)]
+    while len(chosen) < replay_size and any(pools):
+        for pool in pools:
+            while pool and pool[-1] in seen:
+                pool.pop()
+            if pool:
+                name = pool.pop()
+                seen.add(name)
+                chosen.append(name)
+                if len(chosen) >= replay_size:
+                    break
+    return chosen
+
+
+def trained_batches_path(base_path):
+    return os.path.join(base_path, 'incremental', TRAINED_NAME)
+
+
+def load_trained_batches(base_path):
+    path = trained_batches_path(base_path)
+    if not os.path.exists(path):
+        return set()
+    with open(path, 'r', encoding='utf-8') as f:
+        return {line.strip() for line in f if line.strip()}
+
+
+def last_weights(base_path):
+    # best.pt ของรอบ incremental ล่าสุด ; None = ยังไม่เคย fine-tune หรือไฟล์ถูกลบไปแล้ว (ให้เริ่มจาก base weights)
+    path = os.path.join(base_path, 'incremental', WEIGHTS_NAME)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        weights = f.read().strip()
+    return weights if weights and os.path.exists(weights) else None
+
+
+def mark_trained(base_path, batches, weights=None):
+    # เรียกหลังเทรนสำเร็จเท่านั้น ถ้าเทรนล้มเหลว batch เหล่านี้ยังถือเป็นข้อมูลใหม่ในรอบถัดไป
+    # weights = best.pt ของรอบนี้ รอบถัดไปจะ fine-tune ต่อจากไฟล์นี้
+    path = trained_batches_path(base_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if weights:
+        tmp = os.path.join(os.path.dirname(path), WEIGHTS_NAME + '.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(os.path.abspath(weights) + '\n')
+        os.replace(tmp, os.path.join(os.path.dirname(path), WEIGHTS_NAME))
+    with open(path, 'a', encoding='utf-8') as f:
+        f.writelines(f'{b}\n' for b in batches)
+
+
+def pending_batches(base_path, n_batches=None):
+    # batch ใน journal ที่ยังไม่เคย fine-tune (ไม่นับ 'seed') ; n_batches = เอาเฉพาะ n ชุดล่าสุด
+    trained = load_trained_batches(base_path)
+    batches = sorted({b for _, b in ingest_journal.load_journal(base_path).values() if b != 'seed' and b not in trained})
+    return batches[-n_batches:] if n_batches else batches
+
+
+def build_incremental_dataset(base_path, yaml_path, n_batches=None, replay_size=500, seed=0):
+    """
+    สร้าง data_incremental.yaml: train = รูปใหม่จาก journal batch ที่ยังไม่เคย fine-tune + replay sample ของรูปเก่า
+    val = val split เดิมทั้งหมด เพื่อจับ regression กับข้อมูลเก่า
+    เทรนเสร็จแล้วต้องเรียก mark_trained(base_path, info['batches'], best.pt) รอบถัดไปจึงจะไม่เทรน batch เดิมซ้ำ
+    และเริ่มจาก best.pt ของรอบนี้ (last_weights)
+    """
+    batches = pending_batches(base_path, n_batches)
+    new_train = ingest_journal.batch_images(base_path, batches, split='train')
+    new_set = set(new_train)
+    old_train = [n for n in ingest_journal.split_images(base_path, 'train') if n not in new_set]
+    replay = sample_replay(base_path, old_train, replay_size, seed)
+
+    img_dir = os.path.join(base_path, 'images', 'train')
+    out_dir = os.path.join(base_path, 'incremental')
+    train_txt = manifest_utils.write_image_list([os.path.join(img_dir, n) for n in new_train + replay],
+                                                os.path.join(out_dir, 'train.txt'))
+    out_yaml = manifest_utils.write_data_yaml(yaml_path, os.path.join(out_dir, 'data_incremental.yaml'),
+                                              train=train_txt)
+    print(f" Incremental dataset: new={len(new_train)} (batches {batches}), replay={len(replay)} / {len(old_train)} old")
+    return out_yaml, {'new': len(new_train), 'replay': len(replay), 'batches': batches}
@@ -4,6 +4,23 @@ import shutil
 import pandas as pd
 from datetime import datetime
 
+import checkpoint_store
+
+# โฟลเดอร์ checkpoint store (checkpoint_store.py) ถ้าตั้งค่า best.pt ใน training_logs จะเป็น hardlink ไปยัง blob
+# (index ด้วย sha256) ; None = hardlink ไปยัง best.pt ใน runs/ โดยตรง (ไม่สร้าง store)
+# ทั้งสองแบบ copy เฉพาะเมื่อ hardlink ไม่ได้ (คนละไดรฟ์ / filesystem ไม่รองรับ)
+CHECKPOINT_STORE = None
+
+
+def link_or_copy(src, dest):
+    # report ถูกสร้างหลังเทรนจบ best.pt จะไม่ถูกเขียนทับอีก จึง hardlink ได้โดยไม่เสียพื้นที่เพิ่ม
+    if os.path.exists(dest):
+        os.remove(dest)
+    try:
+        os.link(src, dest)
+    except OSError:
+        shutil.copy2(src, dest)
+
 def create_log_directory(base_path='training_logs'):
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
     log_dir = os.path.join(base_path, f'training_{timestamp}')
@@ -27,7 +44,16 @@ def save_results(source_run_dir, log_dir, model_path):
             shutil.copy2(src, os.path.join(log_dir, 'plots', file))
 
     if os.path.exists(model_path):
-        shutil.copy2(model_path, os.path.join(log_dir, 'models', 'best.pt'))
+        dest = os.path.join(log_dir, 'models', 'best.pt')
+        if CHECKPOINT_STORE:
+            checkpoint_store.link_checkpoint(model_path, dest, run=source_run_dir, root=CHECKPOINT_STORE)
+        else:
+            link_or_copy(model_path, dest)
+
+    # trace จาก --profile (profiling_utils) อยู่ที่ <run>/profile
+    profile_src = os.path.join(source_run_dir, 'profile')
+    if os.path.isdir(profile_src):
+        shutil.copytree(profile_src, os.path.join(log_dir, 'profile'), dirs_exist_ok=True)
 
     results_csv = os.path.join(source_run_dir, 'results.csv')
     summary_data = {}
@@ -56,7 +82,7 @@ def save_results(source_run_dir, log_dir, model_path):
             
     return summary_data
 
-def generate_text_report(log_dir, config, summary_data):
+def generate_text_report(log_dir, config, summary_data, extra_sections=None):
     report_path = os.path.join(log_dir, 'TRAINING_REPORT.txt')
     
     with open(report_path, 'w', encoding='utf-8') as f:
@@ -81,6 +107,25 @@ def generate_text_report(log_dir, config, summary_data):
             f.write(f"Final Loss  : {summary_data.get('train_box_loss'):.4f}\n")
         else:
             f.write("No metrics data found.\n")
+
+        section = 3
+        profile_summary = os.path.join(log_dir, 'profile', 'top_ops.txt')
+        if os.path.exists(profile_summary):
+            f.write(f"\n{section}. PROFILE\n")
+            section += 1
+            f.write("-" * 30 + "\n")
+            f.write(f"Top operators : {os.path.relpath(profile_summary, log_dir)}\n")
+            for line in open(profile_summary, 'r', encoding='utf-8').readlines()[:3]:
+                f.write(line)
+            f.write("Trace files   : profile/trace_*.json (chrome://tracing)\n")
+
+        # ส่วนเพิ่มเติมจากสคริปต์อื่น (เช่น distillation / pruning): {หัวข้อ: [บรรทัด, ...]}
+        for title, lines in (extra_sections or {}).items():
+            f.write(f"\n{section}. {title.upper()}\n")
+            f.write("-" * 30 + "\n")
+            for line in lines:
+                f.write(f"{line}\n")
+            section += 1
             
         f.write("\n" + "="*50 + "\n")
         f.write(f"Report Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
\ No newline at end of file
@@ -0,0 +1,266 @@
+from __future__ import annotations
+
+import os
+import sys
+import json
+import shutil
+import zipfile
+import argparse
+import threading
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import yaml
+
+import dataset_rules
+import ingest_journal
+import stream_ingest
+
+
+def scan_zip(zf: zipfile.ZipFile) -> Tuple[Dict[str, List[zipfile.ZipInfo]], Dict[str, List[zipfile.ZipInfo]]]:
+    """
+    อ่านแค่ central directory ของ zip (ไม่แตกไฟล์) จัดกลุ่ม member ตามชื่อมาตรฐาน
+    export ของ Roboflow มีโครงสร้าง <split>/images/*.jpg และ <split>/labels/*.txt (split ของ Roboflow ไม่ถูกใช้)
+    """
+    images: Dict[str, List[zipfile.ZipInfo]] = defaultdict(list)
+    labels: Dict[str, List[zipfile.ZipInfo]] = defaultdict(list)
+    for info in zf.infolist():
+        if info.is_dir():
+            continue
+        parent, name = os.path.split(info.filename.rstrip('/'))
+        kind = os.path.basename(parent).lower()
+        ext = os.path.splitext(name)[1].lower()
+        if kind == 'images' and ext in dataset_rules.IMG_EXTS:
+            images[dataset_rules.normalize_stem(name)].append(info)
+        elif kind == 'labels' and ext in dataset_rules.LABEL_EXTS:
+            labels[dataset_rules.normalize_stem(name)].append(info)
+    return images, labels
+
+
+def _base(info: zipfile.ZipInfo) -> str:
+    return os.path.basename(info.filename)
+
+
+def _pick_label(infos: List[zipfile.ZipInfo], img: zipfile.ZipInfo, stem: str) -> zipfile.ZipInfo:
+    # จับคู่ด้วยชื่อเดิมของรูปก่อน (augment ของ Roboflow) แล้วเลือก .txt ก่อน label ที่เป็นรูป
+    by_name = {_base(i): i for i in infos}
+    return by_name[stream_ingest._pick_label(list(by_name), stem, _base(img))]
+
+
+def mapping_from_zip(zf: zipfile.ZipFile) -> Tuple[Optional[dict], List[str]]:
+    """
+    สร้าง mapping Old_ID -> New_ID จาก names ใน data.yaml ของ export เทียบกับ CLASS_NAMES (ไม่สนตัวพิมพ์เล็ก/ใหญ่)
+    คืนค่า (mapping หรือ None ถ้าไม่มี data.yaml, ชื่อ class ที่จับคู่ไม่ได้)
+    """
+    yaml_members = [n for n in zf.namelist() if os.path.basename(n) == 'data.yaml']
+    if not yaml_members:
+        return None, []
+    data = yaml.safe_load(zf.read(min(yaml_members, key=len))) or {}
+    names = data.get('names') or []
+    if isinstance(names, dict):
+        names = [names[k] for k in sorted(names)]
+    master = {v.lower(): k for k, v in dataset_rules.CLASS_NAMES.items()}
+    mapping, unknown = {}, []
+    for old_id, name in enumerate(names):
+        new_id = master.get(str(name).strip().lower())
+        if new_id is None:
+            unknown.append(f"{old_id}: {name}")
+        else:
+            mapping[old_id] = new_id
+    return mapping, unknown
+
+
+def plan_zip(zf: zipfile.ZipFile, mapping: Optional[dict], taken: set,
+             keep_non_hourly: bool = False) -> Tuple[list, dict]:
+    """
+    เหมือน stream_ingest.plan_source แต่อ่านจาก zip: label ถูกอ่านเข้าหน่วยความจำ remap + ตรวจ ก่อนเขียน
+    คืนค่า (รายการ (ZipInfo รูป, ชื่อรูปใหม่, split, ZipInfo label, ข้อความ label หรือ None), summary)
+    """
+    images, labels = scan_zip(zf)
+    s = {'images': sum(map(len, images.values())), 'labels': sum(map(len, labels.values())),
+         'renamed': 0, 'duplicates': 0, 'non_hourly': 0, 'already_ingested': 0, 'invalid_label': 0,
+         'unlabeled': 0, 'orphan_labels': 0, 'remapped_lines': 0, 'ingested': 0,
+         'splits': {sp: 0 for sp in ingest_journal.SPLITS}, 'classes': Counter(), 'problems': [],
+         'zip_bytes': 0, 'image_bytes': 0}
+    s['orphan_labels'] = sum(len(v) for k, v in labels.items() if k not in images)
+
+    items = []
+    for stem in sorted(images):
+        infos = {_base(i): i for i in images[stem]}
+        img = infos[stream_ingest._pick(list(infos), stem)]
+        s['duplicates'] += len(images[stem]) - 1
+        name = stem + os.path.splitext(_base(img))[1].lower()
+        if not keep_non_hourly and dataset_rules.is_non_hourly(stem):
+            s['non_hourly'] += 1
+            continue
+        if name in taken:
+            s['already_ingested'] += 1
+            continue
+
+        lbl, text = None, None
+        if stem in labels:
+            lbl = _pick_label(labels[stem], img, stem)
+            try:
+                raw = zf.read(lbl).decode('utf-8')
+            except UnicodeDecodeError:
+                s['invalid_label'] += 1
+                s['problems'].append(f"{_base(lbl)}: อ่านไฟล์ไม่ได้")
+                continue
+            text, changed, problems = dataset_rules.remap_label_text(raw, mapping)
+            if problems:
+                s['invalid_label'] += 1
+                s['problems'] += [f"{_base(lbl)} {p}" for p in problems]
+                continue
+            s['remapped_lines'] += changed
+            s['classes'].update(int(line.split()[0]) for line in text.splitlines())
+        else:
+            s['unlabeled'] += 1
+
+        if name != _base(img):
+            s['renamed'] += 1
+        split = ingest_journal.assign_split(name)
+        taken.add(name)
+        s['splits'][split] += 1
+        s['ingested'] += 1
+        s['zip_bytes'] += img.compress_size
+        s['image_bytes'] += img.file_size
+        items.append((img, name, split, lbl, text))
+    return items, s
+
+
+def write_member(zip_path: str, info: zipfile.ZipInfo, dst: str, local: threading.local, handles: list) -> int:
+    # stream member -> ไฟล์ชั่วคราวข้างปลายทาง -> os.replace (ไม่มีไฟล์ที่เขียนไม่ครบค้างถ้าถูก interrupt)
+    # แต่ละ thread เปิด ZipFile ของตัวเอง zlib คลายไฟล์นอก GIL จึงขนานได้จริง
+    zf = getattr(local, 'zf', None)
+    if zf is None:
+        zf = local.zf = zipfile.ZipFile(zip_path)
+        handles.append(zf)
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    with zf.open(info) as src, open(dst + '.tmp', 'wb') as out:
+        shutil.copyfileobj(src, out, 1024 * 1024)
+    os.replace(dst + '.tmp', dst)
+    return info.file_size
+
+
+def ingest_zips(base_path: str, sources: List[Tuple[str, str, Optional[dict]]], keep_non_hourly: bool = False,
+                dry_run: bool = True, batch_id: Optional[str] = None, workers: int = 8) -> Dict[str, dict]:
+    """
+    ingest export .zip หลายไฟล์เข้า base_path/{images,labels}/{train,val,test} โดยไม่แตก zip ลงดิสก์
+    sources = [(ชื่อแหล่ง, path .zip, mapping หรือ None = ใช้ names ใน data.yaml ของ zip)]
+    รูปถูกเขียนครั้งเดียวที่ตำแหน่งสุดท้าย แล้วจึงบันทึก journal (รันซ้ำหลัง interrupt จะเขียนรูปที่ค้างทับได้ปลอดภัย)
+    คืนค่า {ชื่อแหล่ง: summary}
+    """
+    journal = ingest_journal.load_journal(base_path)
+    taken = set(journal)
+    batch_id = batch_id or datetime.now().strftime('%Y%m%d_%H%M%S')
+    summaries = {}
+
+    for src_name, zip_path, mapping in sources:
+        with zipfile.ZipFile(zip_path) as zf:
+            if mapping is None:
+                mapping, unknown = mapping_from_zip(zf)
+                if unknown:
+                    summaries[src_name] = {'error': f"class ใน data.yaml ไม่อยู่ในตารางมาตรฐาน: {', '.join(unknown)} "
+                                                    f"(ระบุด้วย --mapping)"}
+                    continue
+            items, summary = plan_zip(zf, mapping, taken, keep_non_hourly)
+        summary['mapping'] = {str(k): v for k, v in (mapping or {}).items()}
+        summaries[src_name] = summary
+        if dry_run or not items:
+            continue
+
+        local, handles = threading.local(), []
+        failed = 0
+        with ThreadPoolExecutor(workers) as pool, \
+                open(ingest_journal.journal_path(base_path), 'a', encoding='utf-8') as jf:
+            futures = {pool.submit(write_member, zip_path, img, os.path.join(base_path, 'images', split, name),
+                                   local, handles):
+                       (name, split, text) for img, name, split, _, text in items}
+            for fut in as_completed(futures):
+                name, split, text = futures[fut]
+                try:
+                    fut.result()
+                except (OSError, zipfile.BadZipFile) as e:
+                    failed += 1
+                    summary['problems'].append(f"{name}: เขียนรูปไม่สำเร็จ ({e})")
+                    continue
+                if text is not None:
+                    txt = os.path.splitext(name)[0] + '.txt'
+                    stream_ingest.write_label(os.path.join(base_path, 'labels', split, txt), text)
+                jf.write(f'{name}\t{split}\t{batch_id}\n')
+        for zf in handles:
+            zf.close()
+        if failed:
+            summary['ingested'] -= failed
+            print(f" ⚠️  {src_name}: เขียนรูปไม่สำเร็จ {failed} ไฟล์ (รันคำสั่งเดิมซ้ำเพื่อทำต่อ)")
+    return summaries
+
+
+def print_io(s: dict) -> None:
+    # เทียบกับวิธีเดิม: unzip (เขียนทั้งไฟล์) -> อ่านกลับมา -> copy ไป dataset (เขียนอีกรอบ)
+    mb = 1024 ** 2
+    direct = s['zip_bytes'] + s['image_bytes']
+    unzip = s['zip_bytes'] + 3 * s['image_bytes']
+    print(f"   - disk I/O รูป (อ่าน zip + เขียน): {direct / mb:.1f} MB "
+          f"(unzip แล้ว copy: ~{unzip / mb:.1f} MB, ลดลง {1 - direct / unzip if unzip else 0:.0%})")
+
+
+def parse_zip(arg: str, mappings: dict) -> Tuple[str, str, Optional[dict]]:
+    # รูปแบบ: path.zip หรือ name=path.zip ชื่อแหล่งใช้เลือก mapping (ไม่มี = ใช้ names ใน data.yaml ของ zip)
+    name, _, path = arg.rpartition('=')
+    name = name or os.path.splitext(os.path.basename(path))[0]
+    return name, path, mappings.get(name)
+
+
+def main() -> None:
+    sys.stdout.reconfigure(encoding='utf-8')
+    parser = argparse.ArgumentParser(description="Ingest Roboflow YOLO export .zip files directly (no extraction)")
+    parser.add_argument("zips", nargs='+', help="ไฟล์ export .zip หรือ name=path.zip")
+    parser.add_argument("--dataset", default=r'D:\model_cuu\dataset', help="dataset ปลายทาง")
+    parser.add_argument("--mapping", default=None, help='JSON {"ชื่อแหล่ง": {"old_id": new_id}} เพิ่ม/แทน SOURCE_MAPPINGS')
+    parser.add_argument("--keep-non-hourly", action='store_true', help="ไม่ตัดรูปที่ถ่ายนาทีที่ 20 / 40")
+    parser.add_argument("--batch", default=None, help="ชื่อ batch ใน journal (ค่าเริ่มต้น = เวลาปัจจุบัน)")
+    parser.add_argument("--workers", type=int, default=8, help="จำนวน thread สำหรับเขียนรูปจาก zip")
+    parser.add_argument("--report", default=None, help="บันทึก summary เป็น JSON")
+    parser.add_argument("--yes", action='store_true', help="ยืนยันทำจริง (ถ้าไม่ใส่จะเป็นแค่ Preview)")
+    args = parser.parse_args()
+
+    mappings = dict(dataset_rules.SOURCE_MAPPINGS)
+    if args.mapping:
+        with open(args.mapping, 'r', encoding='utf-8') as f:
+            mappings.update({k: {int(o): int(n) for o, n in v.items()} for k, v in json.load(f).items()})
+
+    sources = [parse_zip(a, mappings) for a in args.zips]
+    for name, path, _ in sources:
+        if not zipfile.is_zipfile(path):
+            print(f"Error: ไม่ใช่ไฟล์ zip หรือไม่พบไฟล์: {path}")
+            return
+
+    is_dry_run = not args.yes
+    if is_dry_run:
+        print("\n!!! นี่คือโหมดทดสอบ (Dry Run) - ยังไม่มีการแก้ไขไฟล์จริง !!!")
+        print("ให้เติม --yes ต่อท้ายคำสั่งเพื่อรันจริง\n")
+
+    summaries = ingest_zips(args.dataset, sources, args.keep_non_hourly, is_dry_run, args.batch, args.workers)
+    print("=" * 60)
+    for name, s in summaries.items():
+        if 'error' in s:
+            print(f"📂 {name}\n   ❌ {s['error']}")
+        else:
+            mapping = ', '.join(f"{o}->{n}" for o, n in s['mapping'].items()) or 'ไม่มี mapping'
+            stream_ingest.print_summary(f"{name} ({mapping})", s)
+            print_io(s)
+        print("-" * 60)
+    total = sum(s.get('ingested', 0) for s in summaries.values())
+    print(f"✓ {'จะรับเข้า' if is_dry_run else 'รับเข้า'} {total} รูป -> {args.dataset}")
+
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(summaries, f, ensure_ascii=False, indent=2)
+        print(f" Report saved: {args.report}")
+
+
+if __name__ == '__main__':
+    main()
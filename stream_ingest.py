@@ -0,0 +1,283 @@
+from __future__ import annotations
+
+import os
+import sys
+import json
+import argparse
+from collections import Counter, defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import dataset_rules
+import file_ops
+import ingest_journal
+
+# แผนของ ingest ที่ยังทำไม่เสร็จ {ปลายทางรูป: ชื่อ, split, label} เขียนก่อนเริ่ม copy/move คู่กับ op log
+# รอบถัดไปจึงเขียน label / journal ของรูปที่ย้ายไปแล้ว (ต้นทางหายไปแล้ว) ต่อได้
+PLAN_LOG = os.path.join('.file_ops', 'stream_plan.jsonl')
+
+
+def scan_source(src_img: str, src_lbl: str) -> Tuple[Dict[str, List[str]], Dict[str, List[str]]]:
+    """
+    scandir โฟลเดอร์ images และ labels อย่างละครั้ง จัดกลุ่มตามชื่อมาตรฐาน
+    คืนค่า ({stem: [ชื่อรูป...]}, {stem: [ชื่อ label...]})
+    """
+    images: Dict[str, List[str]] = defaultdict(list)
+    labels: Dict[str, List[str]] = defaultdict(list)
+    for folder, exts, index in ((src_img, dataset_rules.IMG_EXTS, images), (src_lbl, dataset_rules.LABEL_EXTS, labels)):
+        if not os.path.isdir(folder):
+            continue
+        for e in os.scandir(folder):
+            if e.is_file() and os.path.splitext(e.name)[1].lower() in exts:
+                index[dataset_rules.normalize_stem(e.name)].append(e.name)
+    return images, labels
+
+
+def _pick(names: List[str], stem: str) -> str:
+    # ถ้ามีไฟล์ที่ชื่อถูกต้องอยู่แล้วใช้ไฟล์นั้น ที่เหลือถือเป็นตัวซ้ำ (เหมือน clean_long_duplicate_files)
+    clean = [n for n in names if os.path.splitext(n)[0] == stem]
+    return sorted(clean or names)[0]
+
+
+def _pick_label(names: List[str], stem: str, img: Optional[str] = None) -> str:
+    # รูป augment ของ Roboflow (x.rf.<hash1>, x.rf.<hash2>) ได้ชื่อมาตรฐานเดียวกัน จึงจับคู่ label ที่ชื่อเดิมตรงกับรูปก่อน
+    if img is not None:
+        img_stem = os.path.splitext(img)[0]
+        names = [n for n in names if os.path.splitext(n)[0] == img_stem] or names
+    # label ที่เป็นรูป (LABEL_EXTS) ใช้เฉพาะเมื่อไม่มี .txt ของชื่อเดียวกันเลย
+    txt = [n for n in names if os.path.splitext(n)[1].lower() == '.txt']
+    return _pick(txt or names, stem)
+
+
+def _read_text(path: str) -> Optional[str]:
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return f.read()
+    except (UnicodeDecodeError, OSError):
+        return None
+
+
+def plan_source(src_img: str, src_lbl: str, mapping: Optional[dict], taken: set,
+                keep_non_hourly: bool = False) -> Tuple[list, dict]:
+    """
+    อ่านแหล่งข้อมูล 1 แหล่งครั้งเดียว: แก้ชื่อ, remap class, ตรวจ label และกำหนด split ในหน่วยความจำ
+    taken = ชื่อรูปที่มีอยู่แล้วใน dataset ปลายทาง (journal + แหล่งก่อนหน้า) จะถูกเพิ่มชื่อที่รับเข้า
+    คืนค่า (รายการ (path รูป, ชื่อรูปใหม่, split, path label, ข้อความ label หรือ None), summary)
+    """
+    images, labels = scan_source(src_img, src_lbl)
+    s = {'images': sum(map(len, images.values())), 'labels': sum(map(len, labels.values())),
+         'renamed': 0, 'duplicates': 0, 'non_hourly': 0, 'already_ingested': 0, 'invalid_label': 0,
+         'unlabeled': 0, 'orphan_labels': 0, 'remapped_lines': 0, 'ingested': 0,
+         'splits': {sp: 0 for sp in ingest_journal.SPLITS}, 'classes': Counter(), 'problems': []}
+    s['orphan_labels'] = sum(len(v) for k, v in labels.items() if k not in images)
+
+    items = []
+    for stem in sorted(images):
+        names = images[stem]
+        img = _pick(names, stem)
+        s['duplicates'] += len(names) - 1
+        name = stem + os.path.splitext(img)[1].lower()
+        if not keep_non_hourly and dataset_rules.is_non_hourly(stem):
+            s['non_hourly'] += 1
+            continue
+        if name in taken:
+            s['already_ingested'] += 1
+            continue
+
+        lbl_path, text = None, None
+        if stem in labels:
+            lbl_names = labels[stem]
+            s['duplicates'] += len(lbl_names) - 1
+            lbl_path = os.path.join(src_lbl, _pick_label(lbl_names, stem, img))
+            raw = _read_text(lbl_path)
+            if raw is None:
+                s['invalid_label'] += 1
+                s['problems'].append(f"{os.path.basename(lbl_path)}: อ่านไฟล์ไม่ได้")
+                continue
+            text, changed, problems = dataset_rules.remap_label_text(raw, mapping)
+            if problems:
+                s['invalid_label'] += 1
+                s['problems'] += [f"{os.path.basename(lbl_path)} {p}" for p in problems]
+                continue
+            s['remapped_lines'] += changed
+            s['classes'].update(int(line.split()[0]) for line in text.splitlines())
+        else:
+            s['unlabeled'] += 1
+
+        if name != img:
+            s['renamed'] += 1
+        split = ingest_journal.assign_split(name)
+        taken.add(name)
+        s['splits'][split] += 1
+        s['ingested'] += 1
+        items.append((os.path.join(src_img, img), name, split, lbl_path, text))
+    return items, s
+
+
+def write_label(path: str, text: str) -> bool:
+    # เขียนผ่านไฟล์ชั่วคราวแล้ว os.replace ถ้าถูก interrupt จะไม่มี label ที่เขียนไม่ครบค้างอยู่
+    if os.path.exists(path):
+        return False
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(path + '.tmp', path)
+    return True
+
+
+def _load_plan(path: str) -> Dict[str, dict]:
+    plan = {}
+    if not os.path.exists(path):
+        return plan
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                continue
+            plan[rec['dst']] = rec
+    return plan
+
+
+def _save_plan(path: str, plan: Dict[str, dict]) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        for rec in plan.values():
+            f.write(json.dumps(rec, ensure_ascii=False) + '\n')
+    os.replace(path + '.tmp', path)
+
+
+def ingest_sources(base_path: str, sources: List[Tuple[str, str, str, Optional[dict]]], move_files: bool = False,
+                   keep_non_hourly: bool = False, dry_run: bool = True, batch_id: Optional[str] = None,
+                   workers: int = 8) -> Dict[str, dict]:
+    """
+    ingest หลายแหล่งเข้า base_path/{images,labels}/{train,val,test} ในรอบเดียว
+    sources = [(ชื่อแหล่ง, โฟลเดอร์ images, โฟลเดอร์ labels, mapping)]
+    label ถูก remap ในหน่วยความจำ ลำดับต่อรูปเหมือน roboflow_zip_ingest.ingest_zips:
+    copy/move รูป (file_ops) -> เขียน label -> บันทึก journal -> ลบ label ต้นทาง (เฉพาะ --move)
+    แผน (PLAN_LOG) และ op log ถูกบันทึกก่อนเริ่ม ถ้าถูก interrupt รันคำสั่งเดิมซ้ำจะทำต่อจนครบ
+    คืนค่า {ชื่อแหล่ง: summary}
+    """
+    journal = ingest_journal.load_journal(base_path)
+    taken = set(journal)
+    batch_id = batch_id or datetime.now().strftime('%Y%m%d_%H%M%S')
+    action = 'move' if move_files else 'copy'
+    plan_path = os.path.join(base_path, PLAN_LOG)
+    plan = {} if dry_run else _load_plan(plan_path)
+    summaries, ops = {}, []
+
+    for src_name, src_img, src_lbl, mapping in sources:
+        items, summary = plan_source(src_img, src_lbl, mapping, taken, keep_non_hourly)
+        summaries[src_name] = summary
+        if dry_run:
+            continue
+        for img_path, name, split, lbl_path, text in items:
+            dst = os.path.join(base_path, 'images', split, name)
+            if dst in plan:
+                continue  # ค้างจากรอบก่อน (รูปอาจถูกย้ายไปแล้ว) ใช้แผนเดิมที่ตรงกับรูปนั้น งานจะถูกทำต่อจาก op log
+            plan[dst] = {'dst': dst, 'name': name, 'split': split, 'text': text,
+                         'label_src': lbl_path if move_files and text is not None else None}
+            ops.append((action, img_path, dst))
+
+    if dry_run:
+        return summaries
+    if plan:
+        _save_plan(plan_path, plan)
+    with open(ingest_journal.journal_path(base_path), 'a', encoding='utf-8') as jf:
+        def on_done(op):
+            rec = plan.get(op[2])
+            if rec is None:
+                return
+            if rec['text'] is not None:
+                txt = os.path.splitext(rec['name'])[0] + '.txt'
+                write_label(os.path.join(base_path, 'labels', rec['split'], txt), rec['text'])
+            if rec['name'] not in journal:
+                jf.write(f"{rec['name']}\t{rec['split']}\t{batch_id}\n")
+                jf.flush()
+                journal[rec['name']] = (rec['split'], batch_id)
+            if rec['label_src'] and os.path.exists(rec['label_src']):
+                os.remove(rec['label_src'])
+
+        stats = file_ops.run_ops(ops, workers=workers, log_path=os.path.join(base_path, ingest_journal.OPS_LOG),
+                                 on_done=on_done)
+    if stats['failed']:
+        print(f" ⚠️  copy/move รูปไม่สำเร็จ {stats['failed']} ไฟล์ (รันคำสั่งเดิมซ้ำเพื่อทำต่อ)")
+    elif os.path.exists(plan_path):
+        os.remove(plan_path)
+    return summaries
+
+
+def print_summary(name: str, s: dict, limit: int = 5) -> None:
+    print(f"📂 {name}")
+    print(f"   - รูป / label ที่พบ        : {s['images']} / {s['labels']}")
+    print(f"   - รับเข้า                   : {s['ingested']} "
+          f"(train {s['splits']['train']}, val {s['splits']['val']}, test {s['splits']['test']})")
+    print(f"   - แก้ชื่อไฟล์               : {s['renamed']}")
+    print(f"   - remap class (บรรทัด)     : {s['remapped_lines']}")
+    print(f"   - ข้าม: ตัวซ้ำ {s['duplicates']}, 20/40 นาที {s['non_hourly']}, "
+          f"มีอยู่แล้ว {s['already_ingested']}, label ผิด {s['invalid_label']}")
+    print(f"   - รูปไม่มี label {s['unlabeled']}, label ไม่มีรูป {s['orphan_labels']}")
+    if s['classes']:
+        print("   - จำนวน box ต่อ class:")
+        for cls_id in sorted(dataset_rules.CLASS_NAMES):
+            print(f"       {cls_id:<3} {dataset_rules.CLASS_NAMES[cls_id]:<20} {s['classes'].get(cls_id, 0)}")
+    for p in s['problems'][:limit]:
+        print(f"   ⚠️  {p}")
+    if len(s['problems']) > limit:
+        print(f"   ... และอีก {len(s['problems']) - limit} ปัญหา")
+
+
+def parse_source(arg: str, mappings: dict) -> Tuple[str, str, str, Optional[dict]]:
+    # รูปแบบ: path หรือ name=path (path มี images/ และ labels/) ชื่อแหล่งใช้เลือก mapping
+    name, _, path = arg.rpartition('=')
+    name = name or os.path.basename(os.path.normpath(path))
+    mapping = mappings.get(name)
+    return name, os.path.join(path, 'images'), os.path.join(path, 'labels'), mapping
+
+
+def main() -> None:
+    sys.stdout.reconfigure(encoding='utf-8')
+    parser = argparse.ArgumentParser(description="Streaming ingest: clean names, remap classes, validate and split in one pass")
+    parser.add_argument("sources", nargs='+', help="โฟลเดอร์แหล่งข้อมูล (มี images/ และ labels/) หรือ name=path")
+    parser.add_argument("--dataset", default=r'D:\model_cuu\dataset', help="dataset ปลายทาง")
+    parser.add_argument("--mapping", default=None, help='JSON {"ชื่อแหล่ง": {"old_id": new_id}} เพิ่ม/แทน SOURCE_MAPPINGS')
+    parser.add_argument("--keep-non-hourly", action='store_true', help="ไม่ตัดรูปที่ถ่ายนาทีที่ 20 / 40")
+    parser.add_argument("--move", action='store_true', help="ย้ายไฟล์แทนการ copy")
+    parser.add_argument("--batch", default=None, help="ชื่อ batch ใน journal (ค่าเริ่มต้น = เวลาปัจจุบัน)")
+    parser.add_argument("--workers", type=int, default=8, help="จำนวน thread สำหรับ copy/move")
+    parser.add_argument("--report", default=None, help="บันทึก summary เป็น JSON")
+    parser.add_argument("--yes", action='store_true', help="ยืนยันทำจริง (ถ้าไม่ใส่จะเป็นแค่ Preview)")
+    args = parser.parse_args()
+
+    mappings = dict(dataset_rules.SOURCE_MAPPINGS)
+    if args.mapping:
+        with open(args.mapping, 'r', encoding='utf-8') as f:
+            mappings.update({k: {int(o): int(n) for o, n in v.items()} for k, v in json.load(f).items()})
+
+    sources = [parse_source(a, mappings) for a in args.sources]
+    for name, src_img, _, _ in sources:
+        if not os.path.isdir(src_img):
+            print(f"Error: ไม่พบโฟลเดอร์: {src_img}")
+            return
+
+    is_dry_run = not args.yes
+    if is_dry_run:
+        print("\n!!! นี่คือโหมดทดสอบ (Dry Run) - ยังไม่มีการแก้ไขไฟล์จริง !!!")
+        print("ให้เติม --yes ต่อท้ายคำสั่งเพื่อรันจริง\n")
+
+    summaries = ingest_sources(args.dataset, sources, args.move, args.keep_non_hourly, is_dry_run, args.batch, args.workers)
+    print("=" * 60)
+    for (name, _, _, mapping), s in zip(sources, summaries.values()):
+        print_summary(name + ('' if mapping else ' (ไม่มี mapping)'), s)
+        print("-" * 60)
+    total = sum(s['ingested'] for s in summaries.values())
+    print(f"✓ {'จะรับเข้า' if is_dry_run else 'รับเข้า'} {total} รูป -> {args.dataset}")
+
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(summaries, f, ensure_ascii=False, indent=2)
+        print(f" Report saved: {args.report}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,23 +1,39 @@
 from ultralytics import YOLO
 import sys
+import argparse
+import tiled_inference
+import profiling_utils
+import bf16_utils
 
 def main():
     sys.stdout.reconfigure(encoding='utf-8')
+    args = bf16_utils.add_bf16_args(profiling_utils.add_profile_args(argparse.ArgumentParser())).parse_args()
 
     model_path = r'D:\model_cuu\training_logs\training_20251205_232546\models\best.pt' 
     yaml_path = r'D:\model_cuu\dataset\data.yaml'
+    use_tiled = False  # True = วัดผลแบบ tiled inference (ตัด panorama เป็น tile แบบเดียวกับตอน deploy)
 
 
     model = YOLO(model_path)
+    profiler = profiling_utils.attach_from_args(model, args, phase='val')
+    device = bf16_utils.attach_from_args(model, args, '0', phase='val')
 
     print(f"--- กำลังตรวจสอบความแม่นยำจากโมเดล: {model_path} ---")
 
+    if use_tiled:
+        metrics, stats = tiled_inference.val_tiled(model, yaml_path, split='test', imgsz=640, batch=16, device=device)
+        print("\n--- สรุปผลลัพธ์ (tiled) ---")
+        print(f"mAP50: {metrics['mAP50']}")
+        print(f"mAP50-95: {metrics['mAP50-95']}")
+        tiled_inference.print_stats(stats)
+        return
+
     metrics = model.val(
         data=yaml_path, 
         split='test',   
         imgsz=640, 
         batch=16, 
-        device='0',     
+        device=device,     
         plots=True,      
         conf=0.25       
     )
@@ -25,6 +41,8 @@ def main():
     print("\n--- สรุปผลลัพธ์ ---")
     print(f"mAP50: {metrics.box.map50}")
     print(f"mAP50-95: {metrics.box.map}")
+    if profiler is not None and profiler.out_dir:
+        print(f"Profile: {profiler.out_dir}")
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
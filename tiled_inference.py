@@ -0,0 +1,189 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+import cv2
+from ultralytics import YOLO
+
+import inference_utils
+import inference_cache
+import eval_utils
+
+
+def make_tiles(width, height, tile=640, overlap=0.2):
+    # คืนค่า list ของ (x0, y0, x1, y1) ที่ครอบคลุมทั้งภาพ โดยมีส่วนทับกันตาม overlap
+    tw, th = min(tile, width), min(tile, height)
+    stride_x = max(1, int(tw * (1 - overlap)))
+    stride_y = max(1, int(th * (1 - overlap)))
+    xs = list(range(0, width - tw + 1, stride_x))
+    ys = list(range(0, height - th + 1, stride_y))
+    if xs[-1] != width - tw:
+        xs.append(width - tw)
+    if ys[-1] != height - th:
+        ys.append(height - th)
+    return [(x, y, x + tw, y + th) for y in ys for x in xs]
+
+
+def predict_tiled(model, paths, tile=640, overlap=0.2, imgsz=640, conf=0.25, iou=0.7,
+                  batch=16, merge='nms', merge_thr=0.5, merge_metric='ios', device=None, cache=None):
+    """
+    ตัด panorama เป็น tile ที่ทับกัน, ส่ง tile จากหลายภาพรวมกันเป็น batch เดียว,
+    แปลงกล่องกลับเป็นพิกัด panorama แล้วรวมกล่องซ้ำตรงรอยต่อด้วย NMS/WBF
+    คืนค่า (dets_by_path, stats)
+    """
+    merge_fn = inference_utils.MERGE_FUNCS[merge]
+    cached, keys = {}, {}
+    if cache is not None:
+        params = {'mode': 'tiled', 'tile': tile, 'overlap': overlap, 'imgsz': imgsz, 'conf': conf, 'iou': iou,
+                  'merge': merge, 'merge_thr': merge_thr, 'merge_metric': merge_metric}
+        cached, paths, keys = cache.lookup_many(model, paths, params)
+    results_by_path = {}
+    parts = {}
+    remaining = {}
+    shapes = {}
+    t_start = {}
+    latencies = []
+    pending = []
+    n_tiles = 0
+    model_time = 0.0
+
+    def flush():
+        nonlocal model_time
+        if not pending:
+            return
+        t0 = time.perf_counter()
+        results = model.predict([p[2] for p in pending], imgsz=imgsz, conf=conf, iou=iou,
+                                device=device, verbose=False)
+        model_time += time.perf_counter() - t0
+        for (path, offset, _), r in zip(pending, results):
+            parts[path].append(inference_utils.result_to_detections(r, offset))
+            remaining[path] -= 1
+            if remaining[path] == 0:
+                h, w = shapes[path]
+                det = inference_utils.concat_detections(parts.pop(path), w, h)
+                results_by_path[path] = merge_fn(det, thr=merge_thr, metric=merge_metric)
+                latencies.append(time.perf_counter() - t_start.pop(path))
+        pending.clear()
+
+    t_all = time.perf_counter()
+    for path in paths:
+        t_start[path] = time.perf_counter()
+        img = cv2.imread(path)
+        if img is None:
+            print(f" ⚠ อ่านรูปไม่ได้: {path}")
+            t_start.pop(path)
+            continue
+        h, w = img.shape[:2]
+        tiles = make_tiles(w, h, tile, overlap)
+        shapes[path] = (h, w)
+        parts[path] = []
+        remaining[path] = len(tiles)
+        n_tiles += len(tiles)
+        for x0, y0, x1, y1 in tiles:
+            pending.append((path, (x0, y0), img[y0:y1, x0:x1]))
+            if len(pending) >= batch:
+                flush()
+    flush()
+    total_time = time.perf_counter() - t_all
+    if cache is not None:
+        cache.store_many(results_by_path, keys)
+
+    lat_ms = np.array(latencies) * 1000 if latencies else np.zeros(1)
+    stats = {
+        'images': len(results_by_path),
+        'cached': len(cached),
+        'tiles': n_tiles,
+        'tiles_per_sec': n_tiles / model_time if model_time > 0 else 0.0,
+        'total_sec': total_time,
+        'latency_ms_mean': float(lat_ms.mean()),
+        'latency_ms_p50': float(np.percentile(lat_ms, 50)),
+        'latency_ms_p95': float(np.percentile(lat_ms, 95)),
+    }
+    results_by_path.update(cached)
+    return results_by_path, stats
+
+
+def print_stats(stats):
+    print(f" Panoramas      : {stats['images']} (+{stats['cached']} from cache)")
+    print(f" Tiles          : {stats['tiles']}")
+    print(f" Tiles/sec      : {stats['tiles_per_sec']:.1f}")
+    print(f" Latency (mean) : {stats['latency_ms_mean']:.1f} ms / panorama")
+    print(f" Latency (p50)  : {stats['latency_ms_p50']:.1f} ms")
+    print(f" Latency (p95)  : {stats['latency_ms_p95']:.1f} ms")
+
+
+def val_tiled(model, data_yaml, split='test', **tile_kwargs):
+    """
+    วัด mAP บน split ของ data.yaml ด้วย tiled inference แบบเดียวกับตอน deploy
+    (conf ควรต่ำเหมือน model.val เพื่อให้ได้ PR curve ครบ)
+    """
+    from ultralytics.data.utils import check_det_dataset, img2label_paths
+
+    data = check_det_dataset(data_yaml)
+    split_path = data[split]
+    if isinstance(split_path, list):
+        split_path = split_path[0]
+    paths = inference_utils.list_images(split_path)
+    print(f"--- Tiled validation: {len(paths)} images from {split_path} ---")
+
+    tile_kwargs.setdefault('conf', 0.001)
+    dets, stats = predict_tiled(model, paths, **tile_kwargs)
+    metrics = eval_utils.evaluate_detections(dets, lambda p: img2label_paths([p])[0])
+    return metrics, stats
+
+
+def main():
+    sys.stdout.reconfigure(encoding='utf-8')
+    parser = argparse.ArgumentParser(description="Tiled inference / validation for panorama images")
+    parser.add_argument("mode", choices=['predict', 'val'])
+    parser.add_argument("--weights", required=True, help="best.pt หรือ .onnx")
+    parser.add_argument("--source", help="โฟลเดอร์รูป (โหมด predict)")
+    parser.add_argument("--out", default='detections_tiled.json', help="ไฟล์ผลลัพธ์ (โหมด predict)")
+    parser.add_argument("--data", help="data.yaml (โหมด val)")
+    parser.add_argument("--split", default='test')
+    parser.add_argument("--tile", type=int, default=640)
+    parser.add_argument("--overlap", type=float, default=0.2)
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--conf", type=float, default=None)
+    parser.add_argument("--iou", type=float, default=0.7)
+    parser.add_argument("--batch", type=int, default=16)
+    parser.add_argument("--merge", choices=sorted(inference_utils.MERGE_FUNCS), default='nms')
+    parser.add_argument("--merge-thr", type=float, default=0.5)
+    parser.add_argument("--merge-metric", choices=['iou', 'ios'], default='ios')
+    parser.add_argument("--device", default=None)
+    parser.add_argument("--cache", default=None, help="โฟลเดอร์ inference cache (ไม่ใส่ = ไม่ใช้ cache)")
+    args = parser.parse_args()
+
+    model = YOLO(args.weights)
+    cache = inference_cache.InferenceCache(args.cache) if args.cache else None
+    kwargs = dict(tile=args.tile, overlap=args.overlap, imgsz=args.imgsz, iou=args.iou, batch=args.batch,
+                  merge=args.merge, merge_thr=args.merge_thr, merge_metric=args.merge_metric, device=args.device,
+                  cache=cache)
+    if args.conf is not None:
+        kwargs['conf'] = args.conf
+
+    if args.mode == 'predict':
+        if not args.source or not os.path.isdir(args.source):
+            print(f"Error: ไม่พบโฟลเดอร์ {args.source}")
+            return
+        paths = inference_utils.list_images(args.source)
+        dets, stats = predict_tiled(model, paths, **kwargs)
+        inference_utils.save_detections(dets, args.out)
+        print_stats(stats)
+        if cache is not None:
+            print(f" Cache hit rate : {cache.stats()['hit_rate'] * 100:.1f}%")
+        print(f" Detections saved to: {args.out}")
+    else:
+        if not args.data:
+            print("Error: ต้องระบุ --data ในโหมด val")
+            return
+        metrics, stats = val_tiled(model, args.data, args.split, **kwargs)
+        print("\n--- สรุปผลลัพธ์ (tiled) ---")
+        print(f"mAP50: {metrics['mAP50']}")
+        print(f"mAP50-95: {metrics['mAP50-95']}")
+        print_stats(stats)
+
+
+if __name__ == '__main__':
+    main()
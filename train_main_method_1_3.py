@@ -1,8 +1,11 @@
 import os
-import shutil
-import random
+from datetime import datetime
 from ultralytics import YOLO
+import ingest_journal
 import report_utils  
+import profiling_utils
+import bf16_utils
+import argparse
 import sys
 
 sys.stdout.reconfigure(encoding='utf-8')
@@ -10,62 +13,44 @@ sys.stdout.reconfigure(encoding='utf-8')
 dataset_root = r'D:\model_cuu\dataset'  
 additional_datasets = [r'D:\model_cuu\dataset_method_1'] 
 epochs = 100
+base_weights = 'yolov8n.pt'
+train_args = dict(
+    epochs=epochs,
+    batch=16,
+    imgsz=640,
+    device='0',
+    patience=50,
+    save=True,
+    project='runs/train',
+    name='my_lettuce_model',
+    verbose=True,
+    plots=True
+)
 
 def auto_split_data(base_path, extra_paths=[]):
-
-    def distribute(files, src_img, src_lbl, dst_base, move_files=False):
-        if not files: return
-        total = len(files)
-        end_train = int(total * 0.70)
-        end_val = end_train + int(total * 0.15)
-        splits = {'train': files[:end_train], 'val': files[end_train:end_val], 'test': files[end_val:]}
-        
-        for mode, f_list in splits.items():
-            d_img = os.path.join(dst_base, 'images', mode)
-            d_lbl = os.path.join(dst_base, 'labels', mode)
-            os.makedirs(d_img, exist_ok=True)
-            os.makedirs(d_lbl, exist_ok=True)
-            for f in f_list:
-                s_i = os.path.join(src_img, f)
-                d_i = os.path.join(d_img, f)
-                if os.path.exists(d_i): continue
-                if move_files: shutil.move(s_i, d_i)
-                else: shutil.copy2(s_i, d_i)
-                
-                txt = os.path.splitext(f)[0] + '.txt'
-                s_t = os.path.join(src_lbl, txt)
-                d_t = os.path.join(d_lbl, txt)
-                if os.path.exists(s_t) and not os.path.exists(d_t):
-                    if move_files: shutil.move(s_t, d_t)
-                    else: shutil.copy2(s_t, d_t)
-
+    # ไฟล์ที่แบ่งไปแล้วถูกบันทึกใน split_journal.tsv จึงประมวลผลเฉพาะรูปใหม่
+    batch_id = datetime.now().strftime('%Y%m%d_%H%M%S')
     for p in extra_paths:
         if not os.path.exists(p): continue
         print(f" Processing extra dataset: {p}")
-        i_dir = os.path.join(p, 'images')
-        l_dir = os.path.join(p, 'labels')
-        if os.path.exists(i_dir):
-            imgs = [f for f in os.listdir(i_dir) if f.lower().endswith(('.jpg', '.png', '.jpeg'))]
-            random.shuffle(imgs)
-            distribute(imgs, i_dir, l_dir, base_path, move_files=False)
+        counts = ingest_journal.ingest_new_images(base_path, os.path.join(p, 'images'), os.path.join(p, 'labels'), move_files=False, batch_id=batch_id)
+        print(f"   + Train={counts['train']}, Val={counts['val']}, Test={counts['test']}")
 
     img_dir = os.path.join(base_path, 'images')
     lbl_dir = os.path.join(base_path, 'labels')
 
-    if os.path.exists(img_dir):
-        images = [f for f in os.listdir(img_dir) if os.path.isfile(os.path.join(img_dir, f)) and f.lower().endswith(('.jpg', '.png', '.jpeg'))]
-        if images:
-            print(f" Found {len(images)} unsorted images in {base_path}. Splitting...")
-            random.shuffle(images)
-            distribute(images, img_dir, lbl_dir, base_path, move_files=True)
-        else:
-            print(" No unsorted images found in base dataset root.")
+    counts = ingest_journal.ingest_new_images(base_path, img_dir, lbl_dir, move_files=True, batch_id=batch_id)
+    if sum(counts.values()):
+        print(f" Split new images in {base_path}: Train={counts['train']}, Val={counts['val']}, Test={counts['test']}")
+    else:
+        print(" No unsorted images found in base dataset root.")
     
     print(f" Dataset preparation complete.")
 
 
 if __name__ == '__main__':
-    print(f"--- GPU Check: device='0' (NVIDIA) ---")
+    args = bf16_utils.add_bf16_args(profiling_utils.add_profile_args(argparse.ArgumentParser())).parse_args()
+    print(f"--- Device Check: device='{args.device or train_args['device']}' ---")
     # 1. เช็คและแบ่งไฟล์
     if os.path.exists(dataset_root):
         auto_split_data(dataset_root, additional_datasets)
@@ -81,21 +66,11 @@ if __name__ == '__main__':
         exit()
     print(f"Using Data Config: {yaml_path}")
 
-    model = YOLO('yolov8n.pt') 
+    model = YOLO(base_weights) 
+    profiling_utils.attach_from_args(model, args)
+    train_args['device'] = bf16_utils.attach_from_args(model, args, train_args['device'])
     try:
-        results = model.train(
-            data=yaml_path,
-            epochs=epochs,
-            batch=16,
-            imgsz=640,
-            device='0',      
-            patience=50,    
-            save=True,
-            project='runs/train',
-            name='my_lettuce_model',
-            verbose=True,
-            plots=True      
-        )
+        results = model.train(data=yaml_path, **train_args)
 
         save_dir_str = str(results.save_dir)
         best_pt_path = os.path.join(save_dir_str, 'weights', 'best.pt')
@@ -105,7 +80,7 @@ if __name__ == '__main__':
             log_dir = report_utils.create_log_directory()
 
             summary = report_utils.save_results(save_dir_str, log_dir, best_pt_path)
-            report_utils.generate_text_report(log_dir, {'Epochs': epochs, 'Device': 'GPU'}, summary)
+            report_utils.generate_text_report(log_dir, {'Epochs': epochs, 'Device': train_args['device'], 'bf16': args.bf16}, summary)
             print(f"Report generated at: {{log_dir}}")
         except Exception as e:
             print(f" Report generation failed (ข้ามได้): {{e}}")
@@ -125,7 +100,7 @@ if __name__ == '__main__':
             print("--- Generating Report ---")
             log_dir = report_utils.create_log_directory()
             summary = report_utils.save_results(save_dir_str, log_dir, best_pt_path)
-            report_utils.generate_text_report(log_dir, {'Epochs': epochs, 'Device': 'GPU'}, summary)
+            report_utils.generate_text_report(log_dir, {'Epochs': epochs, 'Device': train_args['device'], 'bf16': args.bf16}, summary)
             print(f"Report generated at: {log_dir}")
         except Exception as e:
             print(f" Report generation failed (ข้ามได้): {e}")
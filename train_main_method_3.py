@@ -1,62 +1,46 @@
 import os
-import shutil
-import random
 from ultralytics import YOLO
+import ingest_journal
 import report_utils  
+import profiling_utils
+import bf16_utils
+import argparse
 import sys
 
 sys.stdout.reconfigure(encoding='utf-8')
 
 dataset_root = r'D:\model_cuu\dataset'  
 epochs = 100
+base_weights = r'training_logs\training_20251127_232007\models\best.pt'
+train_args = dict(
+    epochs=epochs,
+    batch=16,
+    imgsz=640,
+    device='0',
+    patience=50,
+    save=True,
+    project='runs/train',
+    name='my_lettuce_model',
+    verbose=True,
+    plots=True
+)
 
 
 def auto_split_data(base_path):
     img_dir = os.path.join(base_path, 'images')
     lbl_dir = os.path.join(base_path, 'labels')
 
-    if os.path.exists(os.path.join(img_dir, 'train')):
-        print(" พบโฟลเดอร์ train/val/test แล้ว ข้ามขั้นตอนการแบ่งไฟล์...")
+    # รูปที่ยังไม่อยู่ใน split_journal.tsv เท่านั้นที่จะถูกแบ่ง (70/15/15 ตาม hash ของชื่อไฟล์)
+    counts = ingest_journal.ingest_new_images(base_path, img_dir, lbl_dir, move_files=True)
+    if not sum(counts.values()):
+        print(" ไม่พบรูปภาพใหม่ในโฟลเดอร์ images ข้ามขั้นตอนการแบ่งไฟล์...")
         return
-    print(" ยังไม่พบโฟลเดอร์ train... กำลังเริ่มแบ่งไฟล์ (70/15/15)...")
-    images = [f for f in os.listdir(img_dir) if f.lower().endswith(('.jpg', '.png', '.jpeg'))]
-
-    if not images:
-        print(" ไม่พบรูปภาพในโฟลเดอร์ images (หรืออาจจะแบ่งไปแล้ว)")
-        return
-    random.shuffle(images)
-
-    total = len(images)
-    end_train = int(total * 0.70)
-    end_val = end_train + int(total * 0.15)
-
-    splits = {
-        'train': images[:end_train],
-        'val': images[end_train:end_val],
-        'test': images[end_val:]
-    }
-
-    for mode, files in splits.items():
-        d_img = os.path.join(img_dir, mode)
-        d_lbl = os.path.join(lbl_dir, mode)
-        os.makedirs(d_img, exist_ok=True)
-        os.makedirs(d_lbl, exist_ok=True)
-        for f in files:
-            src_img = os.path.join(img_dir, f)
-            dst_img = os.path.join(d_img, f)
-            shutil.move(src_img, dst_img)
-            txt_name = os.path.splitext(f)[0] + '.txt'
-            src_txt = os.path.join(lbl_dir, txt_name)
-            dst_txt = os.path.join(d_lbl, txt_name)
-            if os.path.exists(src_txt):
-                shutil.move(src_txt, dst_txt)
-            else:
-                pass
-    print(f" แบ่งไฟล์เสร็จสิ้น: Train={len(splits['train'])}, Val={len(splits['val'])}, Test={len(splits['test'])}")
+    print(f" แบ่งไฟล์เสร็จสิ้น: Train={counts['train']}, Val={counts['val']}, Test={counts['test']}")
 
 
 if __name__ == '__main__':
-    print(f"--- GPU Check: device='0' (NVIDIA) ---")
+    args = bf16_utils.add_bf16_args(profiling_utils.add_profile_args(argparse.ArgumentParser())).parse_args()
+    print(f"--- Device Check: device='{args.device or train_args['device']}' ---")
     if os.path.exists(dataset_root):
         auto_split_data(dataset_root)
     else:
@@ -71,21 +55,11 @@ if __name__ == '__main__':
         exit()
     print(f"Using Data Config: {yaml_path}")
 
-    model = YOLO(r'training_logs\training_20251127_232007\models\best.pt')
+    model = YOLO(base_weights)
+    profiling_utils.attach_from_args(model, args)
+    train_args['device'] = bf16_utils.attach_from_args(model, args, train_args['device'])
     try:
-        results = model.train(
-            data=yaml_path,
-            epochs=epochs,
-            batch=16,
-            imgsz=640,
-            device='0',      
-            patience=50,    
-            save=True,
-            project='runs/train',
-            name='my_lettuce_model',
-            verbose=True,
-            plots=True      
-        )
+        results = model.train(data=yaml_path, **train_args)
 
         save_dir_str = str(results.save_dir)
         best_pt_path = os.path.join(save_dir_str, 'weights', 'best.pt')
@@ -95,7 +69,7 @@ if __name__ == '__main__':
             log_dir = report_utils.create_log_directory()
 
             summary = report_utils.save_results(save_dir_str, log_dir, best_pt_path)
-            report_utils.generate_text_report(log_dir, {'Epochs': epochs, 'Device': 'GPU'}, summary)
+            report_utils.generate_text_report(log_dir, {'Epochs': epochs, 'Device': train_args['device'], 'bf16': args.bf16}, summary)
             print(f"Report generated at: {{log_dir}}")
         except Exception as e:
             print(f" Report generation failed (ข้ามได้): {{e}}")
@@ -116,7 +90,7 @@ if __name__ == '__main__':
             print("--- Generating Report ---")
             log_dir = report_utils.create_log_directory()
             summary = report_utils.save_results(save_dir_str, log_dir, best_pt_path)
-            report_utils.generate_text_report(log_dir, {'Epochs': epochs, 'Device': 'GPU'}, summary)
+            report_utils.generate_text_report(log_dir, {'Epochs': epochs, 'Device': train_args['device'], 'bf16': args.bf16}, summary)
             print(f"Report generated at: {log_dir}")
         except Exception as e:
             print(f" Report generation failed (ข้ามได้): {e}")
@@ -0,0 +1,486 @@
+import os
+import sys
+import json
+import time
+import queue
+import ctypes
+import ctypes.util
+import select
+import struct
+import argparse
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+from ultralytics import YOLO
+
+import capture_utils
+import change_gate
+import dataset_rules
+import detection_timeseries
+import inference_cache
+import inference_utils
+import tiled_inference
+
+# ค่า flag จาก linux/inotify.h
+IN_MODIFY = 0x002
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_Q_OVERFLOW = 0x4000
+EVENT_HEADER = struct.Struct('iIII')  # wd, mask, cookie, len (ตามด้วยชื่อไฟล์ len ไบต์)
+MAX_RETRIES = 3     # batch ที่ inference ล้มเหลวจะถูกลองใหม่กี่ครั้งก่อนยอมแพ้
+RETRY_DELAY = 5.0   # วินาทีก่อนลองใหม่ (ไฟล์ถูก lock / GPU ไม่ว่างชั่วคราว)
+
+
+class InotifyWatcher:
+    """
+    รับ event จาก kernel ผ่าน ctypes (ไม่ต้องติดตั้ง package เพิ่ม) เฉพาะไฟล์ที่ถูกสร้าง / เขียน / ย้ายเข้ามาในโฟลเดอร์
+    """
+    mode = 'inotify'
+
+    def __init__(self, folder):
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        mask = IN_CREATE | IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO
+        if libc.inotify_add_watch(self.fd, os.fsencode(folder), mask) < 0:
+            err = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(err, f'inotify_add_watch failed: {folder}')
+
+    def poll(self, timeout):
+        # คืนค่า (ชื่อไฟล์ที่มี event, overflow) ; overflow = kernel queue เต็มจนทิ้ง event ต้อง rescan ทั้งโฟลเดอร์
+        names, overflow = set(), False
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return names, overflow
+        while True:
+            try:
+                buf = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            pos = 0
+            while pos < len(buf):
+                _, mask, _, length = EVENT_HEADER.unpack_from(buf, pos)
+                name = buf[pos + EVENT_HEADER.size:pos + EVENT_HEADER.size + length].rstrip(b'\0')
+                pos += EVENT_HEADER.size + length
+                if mask & IN_Q_OVERFLOW:
+                    overflow = True
+                elif name:
+                    names.add(os.fsdecode(name))
+        return names, overflow
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    # fallback สำหรับ Windows / network share ที่ไม่มี inotify: scandir ทุก interval วินาที เทียบ (size, mtime) กับรอบก่อน
+    mode = 'polling'
+
+    def __init__(self, folder, interval=2.0):
+        self.folder = folder
+        self.interval = interval
+        self.last = {}
+
+    def poll(self, timeout):
+        time.sleep(self.interval)
+        names, current = set(), {}
+        with os.scandir(self.folder) as it:
+            for entry in it:
+                if entry.is_file():
+                    st = entry.stat()
+                    current[entry.name] = (st.st_size, st.st_mtime_ns)
+                    if self.last.get(entry.name) != current[entry.name]:
+                        names.add(entry.name)
+        self.last = current
+        return names, False
+
+    def close(self):
+        pass
+
+
+def make_watcher(folder, mode='auto', interval=2.0):
+    if mode in ('auto', 'inotify') and sys.platform.startswith('linux'):
+        try:
+            return InotifyWatcher(folder)
+        except (OSError, AttributeError) as e:
+            if mode == 'inotify':
+                raise
+            print(f" ใช้ inotify ไม่ได้ ({e}) เปลี่ยนเป็น polling")
+    elif mode == 'inotify':
+        raise OSError(f'inotify ใช้ได้เฉพาะ Linux (platform={sys.platform})')
+    return PollingWatcher(folder, interval)
+
+
+def _capture_order(name):
+    # เรียงตามเวลาถ่าย (ชื่อที่ไม่ใช่ capture ไว้ท้าย) ให้ change gate / time series เห็นรูปของแต่ละ tower ตามลำดับเวลา
+    info = capture_utils.parse_capture_name(dataset_rules.normalize_stem(os.path.basename(name)))
+    return (0, info['timestamp'], os.path.basename(name)) if info else (1, os.path.basename(name))
+
+
+class _Item:
+    __slots__ = ('path', 't_land', 'attempts')
+
+    def __init__(self, path, t_land):
+        self.path = path
+        self.t_land = t_land  # mtime ตอนไฟล์เขียนเสร็จ (เวลาที่ไฟล์ "ลง" โฟลเดอร์)
+        self.attempts = 0
+
+
+class WatchDaemon:
+    """
+    pipeline 3 เธรดต่อกันด้วย queue แบบจำกัดขนาด:
+      watcher (event + debounce) -> clean (ชื่อมาตรฐาน + กันซ้ำ) -> infer (change gate + batched inference + เขียนผล)
+    ถ้าขั้นถัดไปช้า queue เต็มแล้วขั้นก่อนหน้าจะถูกบล็อก (backpressure) ไม่กินหน่วยความจำเพิ่ม
+    ระหว่างนั้น inotify event จะค้างใน kernel ถ้าล้น (IN_Q_OVERFLOW) จะ rescan โฟลเดอร์แทน
+    """
+
+    def __init__(self, folder, detect_fn, out_dir, gate, store=None, batch=16, max_wait=1.0, settle=1.0,
+                 queue_size=64, mode='auto', poll_interval=2.0, keep_non_hourly=False, skip_existing=False):
+        self.folder = folder
+        self.detect_fn = detect_fn
+        self.out_dir = out_dir
+        self.gate = gate
+        self.store = store
+        self.batch = batch
+        self.max_wait = max_wait
+        self.settle = settle
+        self.keep_non_hourly = keep_non_hourly
+        self.watcher = make_watcher(folder, mode, poll_interval)
+        self.ready_q = queue.Queue(queue_size)
+        self.infer_q = queue.Queue(queue_size)
+        self.stop = threading.Event()
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.accepted = set()
+        self.retry = deque()  # (เวลาที่ลองใหม่ได้, item) ใช้เฉพาะในเธรด infer
+        self.latencies = deque(maxlen=10000)
+        self.counters = {'landed': 0, 'processed': 0, 'renamed': 0, 'duplicates': 0, 'non_hourly': 0,
+                         'errors': 0, 'retried': 0, 'failed': 0, 'late': 0, 'batches': 0, 'overflows': 0, 'backpressure': 0}
+        self.infer_sec = 0.0
+        os.makedirs(out_dir, exist_ok=True)
+        if not skip_existing:
+            now = time.time()
+            for name in sorted(os.listdir(folder), key=_capture_order):
+                self._touch(name, now)
+        self.threads = [threading.Thread(target=fn, daemon=True)
+                        for fn in (self._watch_loop, self._clean_loop, self._infer_loop)]
+
+    def start(self):
+        for t in self.threads:
+            t.start()
+        return self
+
+    def shutdown(self, timeout=30):
+        self.stop.set()
+        for t in self.threads:
+            t.join(timeout)
+        self.watcher.close()
+
+    def _out_path(self, stem):
+        return os.path.join(self.out_dir, stem + '.json')
+
+    def _canonical(self, name):
+        return dataset_rules.normalize_stem(name) + os.path.splitext(name)[1].lower()
+
+    def _put(self, q, item):
+        if q.full():
+            with self.lock:
+                self.counters['backpressure'] += 1
+        while not self.stop.is_set():
+            try:
+                q.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    # --- watcher: รวม event ของไฟล์เดียวกันจนกว่าไฟล์จะนิ่ง (debounce) ---
+    def _touch(self, name, now):
+        if name.startswith('.') or not name.lower().endswith(dataset_rules.IMG_EXTS):
+            return
+        if self._canonical(name) in self.accepted:
+            return  # event จากการ rename ของขั้น clean เอง
+        try:
+            st = os.stat(os.path.join(self.folder, name))
+        except FileNotFoundError:
+            return
+        self.pending[name] = (now, (st.st_size, st.st_mtime_ns))
+
+    def _watch_loop(self):
+        while not self.stop.is_set():
+            names, overflow = self.watcher.poll(min(self.settle, 0.5))
+            now = time.time()
+            if overflow:
+                with self.lock:
+                    self.counters['overflows'] += 1
+                names |= set(os.listdir(self.folder))
+            for name in sorted(names, key=_capture_order):
+                self._touch(name, now)
+            for name, (t_event, sig) in sorted(self.pending.items(), key=lambda kv: _capture_order(kv[0])):
+                if now - t_event < self.settle:
+                    continue
+                path = os.path.join(self.folder, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    del self.pending[name]
+                    continue
+                if st.st_size == 0 or (st.st_size, st.st_mtime_ns) != sig:
+                    # ยังเขียนไม่เสร็จ (ไฟล์โตขึ้นระหว่างรอ) รออีก settle วินาที
+                    self.pending[name] = (now, (st.st_size, st.st_mtime_ns))
+                    continue
+                del self.pending[name]
+                with self.lock:
+                    self.counters['landed'] += 1
+                if not self._put(self.ready_q, _Item(path, st.st_mtime)):
+                    return
+
+    # --- clean: ชื่อมาตรฐานเดียวกับ pre-process/delete_*.py + กันไฟล์ซ้ำ ---
+    def _clean(self, item):
+        name = os.path.basename(item.path)
+        canonical = self._canonical(name)
+        stem = os.path.splitext(canonical)[0]
+        with self.lock:
+            if canonical in self.accepted or os.path.exists(self._out_path(stem)):
+                self.counters['duplicates'] += 1
+                return None
+            if not self.keep_non_hourly and dataset_rules.is_non_hourly(stem):
+                self.counters['non_hourly'] += 1
+                return None
+            self.accepted.add(canonical)
+        if canonical != name:
+            dst = os.path.join(self.folder, canonical)
+            if os.path.exists(dst):
+                # มีไฟล์ชื่อมาตรฐานอยู่แล้ว ใช้ไฟล์นั้นแทน ไฟล์ชื่อเดิมถือเป็นสำเนาซ้ำ (ไม่ลบ)
+                with self.lock:
+                    self.counters['duplicates'] += 1
+            else:
+                os.rename(item.path, dst)
+                with self.lock:
+                    self.counters['renamed'] += 1
+            item.path = dst
+        return item
+
+    def _clean_loop(self):
+        while not self.stop.is_set():
+            try:
+                item = self.ready_q.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            try:
+                item = self._clean(item)
+            except OSError as e:
+                print(f" ⚠️  clean failed: {item.path} ({e})")
+                with self.lock:
+                    self.counters['errors'] += 1
+                continue
+            if item is not None and not self._put(self.infer_q, item):
+                return
+
+    # --- infer: รวม batch ภายใน max_wait วินาที แล้วผ่าน change gate ---
+    def _collect(self):
+        # รูปที่รอ retry ครบเวลาแล้วรันก่อนทีละรูป ไฟล์เสียรูปเดียวจึงไม่ลากรูปดีทั้ง batch ให้ล้มตาม
+        if self.retry and self.retry[0][0] <= time.time():
+            return [self.retry.popleft()[1]]
+        try:
+            batch = [self.infer_q.get(timeout=0.5)]
+        except queue.Empty:
+            return []
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                batch.append(self.infer_q.get(timeout=remaining) if remaining > 0 else self.infer_q.get_nowait())
+            except queue.Empty:
+                break
+        return sorted(batch, key=lambda item: _capture_order(item.path))
+
+    def _write(self, batch, dets):
+        by_name = {}
+        for item in batch:
+            det = dets[item.path]
+            stem = os.path.splitext(os.path.basename(item.path))[0]
+            out = self._out_path(stem)
+            inference_utils.save_detections({item.path: det}, out + '.tmp')
+            os.replace(out + '.tmp', out)
+            by_name[os.path.basename(item.path)] = det
+        if self.store:
+            stats = detection_timeseries.append_detections(self.store, by_name)
+            if stats['late']:
+                print(f" ⚠️ time series ไม่รวมรูปที่เก่ากว่า watermark ของ store รุ่นเก่า: {', '.join(stats['late_names'])}")
+                with self.lock:
+                    self.counters['late'] += stats['late']
+
+    def _requeue(self, batch, error):
+        # ไฟล์ที่ settle แล้วจะไม่มี event ใหม่ ถ้าไม่ใส่คิวกลับเองรูปจะหายไปจนกว่าจะ restart
+        for item in batch:
+            item.attempts += 1
+            if item.attempts <= MAX_RETRIES:
+                self.retry.append((time.time() + RETRY_DELAY, item))
+                with self.lock:
+                    self.counters['retried'] += 1
+            else:
+                print(f" ❌ ยอมแพ้หลังลอง {MAX_RETRIES} ครั้ง: {item.path} ({error})")
+                with self.lock:
+                    self.counters['failed'] += 1
+                    self.accepted.discard(self._canonical(os.path.basename(item.path)))
+
+    def _infer_loop(self):
+        # gate.run / gate.save ถูกเรียกจากเธรดนี้เท่านั้น (state ของ gate จึงไม่ต้องมี lock)
+        while not self.stop.is_set():
+            batch = self._collect()
+            if not batch:
+                continue
+            t0 = time.perf_counter()
+            try:
+                dets = self.gate.run([item.path for item in batch], self.detect_fn)
+                # รูปที่ไม่มีผลกลับมา (อ่านไม่ได้ / ไฟล์เสีย) ห้ามบันทึกเป็น 0 ต้น ให้ลองใหม่แล้วนับเป็น failed
+                missing = [item for item in batch if item.path not in dets]
+                batch = [item for item in batch if item.path in dets]
+                self._write(batch, dets)
+                self.gate.save()
+            except Exception as e:
+                print(f" ⚠️  inference failed for {len(batch)} images ({e}) จะลองใหม่ทีละรูปใน {RETRY_DELAY:.0f} s")
+                with self.lock:
+                    self.counters['errors'] += len(batch)
+                self._requeue(batch, e)
+                continue
+            if missing:
+                print(f" ⚠️  ไม่มีผล detection {len(missing)} รูป จะลองใหม่ทีละรูปใน {RETRY_DELAY:.0f} s")
+                with self.lock:
+                    self.counters['errors'] += len(missing)
+                self._requeue(missing, 'ไม่มีผล detection')
+            if not batch:
+                continue
+            now = time.time()
+            with self.lock:
+                self.infer_sec += time.perf_counter() - t0
+                self.counters['batches'] += 1
+                self.counters['processed'] += len(batch)
+                for item in batch:
+                    self.latencies.append(now - item.t_land)
+            worst = max(now - item.t_land for item in batch)
+            print(f" [{time.strftime('%H:%M:%S')}] batch {len(batch)} images, "
+                  f"{time.perf_counter() - t0:.2f} s, land->written max {worst:.2f} s")
+
+    def metrics(self):
+        with self.lock:
+            lat = np.array(self.latencies) * 1000 if self.latencies else np.zeros(1)
+            n = self.counters['batches']
+            return {
+                'mode': self.watcher.mode,
+                **self.counters,
+                'gate_skipped': self.gate.stats['skipped'],
+                'latency_ms_p50': float(np.percentile(lat, 50)),
+                'latency_ms_p99': float(np.percentile(lat, 99)),
+                'latency_ms_max': float(lat.max()),
+                'infer_sec_per_batch': self.infer_sec / n if n else 0.0,
+                'batch_size_mean': self.counters['processed'] / n if n else 0.0,
+                'pending_debounce': len(self.pending),
+                'ready_queue': self.ready_q.qsize(),
+                'infer_queue': self.infer_q.qsize(),
+                'retry_queue': len(self.retry),
+            }
+
+
+def write_metrics(metrics, path):
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(metrics, f, indent=2)
+    os.replace(tmp, path)
+
+
+def serve_metrics(daemon, host, port):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            code, data = (200, daemon.metrics()) if self.path == '/metrics' else (404, {'error': 'not found'})
+            body = json.dumps(data).encode('utf-8')
+            self.send_response(code)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    sys.stdout.reconfigure(encoding='utf-8')
+    parser = argparse.ArgumentParser(description="Watch a drop folder and run gated, batched inference on new captures")
+    parser.add_argument("--watch", required=True, help="โฟลเดอร์ที่กล้องส่งรูปเข้ามา")
+    parser.add_argument("--weights", required=True)
+    parser.add_argument("--out", default='detections_watch', help="โฟลเดอร์ผล detections (<ชื่อรูป>.json ต่อรูป)")
+    parser.add_argument("--store", default=None, help="detection_timeseries store (ไม่ใส่ = ไม่ append)")
+    parser.add_argument("--state", default='gate_state.json', help="ไฟล์ state ของ change gate")
+    parser.add_argument("--threshold", type=float, default=0.02, help="change gate (0 = รันโมเดลทุกรูป)")
+    parser.add_argument("--max-skip", type=int, default=12)
+    parser.add_argument("--tiled", action='store_true', help="ใช้ tiled inference")
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--batch", type=int, default=16)
+    parser.add_argument("--max-wait", type=float, default=1.0, help="วินาทีที่รอรวม batch หลังรูปแรกเข้าคิว")
+    parser.add_argument("--device", default=None)
+    parser.add_argument("--cache", default=None, help="โฟลเดอร์ inference cache (ไม่ใส่ = ไม่ใช้ cache)")
+    parser.add_argument("--mode", choices=['auto', 'inotify', 'polling'], default='auto')
+    parser.add_argument("--poll-interval", type=float, default=2.0)
+    parser.add_argument("--settle", type=float, default=1.0, help="วินาทีที่ไฟล์ต้องไม่เปลี่ยนก่อนถือว่าเขียนเสร็จ")
+    parser.add_argument("--queue-size", type=int, default=64, help="ขนาด queue ระหว่างแต่ละขั้น")
+    parser.add_argument("--keep-non-hourly", action='store_true', help="รันรูปนาทีที่ 20/40 ด้วย")
+    parser.add_argument("--skip-existing", action='store_true', help="ไม่รันรูปที่อยู่ในโฟลเดอร์ก่อนเริ่ม daemon")
+    parser.add_argument("--metrics-file", default=None, help="เขียน metrics JSON ทุก --metrics-interval วินาที")
+    parser.add_argument("--metrics-interval", type=float, default=30.0)
+    parser.add_argument("--metrics-port", type=int, default=None, help="เปิด GET /metrics บน localhost")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.watch):
+        print(f"Error: ไม่พบโฟลเดอร์ {args.watch}")
+        return
+
+    print(f"--- Loading model once: {args.weights} ---")
+    model = YOLO(args.weights)
+    cache = inference_cache.InferenceCache(args.cache) if args.cache else None
+    if args.tiled:
+        detect_fn = lambda ps: tiled_inference.predict_tiled(model, ps, imgsz=args.imgsz, batch=args.batch,
+                                                             device=args.device, cache=cache)[0]
+    else:
+        detect_fn = lambda ps: inference_utils.predict_images(model, ps, imgsz=args.imgsz, batch=args.batch,
+                                                              device=args.device, cache=cache)
+    gate = change_gate.ChangeGate(args.threshold, args.max_skip, args.state)
+
+    daemon = WatchDaemon(args.watch, detect_fn, args.out, gate, args.store, args.batch, args.max_wait, args.settle,
+                         args.queue_size, args.mode, args.poll_interval, args.keep_non_hourly, args.skip_existing)
+    server = serve_metrics(daemon, '127.0.0.1', args.metrics_port) if args.metrics_port else None
+    daemon.start()
+    print(f" Watching {args.watch} ({daemon.watcher.mode}), detections -> {args.out}  (Ctrl+C เพื่อหยุด)")
+    if server:
+        print(f" Metrics: http://127.0.0.1:{args.metrics_port}/metrics")
+    try:
+        while True:
+            time.sleep(args.metrics_interval)
+            m = daemon.metrics()
+            if args.metrics_file:
+                write_metrics(m, args.metrics_file)
+            print(f" processed {m['processed']} (dup {m['duplicates']}, gate skip {m['gate_skipped']}), "
+                  f"land->written p50 {m['latency_ms_p50']:.0f} ms / p99 {m['latency_ms_p99']:.0f} ms, "
+                  f"queues {m['ready_queue']}/{m['infer_queue']}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        daemon.shutdown()
+        if server:
+            server.shutdown()
+        m = daemon.metrics()
+        if args.metrics_file:
+            write_metrics(m, args.metrics_file)
+        print(json.dumps(m, indent=2))
+
+
+if __name__ == '__main__':
+    main()